@@ -0,0 +1,239 @@
+"""Micro-benchmark of the filters, replaying the cases of the correctness tests (tests/data/filter_tests.yaml and the
+jobs of docs/filters.rst with their data in tests/data/doc_filter_testdata.yaml) through a FilterPipeline, as when
+running jobs.
+
+Each case is also run with its data scaled up (the content of the <body> or root element of markup, or the lines of
+text, repeated) to show how the filters behave with large documents. For each filter of each case the number of
+applications per second and the peak memory allocated (as traced by tracemalloc) while applying it once are measured;
+the results are summarized by filter kind and can be saved to a JSON file to be compared with those of another version
+of webchanges, e.g.:
+
+   python benchmarks/filters.py --kinds html2text css xpath --output new.json --compare old.json
+
+Run from the root of the repository (or with webchanges installed). Cases with filters whose optional packages are not
+installed, or that run external commands (shellpipe, execute), are skipped.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import platform
+import re
+import statistics
+import sys
+import textwrap
+import time
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import yaml
+
+here = Path(__file__).resolve().parent
+sys.path.insert(0, str(here.parent))
+
+from webchanges import __version__  # noqa: E402 module level import not at top of file
+from webchanges.filters import FilterBase, FilterPipeline, FilterStep  # noqa: E402
+from webchanges.handler import JobState  # noqa: E402
+from webchanges.jobs import JobBase  # noqa: E402
+
+data_dir = here.parent.joinpath('tests', 'data')
+docs_dir = here.parent.joinpath('docs')
+
+Case = Tuple[str, str, List[Union[str, Dict[str, Any]]], Union[bytes, str]]
+
+
+def load_cases() -> List[Case]:
+    """Returns the (corpus, name, filter, data) of the cases of the filter tests and of the documentation's jobs."""
+    cases: List[Case] = []
+    filter_tests = yaml.safe_load(data_dir.joinpath('filter_tests.yaml').read_text())
+    for name, test in filter_tests.items():
+        cases.append(('filter_tests', name, test['filter'], test['data']))
+
+    testdata = yaml.safe_load(data_dir.joinpath('doc_filter_testdata.yaml').read_text())
+    rst = docs_dir.joinpath('filters.rst').read_text()
+    for block in re.findall(r'^\.\. code-block:: yaml\n\n((?:(?: +.*)?\n)+)', rst, re.MULTILINE):
+        job_data = yaml.safe_load(textwrap.dedent(block))
+        if isinstance(job_data, dict) and job_data.get('url') in testdata and 'filter' in job_data:
+            d = testdata[job_data['url']]
+            data = data_dir.joinpath(d['filename']).read_bytes() if 'filename' in d else d['input']
+            cases.append(('docs', job_data['url'], job_data['filter'], data))
+    return cases
+
+
+def scale_data(data: Union[bytes, str], factor: int) -> Optional[Union[bytes, str]]:
+    """Returns the data made about factor times larger by repeating the content of its <body> (HTML) or root element
+    (XML) or its lines (text), or None if it can't be scaled without changing its structure (bytes, JSON, iCal)."""
+    if factor == 1:
+        return data
+    if isinstance(data, bytes) or data.lstrip().startswith(('{', '[')) or 'BEGIN:VCALENDAR' in data:
+        return None
+    match = re.search(r'(<body[^>]*>)(.*)(</body>)', data, re.DOTALL) or re.search(
+        r'^(\s*(?:<[?!][^>]*>\s*)*<[^>]+>)(.*)(</[^>]+>\s*)$', data, re.DOTALL
+    )
+    if match:
+        return data[: match.start(2)] + match.group(2) * factor + data[match.end(2) :]
+    return '\n'.join([data.rstrip('\n')] * factor) + '\n'
+
+
+def measure(
+    pipeline: FilterPipeline, step: FilterStep, state: JobState, data: Union[bytes, str], min_time: float, repeat: int
+) -> Dict[str, Any]:
+    """Returns the applications per second (best of repeat timings of at least min_time seconds) and the peak memory
+    allocated in applying the filter of the pipeline once."""
+    timer = timeit.Timer(lambda: pipeline.process(state, data, [step]))
+    number = 1
+    while True:
+        seconds = timer.timeit(number)
+        if seconds >= min_time:
+            break
+        number = number * 10 if seconds == 0 else max(number * 2, math.ceil(number * min_time / seconds * 1.1))
+    seconds = min([seconds] + timer.repeat(repeat - 1, number)) / number
+
+    tracemalloc.start()
+    try:
+        pipeline.process(state, data, [step])
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'ops_per_second': 1 / seconds, 'peak_alloc_kb': peak / 1024}
+
+
+def run_case(
+    case: Case, factor: int, kinds: List[str], min_time: float, repeat: int
+) -> Union[List[Dict[str, Any]], str]:
+    """Applies the filters of the case in turn to its data scaled up by factor, measuring each one of the kinds
+    requested (all if empty). Returns the results, or the reason why the case is skipped."""
+    corpus, name, filter_spec, data = case
+    scaled_data = scale_data(data, factor)
+    if scaled_data is None:
+        return 'data can not be scaled'
+    data = scaled_data
+    job = JobBase.unserialize({'url': name if corpus == 'docs' else f'https://example.com/{name}', 'index_number': 1})
+    state = JobState(None, job)
+    pipeline = FilterPipeline(filter_spec)
+    results = []
+    for step_number, step in enumerate(pipeline.steps):
+        if not FilterBase.is_deterministic_filter_kind(step.kind):
+            return f'{step.kind} runs external commands'
+        try:
+            output = pipeline.process(state, data, [step])
+        except Exception as e:  # e.g. optional package not installed
+            return f'{step.kind}: {e.__class__.__name__}: {e}'
+        if not kinds or step.kind in kinds:
+            result = measure(pipeline, step, state, data, min_time, repeat)
+            results.append(
+                {
+                    'corpus': corpus,
+                    'case': name,
+                    'step': step_number,
+                    'kind': step.kind,
+                    'scale': factor,
+                    'size': len(data),
+                    **result,
+                }
+            )
+        data = output
+    return results
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    """Runs all the cases at all the scales, returning all the results."""
+    results = []
+    skipped = {}
+    for case in load_cases():
+        corpus, name, filter_spec, _ = case
+        if args.kinds and not any(
+            filter_kind in args.kinds for filter_kind, _ in FilterBase.normalize_filter_list(filter_spec)
+        ):
+            continue
+        for factor in args.scales:
+            case_results = run_case(case, factor, args.kinds, args.min_time, args.repeat)
+            if isinstance(case_results, str):
+                skipped[f'{corpus} {name} x{factor}'] = case_results
+            else:
+                results.extend(case_results)
+    for case_name, reason in skipped.items():
+        print(f'Skipped {case_name}: {reason}', file=sys.stderr)
+    return {
+        'version': __version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.time(),
+        'parameters': {'scales': args.scales, 'kinds': args.kinds, 'min_time': args.min_time, 'repeat': args.repeat},
+        'results': results,
+        'skipped': skipped,
+    }
+
+
+def result_key(result: Dict[str, Any]) -> Tuple[str, str, int, str, int]:
+    return result['corpus'], result['case'], result['step'], result['kind'], result['scale']
+
+
+def iter_report(
+    benchmarks: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None, by_case: bool = False
+) -> Iterator[str]:
+    """Yields the lines of a table of the results by filter kind and scale (or by case if by_case), compared to those
+    of the baseline if given (the change in speed by filter kind being the geometric mean of that of its cases)."""
+    baseline_results = {result_key(result): result for result in (baseline or {}).get('results', [])}
+    header = f'{"Filter":<24} {"Scale":>5} {"Cases":>5} {"KB in":>8} {"Ops/s":>10} {"Peak KB":>9}'
+    if baseline:
+        header += f' {"vs " + baseline["version"]:>12}'
+    if by_case:
+        header += '  Case'
+    yield header
+
+    groups: Dict[Tuple[Any, ...], List[Dict[str, Any]]] = {}
+    for result in benchmarks['results']:
+        key = result_key(result) if by_case else (result['kind'], result['scale'])
+        groups.setdefault(key, []).append(result)
+    for key, results in sorted(groups.items(), key=lambda item: (item[1][0]['kind'], item[1][0]['scale'])):
+        line = (
+            f'{results[0]["kind"]:<24} {results[0]["scale"]:>5} {len(results):>5} '
+            f'{statistics.median(result["size"] for result in results) / 1024:>8.1f} '
+            f'{statistics.median(result["ops_per_second"] for result in results):>10.1f} '
+            f'{max(result["peak_alloc_kb"] for result in results):>9.1f}'
+        )
+        if baseline:
+            ratios = [
+                result['ops_per_second'] / baseline_results[result_key(result)]['ops_per_second']
+                for result in results
+                if result_key(result) in baseline_results
+            ]
+            change = f'{math.exp(statistics.mean(map(math.log, ratios))) - 1:+.1%}' if ratios else 'n/a'
+            line += f' {change:>12}'
+        if by_case:
+            line += f'  {results[0]["corpus"]} {results[0]["case"]} #{results[0]["step"]}'
+        yield line
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        '--kinds', nargs='+', default=[], help='only measure these filters (default: all)', metavar='KIND'
+    )
+    parser.add_argument(
+        '--scales', nargs='+', type=int, default=[1, 100], help='factors by which data is scaled up (default: 1 100)'
+    )
+    parser.add_argument(
+        '--min-time', type=float, default=0.1, help='minimum duration of each timing in seconds (default: 0.1)'
+    )
+    parser.add_argument('--repeat', type=int, default=3, help='number of timings of each filter (default: 3)')
+    parser.add_argument('--by-case', action='store_true', help='report the results of each case')
+    parser.add_argument('--output', type=Path, help='save the results to this JSON file')
+    parser.add_argument('--compare', type=Path, help='compare the speed with the results in this JSON file')
+    args = parser.parse_args()
+
+    benchmarks = run_benchmarks(args)
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    for line in iter_report(benchmarks, baseline, args.by_case):
+        print(line)
+    if args.output:
+        args.output.write_text(json.dumps(benchmarks, indent=2))
+
+
+if __name__ == '__main__':
+    main()
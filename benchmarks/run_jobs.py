@@ -0,0 +1,420 @@
+"""Benchmark of the end-to-end running of jobs (Urlwatch.run_jobs and close, i.e. including reports and saving to the
+database) against a local HTTP server serving synthetic pages.
+
+Each scenario (database engine and number of jobs) is run in its own process, so that its peak memory usage (RSS) is
+measured independently of the others, for a number of rounds: all jobs are new in the first one, while in the
+following ones the pages change at the rate requested. The results (throughput, peak RSS and the time spent in each
+phase of the run, as measured by --profile) are printed and can be saved to a JSON file to be compared with those of
+another version of webchanges, e.g.:
+
+   python benchmarks/run_jobs.py --jobs 100 1000 --output new.json --compare old.json
+
+Run from the root of the repository (or with webchanges installed). The 'redis' engine is run against an in-process
+stand-in for a redis server (see StandInRedis), so it measures the overhead of webchanges' redis storage only.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from webchanges import __project_name__, __version__  # noqa: E402 module level import not at top of file
+from webchanges.config import CommandConfig  # noqa: E402
+from webchanges.main import Urlwatch  # noqa: E402
+from webchanges.storage import (  # noqa: E402
+    CacheDirStorage,
+    CacheRedisStorage,
+    CacheSQLite3Storage,
+    CacheStorage,
+    YamlConfigStorage,
+    YamlJobsStorage,
+)
+from webchanges.util import profiler  # noqa: E402
+
+ENGINES = ('sqlite3', 'textfiles', 'redis')
+
+
+def chance(*key: Any) -> float:
+    """Returns a deterministic pseudo-random number in [0, 1) for the key."""
+    digest = hashlib.sha1(repr(key).encode()).digest()  # nosec: B303 not used for security
+    return int.from_bytes(digest[:8], 'big') / 2**64
+
+
+class SyntheticSite(object):
+    """The pages served by the local HTTP server: '/page/<n>' is page n, made of size bytes of HTML. Each time the
+    generation is incremented (by requesting '/next-generation'), each page changes with a probability of
+    change_rate; pages respond with an HTTP 500 error with a probability of error_rate. Responses are delayed by
+    latency seconds, and pages have an ETag (and respond HTTP 304 to a matching If-None-Match) if etag is set."""
+
+    def __init__(
+        self, size: int, change_rate: float, error_rate: float, latency: float, etag: bool, seed: int = 0
+    ) -> None:
+        self.size = size
+        self.change_rate = change_rate
+        self.error_rate = error_rate
+        self.latency = latency
+        self.etag = etag
+        self.seed = seed
+        self.generation = 0
+
+    def version(self, page: int) -> int:
+        """Returns the generation at which the page last changed."""
+        for generation in range(self.generation, 0, -1):
+            if chance(self.seed, 'change', page, generation) < self.change_rate:
+                return generation
+        return 0
+
+    def body(self, page: int, version: int) -> bytes:
+        lines = [f'<html><head><title>Page {page}</title></head><body>']
+        length = len(lines[0])
+        line_number = 0
+        while length < self.size:
+            line = f'<p class="line">Page {page} version {version} line {line_number}: lorem ipsum dolor sit amet</p>'
+            lines.append(line)
+            length += len(line) + 1
+            line_number += 1
+        lines.append('</body></html>')
+        return '\n'.join(lines).encode()
+
+    def handler(self) -> type:
+        """Returns the request handler class of the HTTP server of the site."""
+        site = self
+
+        class SyntheticSiteHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self) -> None:  # noqa: N802 Function name should be lowercase
+                parts = self.path.strip('/').split('/')
+                if parts[0] == 'next-generation':
+                    site.generation += 1
+                    self.respond(200, str(site.generation).encode())
+                    return
+                if parts[0] != 'page' or len(parts) != 2 or not parts[1].isdigit():
+                    self.respond(404)
+                    return
+
+                if site.latency:
+                    time.sleep(site.latency)
+                page = int(parts[1])
+                if chance(site.seed, 'error', page, site.generation) < site.error_rate:
+                    self.respond(500)
+                    return
+                version = site.version(page)
+                etag = f'"{page}-{version}"' if site.etag else None
+                if etag and self.headers.get('If-None-Match') == etag:
+                    self.respond(304)
+                    return
+                self.respond(200, site.body(page, version), etag)
+
+            def respond(self, status: int, body: bytes = b'', etag: Optional[str] = None) -> None:
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                if etag:
+                    self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: object) -> None:
+                pass
+
+        return SyntheticSiteHandler
+
+
+def start_server(site: SyntheticSite) -> Tuple[ThreadingHTTPServer, str]:
+    """Starts the HTTP server of the site in a thread and returns it with its base URL."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), site.handler())
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+class StandInRedis(object):
+    """An in-process stand-in for a redis server, implementing the commands used by CacheRedisStorage."""
+
+    class connection_pool:
+        @staticmethod
+        def disconnect() -> None:
+            pass
+
+    def __init__(self) -> None:
+        self.lists: Dict[bytes, List[bytes]] = {}
+        self.hashes: Dict[bytes, Dict[bytes, bytes]] = {}
+
+    @staticmethod
+    def _bytes(value: Union[str, bytes, float]) -> bytes:
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def keys(self, pattern: bytes) -> List[bytes]:
+        return [key for key in self.lists if key.startswith(pattern.rstrip(b'*'))]
+
+    def lindex(self, key: str, index: int) -> Optional[bytes]:
+        values = self.lists.get(self._bytes(key), [])
+        return values[index] if -len(values) <= index < len(values) else None
+
+    def llen(self, key: str) -> int:
+        return len(self.lists.get(self._bytes(key), []))
+
+    def lpush(self, key: str, value: bytes) -> int:
+        values = self.lists.setdefault(self._bytes(key), [])
+        values.insert(0, value)
+        return len(values)
+
+    def lset(self, key: str, index: int, value: bytes) -> bool:
+        self.lists[self._bytes(key)][index] = value
+        return True
+
+    def ltrim(self, key: str, start: int, end: int) -> bool:
+        values = self.lists.get(self._bytes(key), [])
+        values[:] = values[start : (end + 1) or None]
+        return True
+
+    def delete(self, key: str) -> int:
+        return int(self.lists.pop(self._bytes(key), None) is not None)
+
+    def hset(self, name: str, key: str, value: Union[str, float]) -> int:
+        self.hashes.setdefault(self._bytes(name), {})[self._bytes(key)] = self._bytes(value)
+        return 1
+
+    def hgetall(self, name: str) -> Dict[bytes, bytes]:
+        return dict(self.hashes.get(self._bytes(name), {}))
+
+    def hdel(self, name: str, key: str) -> int:
+        return int(self.hashes.get(self._bytes(name), {}).pop(self._bytes(key), None) is not None)
+
+
+class StandInRedisStorage(CacheRedisStorage):
+    """CacheRedisStorage connected to a StandInRedis, which is kept when the storage is closed."""
+
+    def __init__(self, filename: str, db: StandInRedis) -> None:
+        CacheStorage.__init__(self, filename)
+        self.db = db
+
+    def close(self) -> None:
+        pass
+
+
+def open_storage(engine: str, directory: Path, redis_db: StandInRedis) -> CacheStorage:
+    """Opens the database of the engine."""
+    if engine == 'sqlite3':
+        return CacheSQLite3Storage(directory.joinpath('cache.db'))
+    if engine == 'textfiles':
+        directory.joinpath('cache').mkdir(exist_ok=True)
+        return CacheDirStorage(directory.joinpath('cache'))
+    if engine == 'redis':
+        return StandInRedisStorage('redis://stand-in', redis_db)
+    raise ValueError(f'Unknown database engine {engine}')
+
+
+def peak_rss_kb() -> Optional[int]:
+    """Returns the peak resident set size of the process in kB (None if not available)."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss // 1024 if sys.platform == 'darwin' else max_rss  # bytes on macOS, kB elsewhere
+
+
+def run_scenario(
+    base_url: str, engine: str, jobs: int, rounds: int, filters: List[str], worker: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """Runs the jobs for the number of rounds and returns the results of each round; to be run in its own process
+    (see run_benchmarks), as the peak RSS is that of the process."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        directory = Path(tmp_dir)
+        config_file = directory.joinpath('config.yaml')
+        config = {'report': {'stdout': {'enabled': True, 'color': False}}, 'worker': worker}
+        config_file.write_text(yaml.safe_dump(config))
+        jobs_file = directory.joinpath('jobs.yaml')
+        job_list = [{'url': f'{base_url}/page/{i}', **({'filter': filters} if filters else {})} for i in range(jobs)]
+        jobs_file.write_text(yaml.safe_dump_all(job_list))
+        redis_db = StandInRedis()
+
+        results = []
+        for round_number in range(1, rounds + 1):
+            if round_number > 1:
+                urllib.request.urlopen(f'{base_url}/next-generation').read()  # nosec: B310 local server
+            command_config = CommandConfig(
+                __project_name__, directory, config_file, jobs_file, directory.joinpath('hooks.py'), '', False
+            )
+            profiler.phases = {}
+            profiler.enable()
+            start = time.perf_counter()
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                urlwatcher = Urlwatch(
+                    command_config,
+                    YamlConfigStorage(config_file),
+                    open_storage(engine, directory, redis_db),
+                    YamlJobsStorage(jobs_file),
+                )
+                urlwatcher.run_jobs()
+                urlwatcher.close()
+            seconds = time.perf_counter() - start
+            profiler.enabled = False
+            verbs: Dict[str, int] = {}
+            for job_state in urlwatcher.report.job_states:
+                verbs[job_state.verb] = verbs.get(job_state.verb, 0) + 1
+            results.append(
+                {
+                    'engine': engine,
+                    'jobs': jobs,
+                    'round': round_number,
+                    'seconds': seconds,
+                    'jobs_per_second': jobs / seconds,
+                    'peak_rss_kb': peak_rss_kb(),
+                    'verbs': verbs,
+                    'phases': {
+                        name: {'count': int(count), 'wall': wall, 'cpu': cpu}
+                        for name, (count, wall, cpu) in profiler.phases.items()
+                    },
+                }
+            )
+    return results
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    """Starts the local HTTP server and runs each scenario in a child process, returning all the results."""
+    site = SyntheticSite(args.size, args.change_rate, args.error_rate, args.latency, not args.no_etag, args.seed)
+    server, base_url = start_server(site)
+    results = []
+    try:
+        for engine in args.engines:
+            for jobs in args.jobs:
+                print(f'Running {jobs} jobs with {engine} ...', file=sys.stderr)
+                child_args = [
+                    sys.executable,
+                    __file__,
+                    '--child',
+                    base_url,
+                    '--engines',
+                    engine,
+                    '--jobs',
+                    str(jobs),
+                    '--rounds',
+                    str(args.rounds),
+                ]
+                for filter_kind in args.filter:
+                    child_args.extend(('--filter', filter_kind))
+                for setting in args.worker:
+                    child_args.extend(('--worker', setting))
+                child = subprocess.run(child_args, stdout=subprocess.PIPE, check=True)  # nosec: B603
+                results.extend(json.loads(child.stdout))
+    finally:
+        server.shutdown()
+        server.server_close()
+    return {
+        'version': __version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.time(),
+        'parameters': {
+            'size': args.size,
+            'change_rate': args.change_rate,
+            'error_rate': args.error_rate,
+            'latency': args.latency,
+            'etag': not args.no_etag,
+            'rounds': args.rounds,
+            'filter': args.filter,
+            'worker': worker_settings(args.worker),
+        },
+        'results': results,
+    }
+
+
+def worker_settings(settings: List[str]) -> Dict[str, Any]:
+    """Parses the KEY=VALUE settings of the worker section of the configuration."""
+    return {key: yaml.safe_load(value) for key, value in (setting.split('=', 1) for setting in settings)}
+
+
+def iter_report(benchmarks: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """Yields the lines of a table of the results, compared to those of the baseline if given."""
+    baseline_results = {
+        (result['engine'], result['jobs'], result['round']): result for result in (baseline or {}).get('results', [])
+    }
+    header = f'{"Engine":<10} {"Jobs":>6} {"Round":>5} {"Seconds":>8} {"Jobs/s":>8} {"RSS MB":>7}  Slowest phases'
+    if baseline:
+        header = header.replace('  Slowest', f' {"vs " + baseline["version"]:>12}  Slowest')
+    yield header
+    for result in benchmarks['results']:
+        rss = f'{result["peak_rss_kb"] / 1024:.0f}' if result['peak_rss_kb'] else '-'
+        line = (
+            f'{result["engine"]:<10} {result["jobs"]:>6} {result["round"]:>5} {result["seconds"]:>8.2f} '
+            f'{result["jobs_per_second"]:>8.1f} {rss:>7}'
+        )
+        if baseline:
+            previous = baseline_results.get((result['engine'], result['jobs'], result['round']))
+            change = f'{result["jobs_per_second"] / previous["jobs_per_second"] - 1:+.1%}' if previous else 'n/a'
+            line += f' {change:>12}'
+        phases = sorted(result['phases'].items(), key=lambda item: -item[1]['wall'])[:3]
+        yield line + '  ' + ', '.join(f'{name} {phase["wall"]:.2f}s' for name, phase in phases)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', nargs='+', type=int, default=[100, 1000], help='numbers of jobs (default: 100 1000)')
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES), help='database engines')
+    parser.add_argument('--rounds', type=int, default=2, help='number of runs of the jobs (default: 2)')
+    parser.add_argument('--size', type=int, default=20_000, help='size of the pages in bytes (default: 20000)')
+    parser.add_argument(
+        '--change-rate', type=float, default=0.1, help='fraction of pages changing each round (default: 0.1)'
+    )
+    parser.add_argument(
+        '--error-rate', type=float, default=0.0, help='fraction of pages responding HTTP 500 (default: 0)'
+    )
+    parser.add_argument('--latency', type=float, default=0.0, help='delay of each response in seconds (default: 0)')
+    parser.add_argument('--no-etag', action='store_true', help='pages have no ETag (i.e. never respond HTTP 304)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the changes and errors of pages (default: 0)')
+    parser.add_argument('--filter', action='append', default=[], help='filter applied to all jobs (can be repeated)')
+    parser.add_argument(
+        '--worker',
+        action='append',
+        default=['max_jobs_per_host=0'],
+        help='KEY=VALUE setting of the worker section of the configuration (default: max_jobs_per_host=0)',
+        metavar='KEY=VALUE',
+    )
+    parser.add_argument('--output', type=Path, help='save the results to this JSON file')
+    parser.add_argument('--compare', type=Path, help='compare the throughput with the results in this JSON file')
+    parser.add_argument('--child', help=argparse.SUPPRESS, metavar='BASE_URL')
+    args = parser.parse_args()
+
+    if args.child:
+        # running a scenario: the command line arguments are not for CommandConfig
+        sys.argv = sys.argv[:1]
+        results = run_scenario(
+            args.child, args.engines[0], args.jobs[0], args.rounds, args.filter, worker_settings(args.worker)
+        )
+        print(json.dumps(results))
+        return
+
+    benchmarks = run_benchmarks(args)
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    for line in iter_report(benchmarks, baseline):
+        print(line)
+    if args.output:
+        args.output.write_text(json.dumps(benchmarks, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -62,6 +62,7 @@ SETUP = {
     'entry_points': {'console_scripts': [f'{project.__project_name__}={project.__package__}.cli:main']},
     'extras_require': {
         'use_browser': ['pyppeteer'],
+        'aiohttp': ['aiohttp'],
         'beautify': ['beautifulsoup4', 'jsbeautifier', 'cssbeautifier'],
         'bs4': ['beautifulsoup4'],
         'jq': ['jq;os_name!="nt"'],
@@ -0,0 +1,36 @@
+"""Test the benchmarks (with a few jobs, to check that they run)."""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+here = Path(__file__).parent
+
+
+def test_run_jobs_benchmark(tmp_path):
+    output = tmp_path.joinpath('results.json')
+    args = ['--jobs', '4', '--rounds', '2', '--change-rate', '0.5', '--error-rate', '0.25', '--output', str(output)]
+    subprocess.run([sys.executable, str(here.parent.joinpath('benchmarks', 'run_jobs.py')), *args], check=True)
+    benchmarks = json.loads(output.read_text())
+    assert [(result['engine'], result['round']) for result in benchmarks['results']] == [
+        (engine, round_number) for engine in ('sqlite3', 'textfiles', 'redis') for round_number in (1, 2)
+    ]
+    for result in benchmarks['results']:
+        assert sum(result['verbs'].values()) == 4
+        assert result['jobs_per_second'] > 0
+        assert result['phases']['job retrieve']['count'] == 4
+    assert 'new' in benchmarks['results'][0]['verbs'] and 'new' not in benchmarks['results'][1]['verbs']
+
+
+def test_filters_benchmark(tmp_path):
+    output = tmp_path.joinpath('results.json')
+    args = ['--kinds', 'css', 're.sub', '--scales', '1', '10', '--min-time', '0.001', '--output', str(output)]
+    subprocess.run([sys.executable, str(here.parent.joinpath('benchmarks', 'filters.py')), *args], check=True)
+    benchmarks = json.loads(output.read_text())
+    assert {(result['kind'], result['scale']) for result in benchmarks['results']} == {
+        (kind, scale) for kind in ('css', 're.sub') for scale in (1, 10)
+    }
+    for result in benchmarks['results']:
+        assert result['ops_per_second'] > 0
+        assert result['peak_alloc_kb'] > 0
@@ -1,6 +1,9 @@
 """Test commands."""
 
+import argparse
 import os
+import sqlite3
+import subprocess
 import sys
 import time
 from pathlib import Path, PurePath
@@ -16,7 +19,7 @@ from webchanges.cli import (
     setup_logger_verbose,
 )
 from webchanges.command import UrlwatchCommand
-from webchanges.config import CommandConfig
+from webchanges.config import CommandConfig, shard_type
 from webchanges.main import Urlwatch
 from webchanges.storage import CacheSQLite3Storage, YamlConfigStorage, YamlJobsStorage
 
@@ -263,6 +266,31 @@ def test_list_error_jobs(capsys):
     assert 'Jobs, if any, with errors or returning no data after filtering in ' in message
 
 
+def test_list_error_jobs_in_jobs_file_order(tmp_path, capsys):
+    # the first job fails last (its invalid regular expression is applied after a second), but is listed first
+    jobs_file = tmp_path.joinpath('jobs-errors.yaml')
+    jobs_file.write_text(
+        f'command: {sys.executable} -c "import time; time.sleep(1); print(1)"\n'
+        f'filter:\n'
+        f'  - re.sub: "("\n'
+        f'---\n'
+        f'command: {sys.executable} -c "print(2)"\n'
+        f'filter:\n'
+        f'  - re.sub: "("\n'
+    )
+    jobs_storage = YamlJobsStorage(jobs_file)
+    command_config = CommandConfig(__project_name__, config_dir, config_file, jobs_file, hooks_file, cache_file, False)
+    setattr(command_config, 'errors', True)
+    urlwatcher = Urlwatch(command_config, config_storage, cache_storage, jobs_storage)  # main.py
+    urlwatch_command = UrlwatchCommand(urlwatcher)
+    with pytest.raises(SystemExit) as pytest_wrapped_e:
+        urlwatch_command.handle_actions()
+    assert pytest_wrapped_e.value.code == 0
+    message = capsys.readouterr().out
+    errors = [line for line in message.splitlines() if ': Error: ' in line]
+    assert [line.split(':')[0].strip() for line in errors] == ['1', '2']
+
+
 def test_modify_urls(capsys):
     setattr(command_config, 'add', 'url=https://www.example.com/#test_modify_urls')
     urlwatch_command = UrlwatchCommand(urlwatcher)
@@ -356,6 +384,94 @@ def test_rollback_cache(capsys):
     assert 'No snapshots found after' in message
 
 
+def test_shard_type():
+    assert shard_type('2/3') == (2, 3)
+    for value in ('0/3', '4/3', '1', 'a/b'):
+        with pytest.raises(argparse.ArgumentTypeError):
+            shard_type(value)
+
+
+def test_merge_cache(capsys, tmp_path):
+    shard_file = tmp_path.joinpath('shard.db')
+    shard_storage = CacheSQLite3Storage(shard_file)
+    shard_storage.save(guid='guid_1', data='data_1', timestamp=1.0, tries=0, etag='')
+    shard_storage.save(guid='guid_2', data='data_2', timestamp=2.0, tries=0, etag='')
+    shard_storage.save_duration('guid_1', 1.5)
+    shard_storage.close()
+
+    setattr(command_config, 'merge_cache', [shard_file, tmp_path.joinpath('missing.db')])
+    urlwatcher.cache_storage = CacheSQLite3Storage(tmp_path.joinpath('merged.db'))
+    urlwatch_command = UrlwatchCommand(urlwatcher)
+    with pytest.raises(SystemExit) as pytest_wrapped_e:
+        urlwatch_command.handle_actions()
+    setattr(command_config, 'merge_cache', None)
+    assert pytest_wrapped_e.value.code == 1
+    message = capsys.readouterr().out
+    assert message.startswith(f'Merged 2 snapshots from {shard_file}\n')
+    assert 'missing.db not found' in message
+
+    # merging again does not duplicate snapshots
+    merged_storage = urlwatcher.cache_storage
+    assert merged_storage.merge(shard_file) == 0
+    assert merged_storage.load('guid_2')[0] == 'data_2'
+    assert merged_storage.load_durations() == {'guid_1': 1.5}
+    merged_storage.close()
+
+
+def test_merge_cache_not_a_database(capsys, tmp_path):
+    text_file = tmp_path.joinpath('text.db')
+    text_file.write_text('not a database')
+    other_file = tmp_path.joinpath('other.db')
+    other_db = sqlite3.connect(other_file)
+    other_db.execute('CREATE TABLE other (uuid TEXT)')
+    other_db.commit()
+    other_db.close()
+
+    urlwatcher.cache_storage = CacheSQLite3Storage(tmp_path.joinpath('merged.db'))
+    urlwatch_command = UrlwatchCommand(urlwatcher)
+    for filename in (text_file, other_file):
+        setattr(command_config, 'merge_cache', [filename])
+        with pytest.raises(SystemExit) as pytest_wrapped_e:
+            urlwatch_command.handle_actions()
+        setattr(command_config, 'merge_cache', None)
+        assert pytest_wrapped_e.value.code == 1
+        assert capsys.readouterr().out.startswith(f'{filename} is not a webchanges sqlite3 database (')
+    assert urlwatcher.cache_storage.get_guids() == []
+    urlwatcher.cache_storage.close()
+
+
+def test_show_stats(capsys, tmp_path):
+    urlwatcher.cache_storage = CacheSQLite3Storage(tmp_path.joinpath('stats.db'))
+    urlwatch_command = UrlwatchCommand(urlwatcher)
+    assert urlwatch_command.show_stats(10) == 0
+    assert capsys.readouterr().out == 'No run statistics recorded yet\n'
+
+    for run in range(1, 3):
+        urlwatcher.cache_storage.save_run_stats(
+            run * 3600.0,
+            [
+                ('guid_1', 'https://example.com/', 'example.com', 'changed', 2.0 * run, 1.5, 0.25, 0.1, 2048, 200),
+                ('guid_2', 'echo test', '', 'unchanged', 0.5, 0.5, 0.0, None, 5, None),
+                ('guid_3', 'https://example.net/', 'example.net', 'error', 1.0, 1.0, None, None, None, 404),
+            ],
+        )
+    urlwatcher.cache_storage._copy_temp_to_permanent(delete=True)
+    setattr(command_config, 'stats', 10)
+    with pytest.raises(SystemExit) as pytest_wrapped_e:
+        urlwatch_command.handle_actions()
+    setattr(command_config, 'stats', None)
+    assert pytest_wrapped_e.value.code == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == 'Statistics of the latest 2 runs (times in seconds, data in kB)'
+    assert lines[4].split()[2:] == ['3', '1', '1', '0', '3.500', '2.000', '2.0']
+    assert 'Duration of jobs: p50 1.000, p95 4.000, max 4.000 (6 job runs)' in lines
+    slowest = lines[lines.index('Slowest jobs:') + 2].split()
+    assert slowest[:5] == ['2', '3.000', '2.000', '4.000', '4.000'] and slowest[-1] == 'https://example.com/'
+    hosts = lines[lines.index('Data retrieved by host:') + 2].split()
+    assert hosts == ['2', '4.0', '2.0', '1.500', 'example.com']
+    urlwatcher.cache_storage.close()
+
+
 def test_check_edit_config():
     setattr(command_config, 'edit_config', True)
     urlwatch_command = UrlwatchCommand(urlwatcher)
@@ -437,3 +553,34 @@ def test_setup_logger_verbose(caplog):
 def test_locate_storage_file():
     file = locate_storage_file(Path('test'), Path('nowhere'), '.noext')
     assert file == PurePath('test')
+
+
+# modules only needed by some filters, reporters or job types, which are slow to import
+HEAVY_MODULES = {'aiohttp', 'aioxmpp', 'bs4', 'chump', 'html2text', 'jq', 'keyring', 'lxml', 'markdown2', 'pyppeteer'}
+
+
+@pytest.mark.parametrize('args', (['--list'], ['--features'], ['--test-filter', '1']))
+def test_startup_imports(args, tmp_path):
+    """Core commands do not import heavy modules they don't use (measured with python -X importtime)."""
+    jobs_yaml = tmp_path.joinpath('jobs.yaml')
+    jobs_yaml.write_text('command: echo test\n')
+    env = {
+        **os.environ,
+        'PYTHONPATH': os.pathsep.join(filter(None, (str(here.parent), os.getenv('PYTHONPATH')))),
+        'XDG_CACHE_HOME': str(tmp_path),
+    }
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-m', 'webchanges.cli', '--config', str(config_file), '--jobs']
+        + [str(jobs_yaml), '--cache', str(tmp_path.joinpath('cache.db')), '--hooks', str(tmp_path.joinpath('hooks.py'))]
+        + args,
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    assert result.returncode == 0, result.stderr
+    imported = {
+        line.rpartition('|')[2].strip().partition('.')[0]
+        for line in result.stderr.splitlines()
+        if line.startswith('import time:')
+    }
+    assert not imported & HEAVY_MODULES
@@ -0,0 +1,59 @@
+"""Fixtures shared by the tests."""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+import pytest
+
+
+class LocalRequestHandler(BaseHTTPRequestHandler):
+    """Serves '/page/<name>' as a small HTML page with an ETag (responding HTTP 304 to a matching If-None-Match),
+    '/status/<code>' with that HTTP status code and '/client' with the port of the client (to check connection reuse).
+    Connections are kept alive."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self) -> None:  # noqa: N802 Function name should be lowercase
+        parts = self.path.strip('/').split('/')
+        if parts[0] == 'client':
+            body = str(self.client_address[1]).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Set-Cookie', 'session=secret')
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if parts[0] == 'status' and len(parts) == 2:
+            self.send_response(int(parts[1]))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = f'<html><head><title>Page {parts[-1]}</title></head><body>{self.path}</body></html>'.encode()
+        etag = f'"{parts[-1]}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture(scope='module')
+def local_http_server() -> Iterator[str]:
+    """Runs a local HTTP server in a thread for the duration of the test module and returns its base URL."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), LocalRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
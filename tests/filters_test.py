@@ -3,13 +3,17 @@
 import importlib.util
 import logging
 import os
+import pickle
 import sys
 
 import pytest
 
 import yaml
+from lxml import etree
 
-from webchanges.filters import FilterBase
+from webchanges.filters import FilterBase, FilterPipeline, LxmlParser
+from webchanges.handler import JobState
+from webchanges.jobs import JobBase
 
 logger = logging.getLogger(__name__)
 
@@ -80,6 +84,107 @@ def test_filters(test_name, test_data):
     assert result == expected_result.rstrip()
 
 
+@pytest.mark.parametrize('test_name, test_data', FILTER_TESTS.items())
+def test_filter_pipeline(test_name, test_data):
+    """A FilterPipeline gives the same results every time it's reused, also once pickled (without its prepared
+    subfilters)."""
+    if 'bs4' in str(test_data['filter']) and not bs4_is_installed:
+        pytest.skip("'beautifulsoup4' package is not installed")
+    pipeline = FilterPipeline(test_data['filter'])
+    job_state = JobState(None, JobBase.unserialize({'url': 'https://example.com/', 'index_number': 1}))
+    for _ in range(2):
+        assert pipeline.process(job_state, test_data['data']) == test_data['expected_result'].rstrip()
+    for step in pipeline.steps:
+        if step.kind in ('css', 'xpath', 're.sub') or 're' in step.subfilter:
+            assert step.prepared is not None
+
+    unpickled_pipeline = pickle.loads(pickle.dumps(pipeline))
+    assert unpickled_pipeline.filter_list == pipeline.filter_list
+    assert unpickled_pipeline.process(job_state, test_data['data']) == test_data['expected_result'].rstrip()
+
+
+def test_passes_elements():
+    """Only the elements selected by css and xpath filters are passed to the element-by-* filter that follows."""
+    assert FilterBase.passes_elements('css', 'element-by-class')
+    assert FilterBase.passes_elements('xpath', 'element-by-tag')
+    assert not FilterBase.passes_elements('css', 'css')
+    assert not FilterBase.passes_elements('xpath', 'html2text')
+    assert not FilterBase.passes_elements('element-by-tag', 'element-by-class')
+    assert not FilterBase.passes_elements('css', None)
+
+
+# Documents whose elements are passed by a css or xpath filter to an element-by-* filter, which walks them instead of
+# parsing their serialization (except for raw-text elements such as script and style)
+ELEMENTS_PARITY_DATA = {
+    'mixed_content': '<div>text <b>bold</b> tail <i>it</i> end</div>',
+    'comments': '<div><p>x</p><!-- comment --><p>y</p><?pi x?></div>',
+    'tails': '<div><p>x</p>tail<p>y</p>more\n  <p>z</p>\n</div>',
+    'deep_nesting': '<div>' + '<div>' * 40 + '<p>a</p><p>b</p>' + '</div>' * 40 + '</div>',
+    'deep_nesting_text': '<div>' + '<div><p>a</p>' * 35 + 'deep' + '</div>' * 35 + '</div>',
+    'script': '<div><script>if (a < b) {x = "</p>"}</script><p>z</p></div>',
+    'style': '<div><style>p > a {}</style><p>z</p></div>',
+    'pre': '<div><pre>  a\n   b  <b>c</b>\n</pre><p>z</p></div>',
+    'entities': '<div><p title="a &quot;q&quot; &amp; b">a &amp; b &lt;c&gt; &nbsp;x &#x1F600;</p></div>',
+    'void_elements': '<div><br><img src="x.png" alt=""><input disabled><p></p><span/></div>',
+    'nested_matches': '<div><ul><li class="c">a<ul><li class="c">b</li></ul></li><li class="c">c</li></ul></div>',
+}
+
+
+@pytest.mark.parametrize('data', ELEMENTS_PARITY_DATA.values(), ids=ELEMENTS_PARITY_DATA.keys())
+@pytest.mark.parametrize(
+    'filter_list',
+    [
+        [{'css': 'body > div'}, {'element-by-tag': 'div'}],
+        [{'css': 'body > div'}, {'element-by-tag': 'p'}],
+        [{'xpath': '//div'}, {'element-by-tag': 'div'}],
+        [{'xpath': '//li | //p'}, {'element-by-class': 'c'}],
+    ],
+)
+def test_filter_pipeline_passing_elements(data, filter_list):
+    """Passing the elements selected by a css or xpath filter to an element-by-* filter gives the same result as
+    parsing their serialization."""
+    job_state = JobState(None, JobBase.unserialize({'url': 'https://example.com/', 'index_number': 1}))
+    expected = data
+    for filter_kind, subfilter in FilterBase.normalize_filter_list(filter_list):
+        expected = FilterBase.__subclasses__[filter_kind](FakeJob(), None).filter(expected, subfilter)
+    assert FilterPipeline(filter_list).process(job_state, data) == expected
+
+
+SELECTION_DATA = (
+    '<html><head><title>t</title></head><body><div id="a" class="c">text <b>bold</b> tail <!-- comment -->'
+    '<a href="/x">link</a>\n  <p>p1</p><p>p2 &amp; <i>i</i></p></div><div>other</div></body></html>'
+)
+
+
+@pytest.mark.parametrize(
+    'filter_kind, subfilter',
+    [
+        ('css', {'selector': 'div'}),
+        ('css', {'selector': 'div', 'method': 'xml'}),
+        ('css', {'selector': 'p', 'skip': 1}),
+        ('xpath', {'path': '//div'}),
+        ('xpath', {'path': '//div[@id="a"]/text()'}),
+        ('xpath', {'path': '//b/following-sibling::text()'}),
+        ('xpath', {'path': '//@href | //@class'}),
+        ('xpath', {'path': '//comment() | //a'}),
+        ('xpath', {'path': '//p/node()', 'maxitems': 2}),
+        ('xpath', {'path': '//*[not(*)]', 'method': 'xml'}),
+    ],
+)
+def test_lxml_filter_without_excluded_elements(monkeypatch, filter_kind, subfilter):
+    """When exclude removes no element, the css and xpath filters return the elements selected as such, with the same
+    output as when re-locating them after the removal."""
+    filtercls = FilterBase.__subclasses__[filter_kind]
+    result = filtercls(FakeJob(), None).filter(SELECTION_DATA, subfilter)
+
+    def reevaluated_elements(self):
+        selected_elems = self.selector(etree.fromstring(self.data, self.parser))
+        return [el for el in map(self._reevaluate, selected_elems) if el is not None]
+
+    monkeypatch.setattr(LxmlParser, '_get_filtered_elements', reevaluated_elements)
+    assert filtercls(FakeJob(), None).filter(SELECTION_DATA, subfilter) == result
+
+
 def test_invalid_filter_name_raises_valueerror():
     with pytest.raises(ValueError) as pytest_wrapped_e:
         list(FilterBase.normalize_filter_list(['afilternamethatdoesnotexist']))
@@ -1,19 +1,44 @@
 """Test the handling of jobs."""
 
 import importlib.util
+import multiprocessing
 import os
 import tempfile
+import threading
+import time
 import warnings
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import List
 
 import pytest
+import requests
 
 from webchanges import __project_name__ as project_name
 from webchanges.config import CommandConfig
-from webchanges.jobs import JobBase, ShellJob, UrlJob
+from webchanges.handler import JobState, Report
+from webchanges.jobs import (
+    BrowserJob,
+    BrowserPool,
+    DeferredError,
+    HttpSessionPool,
+    JobBase,
+    NotModifiedError,
+    ShellJob,
+    UrlJob,
+)
 from webchanges.main import Urlwatch
 from webchanges.storage import CacheSQLite3Storage, DEFAULT_CONFIG, YamlConfigStorage, YamlJobsStorage
 from webchanges.util import import_module_from_source
+from webchanges.worker import (
+    AdaptiveConcurrency,
+    merge_parallel,
+    order_jobs,
+    run_daemon,
+    run_parallel_browser,
+    run_parallel_by_host,
+    split_due_jobs,
+)
 
 minidb_is_installed = importlib.util.find_spec('minidb') is not None
 
@@ -284,3 +309,544 @@ def test_reset_tries_to_zero_when_successful_minidb():
         assert tries == 0
     finally:
         cache_storage.close()
+
+
+aiohttp_is_installed = importlib.util.find_spec('aiohttp') is not None
+aiohttp_required = pytest.mark.skipif(not aiohttp_is_installed, reason="requires 'aiohttp' package to be installed")
+
+
+def prepare_http_engine_test(http_engine: str, local_http_server: str):
+    jobs_file = data_dir.joinpath('jobs.yaml')
+
+    config_storage = YamlConfigStorage(config_file)
+    config_storage.config['worker']['http_engine'] = http_engine
+    cache_storage = CacheSQLite3Storage(cache_file)
+    jobs_storage = YamlJobsStorage(jobs_file)
+
+    urlwatch_config = CommandConfig(project_name, here, config_file, jobs_file, hooks_file, cache_file, False)
+    urlwatcher = Urlwatch(urlwatch_config, config_storage, cache_storage, jobs_storage)
+    urlwatcher.jobs = [
+        UrlJob(url=f'{local_http_server}/page/1', index_number=1),
+        UrlJob(url=f'{local_http_server}/status/404', index_number=2, ignore_http_error_codes='404'),
+        UrlJob(url=f'{local_http_server}/status/500', index_number=3),
+        UrlJob(url=Path(__file__).as_uri(), index_number=4),
+    ]
+
+    return urlwatcher, cache_storage
+
+
+@pytest.mark.parametrize('http_engine', ['requests', pytest.param('aiohttp', marks=aiohttp_required)])
+def test_http_engines(http_engine, local_http_server):
+    urlwatcher, cache_storage = prepare_http_engine_test(http_engine, local_http_server)
+    try:
+        urlwatcher.run_jobs()
+        cache_storage._copy_temp_to_permanent(delete=True)
+        verbs = {job_state.job.index_number: job_state.verb for job_state in urlwatcher.report.job_states}
+        assert verbs == {1: 'new', 3: 'error', 4: 'new'}
+        job_state = next(js for js in urlwatcher.report.job_states if js.job.index_number == 1)
+        assert job_state.new_etag == '"1"'
+        assert job_state.job.name == 'Page 1'
+
+        # second run: the ETag is sent and the server responds with HTTP 304 Not Modified
+        urlwatcher.report.job_states = []
+        urlwatcher.run_jobs()
+        verbs = {job_state.job.index_number: job_state.verb for job_state in urlwatcher.report.job_states}
+        assert verbs == {1: 'unchanged', 3: 'error', 4: 'unchanged'}
+        job_state = next(js for js in urlwatcher.report.job_states if js.job.index_number == 1)
+        assert isinstance(job_state.exception, NotModifiedError)
+    finally:
+        cache_storage.close()
+
+
+@pytest.mark.parametrize('streaming_report', [True, False])
+def test_streaming_report_discards_unreported_data(streaming_report, local_http_server):
+    urlwatcher, cache_storage = prepare_http_engine_test('requests', local_http_server)
+    urlwatcher.config_storage.config['worker']['streaming_report'] = streaming_report
+    urlwatcher.report.streaming = streaming_report
+    try:
+        urlwatcher.run_jobs()
+        cache_storage._copy_temp_to_permanent(delete=True)
+        urlwatcher.report.job_states = []
+        urlwatcher.run_jobs()
+        job_state = next(js for js in urlwatcher.report.job_states if js.job.index_number == 4)
+        assert job_state.verb == 'unchanged'
+        if streaming_report:
+            assert job_state.old_data == job_state.new_data == ''
+        else:
+            assert job_state.new_data == Path(__file__).read_text()
+    finally:
+        cache_storage.close()
+
+
+def test_unknown_http_engine(local_http_server):
+    urlwatcher, cache_storage = prepare_http_engine_test('carrier_pigeon', local_http_server)
+    try:
+        with pytest.raises(ValueError) as pytest_wrapped_e:
+            urlwatcher.run_jobs()
+        assert str(pytest_wrapped_e.value) == (
+            "Unknown HTTP engine 'carrier_pigeon' in configuration (must be 'requests' or 'aiohttp')"
+        )
+    finally:
+        cache_storage.close()
+
+
+def test_http_session_pool_reuses_connections(local_http_server):
+    cache_storage = CacheSQLite3Storage(cache_file)
+    try:
+        with HttpSessionPool(pool_size=2) as session_pool:
+            client_ports = []
+            for index_number in (1, 2):
+                job = UrlJob(url=f'{local_http_server}/client', index_number=index_number).with_defaults(DEFAULT_CONFIG)
+                with JobState(cache_storage, job, session_pool) as job_state:
+                    job_state.process()
+                    assert job_state.exception is None
+                    client_ports.append(job_state.new_data)
+            # the second job reused the connection opened by the first one
+            assert client_ports[0] == client_ports[1]
+
+            session = session_pool.get(f'{local_http_server}/client', {}, True)
+            # cookies set by the server are not kept in the shared session
+            assert not session.cookies
+            assert session_pool.get(f'{local_http_server}/page/1', {}, True) is session
+            assert session_pool.get(f'{local_http_server}/client', {}, False) is not session
+            assert session_pool.get(f'{local_http_server}/client', {'http': 'http://proxy:8080'}, True) is not session
+    finally:
+        cache_storage.close()
+
+
+def test_run_parallel_by_host():
+    """Jobs for the same host are interleaved with other hosts' ones and limited in concurrency and start delay."""
+    lock = threading.Lock()
+    running = {'a.example.com': 0, 'b.example.com': 0}
+    max_running = {'a.example.com': 0, 'b.example.com': 0}
+    starts = {'a.example.com': [], 'b.example.com': []}
+
+    def func(job_state: JobState) -> JobState:
+        if not job_state.job.url:
+            return job_state
+        host = job_state.job.url.split('/')[2]
+        with lock:
+            running[host] += 1
+            max_running[host] = max(max_running[host], running[host])
+            starts[host].append(time.monotonic())
+        time.sleep(0.1)
+        with lock:
+            running[host] -= 1
+        return job_state
+
+    jobs = [UrlJob(url=f'https://a.example.com/{i}', index_number=i) for i in range(6)]
+    jobs += [UrlJob(url=f'https://b.example.com/{i}', index_number=i + 6) for i in range(2)]
+    jobs.append(ShellJob(command='echo test', index_number=8))
+    job_states = [JobState(None, job) for job in jobs]  # type: ignore[arg-type]
+
+    results = list(run_parallel_by_host(func, job_states, max_workers=8, max_per_host=2, min_delay=0.05))
+
+    assert sorted(job_state.job.index_number for job_state in results) == list(range(9))
+    assert max_running == {'a.example.com': 2, 'b.example.com': 2}
+    # the jobs for host b were not queued behind the ones for host a
+    assert min(starts['b.example.com']) < max(starts['a.example.com'])
+    for host_starts in starts.values():
+        # allowing for some jitter in the start of threads
+        assert all(b - a >= 0.04 for a, b in zip(host_starts, host_starts[1:]))
+
+
+def test_run_parallel_browser_and_merge_parallel():
+    """Browser jobs are processed in the event loop of the browser pool, merged with the jobs run in threads."""
+    cache_storage = CacheSQLite3Storage(cache_file)
+    try:
+        with BrowserPool() as browser_pool:
+            # jobs with invalid block_elements fail without needing to launch a browser
+            browser_job_states = [
+                JobState(
+                    cache_storage,
+                    BrowserJob(url='https://www.example.com', use_browser=True, block_elements=['bad'], index_number=i),
+                    browser_pool=browser_pool,
+                )
+                for i in range(3)
+            ]
+            shell_job_states = [JobState(cache_storage, ShellJob(command='echo test', index_number=3))]
+
+            results = list(
+                merge_parallel(
+                    [
+                        run_parallel_browser(browser_job_states, browser_pool, max_jobs=2),
+                        run_parallel_by_host(lambda job_state: job_state.process(), shell_job_states),
+                    ]
+                )
+            )
+
+        assert sorted(job_state.job.index_number for job_state in results) == [0, 1, 2, 3]
+        assert all(isinstance(job_state.exception, ValueError) for job_state in browser_job_states)
+        assert shell_job_states[0].new_data == 'test\n'
+    finally:
+        cache_storage.close()
+
+
+def test_cpu_bound_filters_in_process_pool(tmp_path):
+    """CPU-heavy filters run in the process pool give the same result, and their changes to the job are kept."""
+    html_file = tmp_path.joinpath('page.html')
+    html_file.write_text('<html><body><div class="a"><b>bold</b> text</div><div class="b">other</div></body></html>')
+    job_data = {'url': html_file.as_uri(), 'filter': [{'css': 'div.a'}, 'html2text', 'strip']}
+    cache_storage = CacheSQLite3Storage(cache_file)
+    try:
+        results = []
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as filter_pool:
+            for pool in (None, filter_pool):
+                job = JobBase.unserialize(job_data)
+                with JobState(cache_storage, job, filter_pool=pool) as job_state:
+                    job_state.process()
+                    assert job_state.exception is None
+                    assert job.is_markdown is True
+                    results.append(job_state.new_data)
+        assert results[0] == results[1] == '**bold** text'
+    finally:
+        cache_storage.close()
+
+
+def prepare_urlwatcher(cache_storage: CacheSQLite3Storage, jobs: List[JobBase]) -> Urlwatch:
+    """Returns an Urlwatch instance running the jobs."""
+    jobs_file = data_dir.joinpath('jobs-time.yaml')
+    urlwatch_config = CommandConfig(project_name, here, config_file, jobs_file, hooks_file, cache_file, False)
+    urlwatcher = Urlwatch(urlwatch_config, YamlConfigStorage(config_file), cache_storage, YamlJobsStorage(jobs_file))
+    urlwatcher.jobs = jobs
+    return urlwatcher
+
+
+def test_job_durations_and_order_jobs():
+    """The duration of each job is recorded, and jobs are ordered longest first with new jobs at the top."""
+    jobs = [JobBase.unserialize({'command': f'echo {i}', 'index_number': i}) for i in range(4)]
+    cache_storage = CacheSQLite3Storage(cache_file)
+    try:
+        urlwatcher = prepare_urlwatcher(cache_storage, jobs[:3])
+        # the second time, jobs are unchanged (and their snapshots are not saved again)
+        for _ in range(2):
+            urlwatcher.run_jobs()
+            cache_storage._copy_temp_to_permanent(delete=True)
+            durations = cache_storage.load_durations()
+            assert set(durations) == {job.get_guid() for job in jobs[:3]}
+            assert all(duration > 0 for duration in durations.values())
+        assert [job_state.verb for job_state in urlwatcher.report.job_states] == ['new'] * 3 + ['unchanged'] * 3
+
+        durations = {jobs[0].get_guid(): 1.0, jobs[1].get_guid(): 3.0, jobs[2].get_guid(): 1.0}
+        assert [job.index_number for job in order_jobs(jobs, durations)] == [3, 1, 0, 2]
+        assert order_jobs(jobs, durations, 'file') == jobs
+        with pytest.raises(ValueError):
+            order_jobs(jobs, durations, 'random')
+
+        cache_storage.delete(jobs[0].get_guid())
+        assert jobs[0].get_guid() not in cache_storage.load_durations()
+    finally:
+        cache_storage.close()
+
+
+def test_run_stats(tmp_path):
+    """The statistics of the jobs of each run are saved in the database, and aggregated by SQL queries."""
+    jobs = [JobBase.unserialize({'command': f'echo {i}', 'index_number': i}) for i in range(3)]
+    cache_file = tmp_path.joinpath('cache.db')
+    for _ in range(3):
+        cache_storage = CacheSQLite3Storage(cache_file)
+        cache_storage.max_stats_runs = 2
+        urlwatcher = prepare_urlwatcher(cache_storage, jobs)
+        urlwatcher.run_jobs()
+        urlwatcher.close()
+
+    cache_storage = CacheSQLite3Storage(cache_file)
+    try:
+        stats = cache_storage.load_run_stats(runs=10, top=2)
+        # only the latest max_stats_runs runs are kept
+        assert [run[1:5] for run in stats['runs']] == [(3, 0, 0, 0), (3, 0, 0, 0)]
+        assert stats['durations'][0][0] == 6
+        assert all(0 < duration for duration in stats['durations'][0][1:])
+        assert len(stats['jobs']) == 2
+        for guid, location, count, mean, p50, p95, maximum, retrieve, filter_time, diff, errors in stats['jobs']:
+            assert location in {f'echo {i}' for i in range(3)}
+            assert count == 2
+            assert p50 <= p95 <= maximum
+            assert retrieve <= mean and filter_time is not None
+            assert errors == 0
+        assert stats['jobs'][0][3] >= stats['jobs'][1][3]
+        assert stats['hosts'] == []
+        assert cache_storage.load_run_stats(runs=1)['durations'][0][0] == 3
+    finally:
+        cache_storage.close()
+
+
+def test_adaptive_concurrency():
+    """The number of jobs run in parallel increases while throughput rises and is halved on overload errors."""
+    job_state = JobState(None, JobBase.unserialize({'command': 'echo test'}))
+    concurrency = AdaptiveConcurrency(2, 8, initial=4)
+    for _ in range(4):
+        concurrency.record(job_state)
+    assert concurrency.limit == 5
+
+    job_state.exception = requests.exceptions.ConnectTimeout()
+    concurrency.record(job_state)
+    assert concurrency.limit == 2
+    # errors of jobs started before the decrease are ignored
+    for _ in range(4):
+        concurrency.record(job_state)
+    assert concurrency.limit == 2
+    concurrency.record(job_state)
+    assert concurrency.limit == 2  # min_limit
+
+    job_state.exception = ValueError()
+    for _ in range(100):
+        concurrency.record(job_state)
+    assert concurrency.limit == 8  # max_limit
+    assert concurrency.peak == 8
+
+    results = list(
+        run_parallel_by_host(lambda job_state: job_state, [job_state] * 10, concurrency=AdaptiveConcurrency(1, 3))
+    )
+    assert len(results) == 10
+
+
+def test_job_interval():
+    assert JobBase.unserialize({'command': 'echo test'}).get_interval() is None
+    for interval, seconds in ((90, 90.0), (0.5, 0.5), ('30m', 1800.0), ('1.5h', 5400.0), ('2 d', 172800.0)):
+        assert JobBase.unserialize({'command': 'echo test', 'interval': interval}).get_interval() == seconds
+    for interval in ('1y', 'soon', -1):
+        with pytest.raises(ValueError):
+            JobBase.unserialize({'command': 'echo test', 'interval': interval}).get_interval()
+
+
+def test_run_daemon():
+    """In daemon mode, each job is run at its own interval until stopped, and snapshots are saved along the way."""
+    cache_storage = CacheSQLite3Storage(cache_file)
+    try:
+        urlwatcher = prepare_urlwatcher(
+            cache_storage,
+            [
+                JobBase.unserialize({'command': 'echo fast', 'interval': 0.2, 'index_number': 1}),
+                JobBase.unserialize({'command': 'echo slow', 'interval': '1h', 'index_number': 2}),
+            ],
+        )
+        stop = threading.Event()
+        daemon = threading.Thread(target=run_daemon, args=(urlwatcher, stop))
+        daemon.start()
+        time.sleep(1)
+        stop.set()
+        daemon.join(timeout=10)
+        assert not daemon.is_alive()
+
+        verbs = [(job_state.job.index_number, job_state.verb) for job_state in urlwatcher.report.job_states]
+        assert verbs.count((1, 'new')) == 1
+        assert verbs.count((1, 'unchanged')) >= 2
+        assert verbs.count((2, 'new')) == 1
+        assert len(verbs) == verbs.count((1, 'unchanged')) + 2
+        # snapshots are in the permanent database without closing it
+        assert cache_storage.load(urlwatcher.jobs[0].get_guid())[0] == 'fast\n'
+    finally:
+        cache_storage.close()
+
+
+def test_run_daemon_runs_deferred_jobs_in_next_batch():
+    """In daemon mode, jobs deferred by max_runtime are run again in the next batch rather than at their interval,
+    unless none of the jobs of the batch could be completed."""
+    jobs = [
+        JobBase.unserialize({'command': 'echo quick', 'interval': '1h', 'index_number': 1}),
+        JobBase.unserialize({'command': 'echo slow last time', 'interval': '1h', 'index_number': 2}),
+    ]
+    cache_storage = CacheSQLite3Storage(cache_file)
+    try:
+        cache_storage.save_duration(jobs[1].get_guid(), 60.0)
+        cache_storage._copy_temp_to_permanent(delete=True)
+        urlwatcher = prepare_urlwatcher(cache_storage, jobs)
+        urlwatcher.urlwatch_config.max_runtime = 0.5
+        stop = threading.Event()
+        daemon = threading.Thread(target=run_daemon, args=(urlwatcher, stop))
+        daemon.start()
+        time.sleep(1)
+        stop.set()
+        daemon.join(timeout=10)
+        assert not daemon.is_alive()
+
+        assert [job_state.job.index_number for job_state in urlwatcher.report.job_states] == [1]
+        # deferred in the first batch, then alone in the second one (which is not repeated)
+        assert [job_state.job.index_number for job_state in urlwatcher.report.deferred_job_states] == [2, 2]
+    finally:
+        urlwatcher.urlwatch_config.max_runtime = None
+        cache_storage.close()
+
+
+def test_run_jobs_skips_jobs_not_due():
+    """Jobs whose interval has not elapsed since they were last checked are not run, unless selected explicitly."""
+    jobs = [
+        JobBase.unserialize({'command': 'echo always', 'index_number': 1}),
+        JobBase.unserialize({'command': 'echo weekly', 'interval': '1w', 'index_number': 2}),
+    ]
+    cache_storage = CacheSQLite3Storage(cache_file)
+    try:
+        urlwatcher = prepare_urlwatcher(cache_storage, jobs)
+        urlwatcher.run_jobs()
+        cache_storage._copy_temp_to_permanent(delete=True)
+        assert len(urlwatcher.report.job_states) == 2
+
+        urlwatcher.report = Report(urlwatcher)
+        urlwatcher.run_jobs()
+        assert [job_state.job.index_number for job_state in urlwatcher.report.job_states] == [1]
+        assert [job_state.job.index_number for job_state in urlwatcher.report.not_due_job_states] == [2]
+        assert urlwatcher.report.not_due_job_states[0].verb == 'not_due'
+
+        # due a week after the last check
+        due, not_due = split_due_jobs(jobs, cache_storage, now=time.time() + 7 * 86400)
+        assert (due, not_due) == (jobs, [])
+
+        urlwatcher.report = Report(urlwatcher)
+        urlwatcher.urlwatch_config.joblist = [2]
+        urlwatcher.run_jobs()
+        assert [job_state.job.index_number for job_state in urlwatcher.report.job_states] == [2]
+    finally:
+        cache_storage.close()
+
+
+def test_max_runtime_defers_jobs():
+    """Jobs cancelled by the deadline, or that cannot complete in time, are deferred without counting as failures."""
+    jobs = [
+        JobBase.unserialize({'command': 'echo quick', 'index_number': 1}),
+        JobBase.unserialize({'command': 'sleep 10', 'index_number': 2}),
+        JobBase.unserialize({'command': 'echo slow last time', 'index_number': 3}),
+    ]
+    cache_storage = CacheSQLite3Storage(cache_file)
+    try:
+        cache_storage.save_duration(jobs[2].get_guid(), 60.0)
+        cache_storage._copy_temp_to_permanent(delete=True)
+        urlwatcher = prepare_urlwatcher(cache_storage, jobs)
+        urlwatcher.urlwatch_config.max_runtime = 0.5
+        start = time.monotonic()
+        urlwatcher.run_jobs()
+        assert time.monotonic() - start < 5
+        cache_storage._copy_temp_to_permanent(delete=True)
+
+        assert [job_state.job.index_number for job_state in urlwatcher.report.job_states] == [1]
+        deferred = sorted(urlwatcher.report.deferred_job_states, key=lambda job_state: job_state.job.index_number)
+        assert [job_state.job.index_number for job_state in deferred] == [2, 3]
+        assert all(isinstance(job_state.exception, DeferredError) for job_state in deferred)
+        assert all(job_state.tries == 0 for job_state in deferred)
+        assert cache_storage.load(jobs[1].get_guid()) == ('', 0, 0, '')
+        assert cache_storage.load_durations()[jobs[2].get_guid()] == 60.0
+    finally:
+        urlwatcher.urlwatch_config.max_runtime = None
+        cache_storage.close()
+
+
+def test_max_runtime_defers_only_timeouts(monkeypatch):
+    """Only timeouts raised once the deadline has passed defer the job; other errors are reported as such."""
+    cache_storage = CacheSQLite3Storage(cache_file)
+    try:
+        for exception, expected in (
+            (ValueError('not a timeout'), ValueError),
+            (requests.exceptions.ReadTimeout('timed out'), DeferredError),
+        ):
+            job = JobBase.unserialize({'command': 'echo test', 'index_number': 1})
+
+            def retrieve(job_state: JobState) -> None:
+                time.sleep(0.2)
+                raise exception
+
+            monkeypatch.setattr(job, 'retrieve', retrieve)
+            with JobState(cache_storage, job, deadline=time.monotonic() + 0.1) as job_state:
+                job_state.process()
+            assert isinstance(job_state.exception, expected)
+    finally:
+        cache_storage.close()
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='uses sh')
+def test_max_runtime_kills_shell_job_children(tmp_path):
+    """The processes started by the command of a shell job are killed at the deadline, not just the shell."""
+    marker = tmp_path.joinpath('done')
+    job = JobBase.unserialize({'command': f'(sleep 1; touch {marker}); echo done', 'index_number': 1})
+    cache_storage = CacheSQLite3Storage(cache_file)
+    try:
+        start = time.monotonic()
+        with JobState(cache_storage, job, deadline=time.monotonic() + 0.3) as job_state:
+            job_state.process()
+        assert time.monotonic() - start < 1
+        assert isinstance(job_state.exception, DeferredError)
+        time.sleep(1.5)
+        assert not marker.exists()
+    finally:
+        cache_storage.close()
+
+
+def test_unchanged_data_skips_filters(monkeypatch):
+    """Filters are not run again on data identical to that retrieved for the latest snapshot, whose data is reused
+    together with the attributes set on the job by the filters."""
+    job_data = {'command': 'echo "<b>test</b>"', 'filter': ['html2text', 'strip'], 'index_number': 1}
+    apply_filters = JobState.apply_filters
+    filter_runs = []
+
+    def counting_apply_filters(self, data):
+        filter_runs.append(self.job.filter)
+        return apply_filters(self, data)
+
+    monkeypatch.setattr(JobState, 'apply_filters', counting_apply_filters)
+    cache_storage = CacheSQLite3Storage(cache_file)
+    try:
+        for filter_spec in (job_data['filter'], job_data['filter'], ['html2text']):
+            job = JobBase.unserialize({**job_data, 'filter': filter_spec})
+            with JobState(cache_storage, job) as job_state:
+                job_state.process()
+                job_state.save()
+            cache_storage._copy_temp_to_permanent(delete=True)
+            assert job_state.exception is None
+            assert job_state.new_data.strip() == '**test**'
+            assert job.is_markdown
+        # the filters are run again only when changed
+        assert filter_runs == [job_data['filter'], ['html2text']]
+    finally:
+        cache_storage.close()
+
+
+def test_changed_data_with_unchanged_filtered_data_skips_filters(tmp_path, monkeypatch):
+    """When the data retrieved changes but not the filtered data, the filter cache is saved with the latest snapshot
+    (no new snapshot being saved), so that the filters are skipped the next time the same data is retrieved; it's
+    invalidated when a package used by the filters is upgraded."""
+    data_file = tmp_path.joinpath('data.txt')
+    job = JobBase.unserialize({'command': f'cat {data_file}', 'filter': ['html2text', 'strip'], 'index_number': 1})
+    apply_filters = JobState.apply_filters
+    filter_runs = []
+
+    def counting_apply_filters(self, data):
+        filter_runs.append(data)
+        return apply_filters(self, data)
+
+    monkeypatch.setattr(JobState, 'apply_filters', counting_apply_filters)
+    cache_storage = CacheSQLite3Storage(cache_file)
+    try:
+        urlwatcher = prepare_urlwatcher(cache_storage, [job])
+        for data in ('<b>test</b>', ' <b>test</b> ', ' <b>test</b> '):
+            data_file.write_text(data)
+            urlwatcher.run_jobs()
+            cache_storage._copy_temp_to_permanent(delete=True)
+        assert [job_state.verb for job_state in urlwatcher.report.job_states] == ['new', 'unchanged', 'unchanged']
+        assert filter_runs == ['<b>test</b>', ' <b>test</b> ']
+        assert len(cache_storage.get_history_data(job.get_guid())) == 1
+
+        monkeypatch.setattr('webchanges.filters.get_package_version', lambda package: '999')
+        urlwatcher.run_jobs()
+        assert filter_runs == ['<b>test</b>', ' <b>test</b> ', ' <b>test</b> ']
+    finally:
+        cache_storage.close()
+
+
+def test_compared_versions(tmp_path):
+    """With compared_versions, data matching any of the latest distinct snapshots is unchanged, and changes are
+    reported against the most similar one."""
+    data_file = tmp_path.joinpath('data.txt')
+    job = JobBase.unserialize({'command': f'cat {data_file}', 'compared_versions': 3, 'index_number': 1})
+    page_a = '\n'.join(f'line {i} of page A' for i in range(50))
+    page_b = '\n'.join(f'other {i} of page B' for i in range(50))
+    cache_storage = CacheSQLite3Storage(cache_file)
+    try:
+        urlwatcher = prepare_urlwatcher(cache_storage, [job])
+        for page in (page_a, page_b, page_a, page_a.replace('line 3 ', 'LINE 3 ')):
+            data_file.write_text(page)
+            urlwatcher.run_jobs()
+            cache_storage._copy_temp_to_permanent(delete=True)
+        verbs = [job_state.verb for job_state in urlwatcher.report.job_states]
+        assert verbs == ['new', 'changed', 'unchanged', 'changed']
+        assert urlwatcher.report.job_states[-1].old_data == page_a
+    finally:
+        cache_storage.close()
@@ -4,6 +4,7 @@ import logging
 import os
 import socket
 import sys
+import warnings
 from pathlib import Path
 from typing import Any, Dict
 
@@ -16,6 +17,7 @@ from webchanges.config import CommandConfig
 from webchanges.handler import JobState
 from webchanges.jobs import (
     BrowserJob,
+    BrowserPool,
     BrowserResponseError,
     DEFAULT_CHROMIUM_REVISION,
     JobBase,
@@ -390,3 +392,103 @@ def test_shell_error():
     job_state = JobState(cache_storage, job)
     job_state.process()
     assert isinstance(job_state.exception, ShellError)
+
+
+class FakeBrowser:
+    """Stands in for a pyppeteer Browser to test the BrowserPool without launching Chromium."""
+
+    def __init__(self, args):
+        self.args = args
+        self.contexts_open = 0
+        self.closed = False
+
+    async def createIncognitoBrowserContext(self):  # noqa: N802 Function name should be lowercase
+        browser = self
+
+        class FakeContext:
+            async def newPage(self):  # noqa: N802 Function name should be lowercase
+                return browser
+
+            async def close(self):
+                browser.contexts_open -= 1
+
+        self.contexts_open += 1
+        return FakeContext()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowserPool(BrowserPool):
+    @staticmethod
+    async def _launch(revision, args, ignore_https_errors):
+        return FakeBrowser(args)
+
+
+def test_browser_pool_shares_and_recycles_browsers():
+    async def get_browser(args):
+        async with browser_pool.page('1', args) as page:
+            return page
+
+    with FakeBrowserPool(max_pages_per_browser=3) as browser_pool:
+        browsers = [browser_pool.run(get_browser(['--a'])) for _ in range(4)]
+        other_browser = browser_pool.run(get_browser(['--b']))
+
+        # the browser with the same args is shared until it has served max_pages_per_browser pages
+        assert browsers[0] is browsers[1] is browsers[2]
+        assert browsers[0].closed
+        assert browsers[3] is not browsers[0] and not browsers[3].closed
+        assert other_browser is not browsers[3] and other_browser.args == ['--b']
+        assert all(browser.contexts_open == 0 for browser in browsers + [other_browser])
+    assert browsers[3].closed and other_browser.closed
+
+
+def test_in_shard():
+    """Each job belongs to exactly one shard, and shards are roughly balanced."""
+    jobs = [JobBase.unserialize({'url': f'https://example.com/{i}'}) for i in range(300)]
+    shards = [[job for job in jobs if job.in_shard(index, 3)] for index in (1, 2, 3)]
+    assert sorted(job.url for shard in shards for job in shard) == sorted(job.url for job in jobs)
+    assert all(70 <= len(shard) <= 130 for shard in shards)
+    assert all(job.in_shard(1, 1) for job in jobs)
+
+
+def test_compile():
+    """Compiled jobs have the defaults merged in and are reused until the job or the defaults change."""
+    config = {'job_defaults': {'all': {'max_tries': 1, 'note': 'default note'}, 'shell': {'max_tries': 2}}}
+    job = JobBase.unserialize({'command': 'echo test', 'filter': ['strip'], 'index_number': 1})
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        compiled_job = job.compile(config)
+    assert compiled_job is not job
+    assert compiled_job.max_tries == 2
+    assert compiled_job.note == 'default note'
+    assert compiled_job.get_filter_list() == [('strip', {})]
+    assert job.compile(config) is compiled_job
+
+    job_copy = job.with_defaults(config)
+    assert job_copy is not compiled_job and job_copy.max_tries == 2
+    assert job_copy.get_filter_pipeline() is compiled_job.get_filter_pipeline()
+    # the attributes of the copy can be set, and its dicts modified, without affecting the compiled job
+    job_copy.filter = ['strip', 'sort']
+    job_copy.headers['X-Test'] = 'test'
+    assert job_copy.get_filter_list() == [('strip', {}), ('sort', {})]
+    assert compiled_job.get_filter_list() == [('strip', {})]
+    assert job.filter == ['strip']
+    assert 'X-Test' not in compiled_job.headers
+    url_config = {'job_defaults': {'all': {'cookies': {'a': '1'}, 'headers': {'Accept': 'text/html'}}}}
+    url_job = JobBase.unserialize({'url': 'https://example.com/', 'index_number': 2})
+    url_job_copy = url_job.with_defaults(url_config)
+    url_job_copy.cookies['a'] = '2'
+    url_job_copy.headers['Accept'] = 'text/plain'
+    assert url_config['job_defaults']['all'] == {'cookies': {'a': '1'}, 'headers': {'Accept': 'text/html'}}
+    assert url_job.compile(url_config).cookies == {'a': '1'}
+
+    job.note = 'a note'
+    assert job.compile(config).note == 'a note'
+    config['job_defaults']['shell']['max_tries'] = 3
+    assert job.compile(config).max_tries == 3
+
+    # invalid filters are reported when the job is run
+    job.filter = ['afilternamethatdoesnotexist']
+    with pytest.raises(ValueError):
+        job.compile(config).get_filter_list()
@@ -1,4 +1,5 @@
 """Test reporting, primarily handling of diffs."""
+import copy
 import importlib.util
 import logging
 import os
@@ -212,5 +213,44 @@ def test_reporters(reporter):
         with pytest.raises(MissingSchema) as pytest_wrapped_e:
             report.finish_one(reporter, check_enabled=False)
         assert str(pytest_wrapped_e.value) == "Invalid URL '': No schema supplied. Perhaps you meant http://?"
+    elif reporter == 'openmetrics':
+        with pytest.raises(ValueError) as pytest_wrapped_e:
+            report.finish_one(reporter, check_enabled=False)
+        assert "'filename'" in str(pytest_wrapped_e.value)
     elif reporter != 'browser' or 'PYCHARM_HOSTED' in os.environ:
         report.finish_one(reporter, check_enabled=False)
+
+
+def test_openmetrics_reporter(tmp_path):
+    metrics_file = tmp_path.joinpath('webchanges.prom')
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    config['report']['openmetrics'] = {'enabled': True, 'filename': str(metrics_file)}
+
+    class UrlwatchMetricsTest:
+        class config_storage:
+            pass
+
+    UrlwatchMetricsTest.config_storage.config = config
+    metrics_report = Report(UrlwatchMetricsTest)
+    job_state = JobState(None, JobBase.unserialize({'name': 'A "quoted" name', 'url': 'https://example.com/'}))
+    job_state.duration, job_state.size, job_state.http_status = 1.5, 1024, 200
+    metrics_report.changed(job_state)
+    job_state = JobState(None, JobBase.unserialize({'command': 'false'}))
+    job_state.duration, job_state.tries = 0.25, 2
+    metrics_report.error(job_state)
+    metrics_report.not_due(JobState(None, JobBase.unserialize({'command': 'true'})))
+    metrics_report.finish()
+
+    lines = metrics_file.read_text().splitlines()
+    assert not list(tmp_path.glob('*.tmp'))
+    assert 'webchanges_job_duration_seconds{location="https://example.com/",name="A \\"quoted\\" name"} 1.5' in lines
+    assert 'webchanges_job_size_bytes{location="https://example.com/",name="A \\"quoted\\" name"} 1024' in lines
+    assert 'webchanges_job_tries{location="false",name="false"} 2' in lines
+    assert 'webchanges_job_error{location="false",name="false"} 1' in lines
+    assert not any(line.startswith('webchanges_job_http_status{location="false"') for line in lines)
+    assert 'webchanges_run_jobs{verb="changed"} 1' in lines
+    assert 'webchanges_run_jobs{verb="not_due"} 1' in lines
+    assert 'webchanges_run_jobs{verb="unchanged"} 0' in lines
+    # written after the other reporters, including their send times
+    assert any(line.startswith('webchanges_reporter_duration_seconds{reporter="stdout"} ') for line in lines)
+    assert lines[-1] == '# EOF'
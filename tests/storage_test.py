@@ -17,6 +17,8 @@ from webchanges.storage import CacheSQLite3Storage, YamlConfigStorage, YamlJobsS
 minidb_is_installed = importlib.util.find_spec('minidb') is not None
 
 minidb_required = pytest.mark.skipif(not minidb_is_installed, reason="requires 'minidb' package to be installed")
+redis_is_installed = importlib.util.find_spec('redis') is not None
+redis_required = pytest.mark.skipif(not redis_is_installed, reason="requires 'redis' package to be installed")
 # py37_required = pytest.mark.skipif(sys.version_info < (3, 7), reason='requires Python 3.7')
 
 here = Path(__file__).parent
@@ -203,6 +205,21 @@ def test_rollback_cache():
         cache_storage.close()
 
 
+def test_flush_prunes_run_stats():
+    """Flushing (as done by the daemon, which does not close the database) keeps only the latest max_stats_runs runs."""
+    cache_storage = CacheSQLite3Storage(cache_file)
+    try:
+        cache_storage.max_stats_runs = 2
+        for run in range(4):
+            cache_storage.save_run_stats(
+                float(run), [('guid', 'echo test', None, 'unchanged', 0.1, 0.1, 0.0, 0.0, 5, None)]
+            )
+            cache_storage.flush()
+        assert [row[0] for row in cache_storage.load_run_stats(runs=10)['runs']] == [2.0, 3.0]
+    finally:
+        cache_storage.close()
+
+
 def test_restore_and_backup():
     urlwatcher, cache_storage, cache_file = prepare_storage_test()
     try:
@@ -308,3 +325,75 @@ def test_clean_and_history_data_minidb():
         assert history == {}
     finally:
         cache_storage.close()
+
+
+@redis_required
+def test_durations_redis():
+    """Job durations and check times are stored in hashes namespaced to webchanges, and deleted with the job."""
+    import redis
+
+    from webchanges.storage import CacheRedisStorage
+
+    cache_storage = CacheRedisStorage(os.getenv('REDIS_URI', 'redis://localhost:6379'))
+    try:
+        cache_storage.db.ping()
+    except redis.exceptions.ConnectionError:
+        cache_storage.close()
+        pytest.skip('requires a redis server (set REDIS_URI)')
+    guid = 'test_durations_redis'
+    try:
+        cache_storage.save(guid=guid, data='data', timestamp=1.0, tries=0, etag='')
+        cache_storage.save_duration(guid, 2.5, timestamp=100.0)
+        assert cache_storage.load_durations()[guid] == 2.5
+        assert cache_storage.load_check_timestamps([guid]) == {guid: 100.0}
+        assert cache_storage.db.hexists(CacheRedisStorage.DURATIONS_KEY, guid)
+        assert not cache_storage.db.exists('durations', 'checked')
+
+        cache_storage.delete(guid)
+        assert guid not in cache_storage.load_durations()
+        assert not cache_storage.db.hexists(CacheRedisStorage.CHECKED_KEY, guid)
+    finally:
+        cache_storage.delete(guid)
+        cache_storage.close()
+
+
+def test_parsed_jobs_cache(tmp_path, monkeypatch):
+    """The jobs parsed from a jobs file are cached and reused until the file changes."""
+    jobs_file = tmp_path.joinpath('jobs.yaml')
+    jobs_file.write_text('url: https://example.com/\nname: example\n---\ncommand: echo test\nmax_tries: 2\n')
+    jobs_storage = YamlJobsStorage(jobs_file, tmp_path.joinpath('cache'))
+    jobs = jobs_storage.load()
+    assert len(list(tmp_path.joinpath('cache').glob('jobs.*.msgpack'))) == 1
+
+    def fail_parse(*args):
+        raise AssertionError('jobs file parsed again')
+
+    with monkeypatch.context() as m:
+        m.setattr(YamlJobsStorage, '_parse_yaml', fail_parse)
+        cached_jobs = jobs_storage.load()
+    assert [(type(job), job.to_dict()) for job in cached_jobs] == [(type(job), job.to_dict()) for job in jobs]
+
+    jobs_file.write_text('url: https://example.com/changed\nkind: url\n')
+    with pytest.deprecated_call():
+        assert [job.url for job in jobs_storage.load()] == ['https://example.com/changed']
+    # jobs loaded from the cache are validated as when parsed, with the same warnings
+    with pytest.deprecated_call():
+        assert [job.url for job in jobs_storage.load()] == ['https://example.com/changed']
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='file permissions are not checked in Windows')
+def test_parsed_jobs_cache_writable_by_others_is_ignored(tmp_path, monkeypatch):
+    """As the cached jobs may include commands, a cache file that others can write to is ignored."""
+    jobs_file = tmp_path.joinpath('jobs.yaml')
+    jobs_file.write_text('command: echo test\n')
+    jobs_storage = YamlJobsStorage(jobs_file, tmp_path.joinpath('cache'))
+    jobs_storage.load()
+    cache_file = next(tmp_path.joinpath('cache').glob('jobs.*.msgpack'))
+    assert cache_file.stat().st_mode & 0o077 == 0
+    cache_file.chmod(0o666)
+
+    parsed = []
+    parse_yaml = YamlJobsStorage._parse_yaml
+    monkeypatch.setattr(YamlJobsStorage, '_parse_yaml', staticmethod(lambda fp: parsed.append(fp) or parse_yaml(fp)))
+    assert [job.command for job in jobs_storage.load()] == ['echo test']
+    assert len(parsed) == 1
@@ -1,8 +1,10 @@
 """Test utility functions."""
 
+import pstats
+
 import pytest
 
-from webchanges.util import chunk_string, linkify
+from webchanges.util import chunk_string, linkify, Profiler, SimilarityIndex
 
 CHUNK_TEST_DATA = [
     # Numbering for just one item doesn't add the numbers
@@ -41,3 +43,49 @@ def test_linkify():
         == 'Test <a href="http://www.example.com/thisisalonglink" '
         'title=http://www.example.com/thisisalonglink>www.example.com/thisisal...</a>'
     )
+
+
+def test_similarity_index():
+    page = '\n'.join(f'line {i} of a long page' for i in range(100))
+    history = [page.replace('line 5 ', 'LINE 5 '), page.replace('line 7 ', 'LINE 7 ').replace('line 8 ', 'LINE 8 ')]
+    index = SimilarityIndex(history)
+    assert index.closest_match(page) == history[0]
+    assert index.closest_match(history[1]) == history[1]
+    assert index.closest_match('something else entirely ' * 20) is None
+    # equally similar: the first one indexed wins
+    assert SimilarityIndex([page, page + ' ']).closest_match(page + '  ') == page
+    # short texts are compared character by character
+    assert SimilarityIndex(['Price: 100', 'Sold out']).closest_match('Price: 101') == 'Price: 100'
+    # the same lines in a different order are similar, but less so than the same lines in the same order
+    numbered_page = '\n'.join(f'{i}: line of a long page #{i}' for i in range(100))
+    reordered_page = '\n'.join(reversed(numbered_page.splitlines()))
+    assert SimilarityIndex([reordered_page]).closest_match(numbered_page) == reordered_page
+    assert SimilarityIndex([reordered_page, numbered_page]).closest_match(numbered_page) == numbered_page
+
+
+def test_profiler(tmp_path, capsys):
+    profiler = Profiler()
+    with profiler.phase('not profiling'):
+        pass
+    assert profiler.phases == {}
+
+    pstats_file = tmp_path.joinpath('profile.pstats')
+    profiler.enable(str(pstats_file))
+    for _ in range(2):
+        with profiler.phase('fast'):
+            pass
+    with profiler.phase('slow'):
+        sum(range(100_000))
+    with profiler.phase('concurrent', concurrent=True):
+        pass
+    profiler.finish()
+    assert profiler.phases['fast'][0] == 2
+    assert profiler.phases['slow'][0] == 1
+    # the CPU time of the thread is not that of a concurrent phase
+    assert profiler.phases['concurrent'][2] is None
+    assert profiler.phases['slow'][2] > 0
+    output = capsys.readouterr().out
+    assert [line.split()[-1] for line in output.splitlines() if line.startswith('concurrent ')] == ['-']
+    assert output.index('slow') < output.index('fast')
+    assert str(pstats_file) in output
+    assert pstats.Stats(str(pstats_file)).total_calls > 0
@@ -27,6 +27,7 @@ from .storage import (
     YamlConfigStorage,
     YamlJobsStorage,
 )
+from .util import profiler
 
 # directory where the config, jobs and hooks files are located
 if os.name != 'nt':
@@ -181,10 +182,40 @@ def main() -> None:  # pragma: no cover
     if command_config.config == default_config_file and not Path(command_config.config).is_file():
         first_run(command_config)
 
+    if command_config.profile is not None:
+        profiler.enable(command_config.profile or None)
+    try:
+        run(command_config)
+    finally:
+        profiler.finish()
+
+
+def run(command_config: CommandConfig) -> None:  # pragma: no cover
+    """Sets up the storages and runs the command.
+
+    :param command_config: The command configuration.
+    """
     # setup config file API
-    config_storage = YamlConfigStorage(command_config.config)  # storage.py
+    with profiler.phase('config load'):
+        config_storage = YamlConfigStorage(command_config.config)  # storage.py
 
     # setup database API
+    with profiler.phase('database open'):
+        cache_storage = open_cache_storage(command_config)
+
+    # setup jobs file API
+    jobs_storage = YamlJobsStorage(command_config.jobs, cache_dir)  # storage.py
+
+    # setup urlwatch
+    urlwatcher = Urlwatch(command_config, config_storage, cache_storage, jobs_storage)  # main.py
+    urlwatch_command = UrlwatchCommand(urlwatcher)  # command.py
+
+    # run urlwatch
+    urlwatch_command.run()
+
+
+def open_cache_storage(command_config: CommandConfig) -> CacheStorage:  # pragma: no cover
+    """Opens the database (cache storage) selected in the command configuration."""
     if command_config.database_engine == 'sqlite3':
         cache_storage: CacheStorage = CacheSQLite3Storage(
             command_config.cache, command_config.max_snapshots
@@ -201,16 +232,7 @@ def main() -> None:  # pragma: no cover
         cache_storage = CacheMiniDBStorage(command_config.cache)  # storage.py
     else:
         raise NotImplementedError(f'Database engine {command_config.database_engine} not implemented')
-
-    # setup jobs file API
-    jobs_storage = YamlJobsStorage(command_config.jobs)  # storage.py
-
-    # setup urlwatch
-    urlwatcher = Urlwatch(command_config, config_storage, cache_storage, jobs_storage)  # main.py
-    urlwatch_command = UrlwatchCommand(urlwatcher)  # command.py
-
-    # run urlwatch
-    urlwatch_command.run()
+    return cache_storage
 
 
 if __name__ == '__main__':
@@ -6,8 +6,9 @@ import shutil
 import sys
 import timeit
 import traceback
+from datetime import datetime
 from pathlib import Path
-from typing import Optional, Union
+from typing import List, Optional, Union
 
 import requests
 
@@ -17,8 +18,9 @@ from .jobs import JobBase, UrlJob
 from .mailer import SMTPMailer, smtp_have_password, smtp_set_password
 from .main import Urlwatch
 from .reporters import ReporterBase, xmpp_have_password, xmpp_set_password
+from .storage import CacheSQLite3Storage
 from .util import edit_file, import_module_from_source
-from .worker import run_parallel
+from .worker import process_jobs
 
 logger = logging.getLogger(__name__)
 
@@ -154,10 +156,17 @@ class UrlwatchCommand:
             # Force re-retrieval of job, as we're testing for errors
             job.ignore_cached = True
         with contextlib.ExitStack() as exit_stack:
-            for job_state in run_parallel(
-                lambda jobstate: jobstate.process(),
-                (exit_stack.enter_context(JobState(self.urlwatcher.cache_storage, job)) for job in jobs),
-            ):
+            # process_jobs yields the jobs as they complete: list them in the order of the jobs file
+            job_states = sorted(
+                process_jobs(
+                    exit_stack,
+                    self.urlwatcher.cache_storage,
+                    jobs,
+                    self.urlwatcher.config_storage.config.get('worker', {}),
+                ),
+                key=lambda job_state: job_state.job.index_number,
+            )
+            for job_state in job_states:
                 if job_state.exception is not None:
                     print(f'{job_state.job.index_number:3}: Error: {job_state.exception.args[0]}')
                 elif len(job_state.new_data.strip()) == 0:
@@ -188,7 +197,84 @@ class UrlwatchCommand:
         else:
             sys.exit(f'No snapshots found to be deleted for {job.get_indexed_location()}')
 
+    def merge_cache(self, filenames: List[Path]) -> int:
+        """Merges the snapshots of sqlite3 database files (e.g. those of shards) into the cache database.
+
+        :param filenames: The database files to merge.
+        :returns: 0 if successful, 1 otherwise.
+        """
+        if not isinstance(self.urlwatcher.cache_storage, CacheSQLite3Storage):
+            print('Merging databases is only supported with the sqlite3 database engine')
+            return 1
+        for filename in filenames:
+            try:
+                count = self.urlwatcher.cache_storage.merge(filename)
+            except (FileNotFoundError, ValueError) as e:
+                print(e)
+                return 1
+            print(f'Merged {count} snapshots from {filename}')
+        self.urlwatcher.cache_storage.close()
+        return 0
+
+    def show_stats(self, runs: int) -> int:
+        """Prints the statistics of the latest runs recorded in the sqlite3 database (see
+        CacheSQLite3Storage.load_run_stats).
+
+        :param runs: The number of latest runs to include.
+        :returns: 0 if successful, 1 otherwise.
+        """
+        if not isinstance(self.urlwatcher.cache_storage, CacheSQLite3Storage):
+            print('Run statistics are only recorded with the sqlite3 database engine')
+            return 1
+        stats = self.urlwatcher.cache_storage.load_run_stats(runs)
+        if not stats['runs']:
+            print('No run statistics recorded yet')
+            return 0
+
+        def secs(value: Optional[float]) -> str:
+            return '-' if value is None else f'{value:.3f}'
+
+        def kbytes(value: Optional[float]) -> str:
+            return '-' if value is None else f'{value / 1024:,.1f}'
+
+        print(f"Statistics of the latest {len(stats['runs'])} runs (times in seconds, data in kB)\n")
+        print('Runs:')
+        print(
+            f'{"Started":<19}  {"Jobs":>5}  {"Changed":>7}  {"Errors":>6}  {"Deferred":>8}  {"Job time":>9}  '
+            f'{"p95":>8}  {"Data":>10}'
+        )
+        for run, count, changed, errors, deferred, total, p95, size in stats['runs']:
+            started = datetime.fromtimestamp(run).strftime('%Y-%m-%d %H:%M:%S')
+            print(
+                f'{started:<19}  {count:>5}  {changed:>7}  {errors:>6}  {deferred:>8}  {secs(total):>9}  '
+                f'{secs(p95):>8}  {kbytes(size):>10}'
+            )
+
+        count, p50, p95, maximum = stats['durations'][0]
+        print(f'\nDuration of jobs: p50 {secs(p50)}, p95 {secs(p95)}, max {secs(maximum)} ({count} job runs)')
+
+        print('\nSlowest jobs:')
+        print(
+            f'{"Runs":>5}  {"Mean":>8}  {"p50":>8}  {"p95":>8}  {"Max":>8}  {"Retrieve":>8}  {"Filter":>8}  '
+            f'{"Diff":>8}  {"Errors":>6}  Job'
+        )
+        for _, location, count, mean, p50, p95, maximum, retrieve, filter_, diff, errors in stats['jobs']:
+            print(
+                f'{count:>5}  {secs(mean):>8}  {secs(p50):>8}  {secs(p95):>8}  {secs(maximum):>8}  '
+                f'{secs(retrieve):>8}  {secs(filter_):>8}  {secs(diff):>8}  {errors:>6}  {location}'
+            )
+
+        if stats['hosts']:
+            print('\nData retrieved by host:')
+            print(f'{"Runs":>5}  {"Total":>10}  {"Per run":>10}  {"Retrieve":>8}  Host')
+            for host, count, size, size_per_run, retrieve in stats['hosts']:
+                print(f'{count:>5}  {kbytes(size):>10}  {kbytes(size_per_run):>10}  {secs(retrieve):>8}  {host}')
+        return 0
+
     def modify_urls(self) -> None:
+        if self.urlwatch_config.shard:
+            print('Cannot add or delete jobs when running a shard (--shard), as the other jobs are not loaded')
+            sys.exit(1)
         save = True
         if self.urlwatch_config.delete is not None:
             job = self._find_job(self.urlwatch_config.delete)
@@ -415,6 +501,10 @@ class UrlwatchCommand:
             self.urlwatcher.cache_storage.rollback_cache(self.urlwatch_config.rollback_cache)
             self.urlwatcher.cache_storage.close()
             sys.exit(0)
+        if self.urlwatch_config.merge_cache:
+            sys.exit(self.merge_cache(self.urlwatch_config.merge_cache))
+        if self.urlwatch_config.stats is not None:
+            sys.exit(self.show_stats(self.urlwatch_config.stats))
         if self.urlwatch_config.edit:
             sys.exit(self.urlwatcher.jobs_storage.edit())
         if self.urlwatch_config.edit_hooks:
@@ -448,6 +538,9 @@ class UrlwatchCommand:
 
         self.handle_actions()
 
-        self.urlwatcher.run_jobs()
+        if self.urlwatch_config.daemon:
+            self.urlwatcher.run_daemon()
+        else:
+            self.urlwatcher.run_jobs()
 
         self.urlwatcher.close()
@@ -4,11 +4,22 @@ import argparse
 import os
 from os import PathLike
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import List, Optional, Tuple, Union
 
 from . import __doc__, __project_name__, __version__
 
 
+def shard_type(value: str) -> Tuple[int, int]:
+    """Converts the value of --shard, in the format INDEX/COUNT with 1 <= INDEX <= COUNT, into a tuple."""
+    try:
+        index, count = (int(number) for number in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not in the format INDEX/COUNT (e.g. 1/3)")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a valid shard (INDEX must be between 1 and COUNT)")
+    return index, count
+
+
 class BaseConfig(object):
     """Base configuration class."""
 
@@ -65,6 +76,12 @@ class CommandConfig(BaseConfig):
         self.delete_snapshot: Optional[str] = None
         self.database_engine: str = 'sqlite3'
         self.max_snapshots: int = 4
+        self.merge_cache: Optional[List[Path]] = None
+        self.stats: Optional[int] = None
+        self.shard: Optional[Tuple[int, int]] = None
+        self.daemon: bool = False
+        self.max_runtime: Optional[float] = None
+        self.profile: Optional[str] = None
         self.features: bool = False
         self.log_level: str = 'DEBUG'
 
@@ -182,8 +199,51 @@ class CommandConfig(BaseConfig):
             help='maximum number of snapshots to retain in sqlite3 database (default: %(default)s)',
             metavar='NUM_SNAPSHOTS',
         )
+        group.add_argument(
+            '--merge-cache',
+            nargs='+',
+            type=Path,
+            help='merge the snapshots of sqlite3 database FILE(s) (e.g. of shards) into the cache database',
+            metavar='FILE',
+        )
+        group.add_argument(
+            '--stats',
+            nargs='?',
+            const=10,
+            type=int,
+            help='show statistics of the latest RUNS runs recorded in the sqlite3 database: slowest jobs, durations, '
+            'data retrieved by host and trend by run (default: 10 runs)',
+            metavar='RUNS',
+        )
+
+        group = parser.add_argument_group('sharding')
+        group.add_argument(
+            '--shard',
+            type=shard_type,
+            help='run only the INDEX-th of COUNT disjoint subsets of the jobs (e.g. 1/3, 2/3 and 3/3 on three hosts, '
+            'each with its own cache database)',
+            metavar='INDEX/COUNT',
+        )
 
         group = parser.add_argument_group('miscellaneous')
+        group.add_argument(
+            '--daemon',
+            action='store_true',
+            help="keep running, running each job at its 'interval' and sending reports periodically",
+        )
+        group.add_argument(
+            '--max-runtime',
+            type=float,
+            help='stop running jobs after SECONDS, deferring the remaining ones to the next run',
+            metavar='SECONDS',
+        )
+        group.add_argument(
+            '--profile',
+            nargs='?',
+            const='',
+            help='print the time spent in each phase of the run; also save a cProfile profile of the run to FILE',
+            metavar='FILE',
+        )
         group.add_argument('--features', action='store_true', help='list supported job types, filters and reporters')
         group.add_argument(
             '--log-level',
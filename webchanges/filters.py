@@ -15,62 +15,34 @@ import warnings
 from abc import ABC
 from enum import Enum
 from html.parser import HTMLParser
-from typing import Any, Dict, Iterable, Iterator, List, Optional, TYPE_CHECKING, Tuple, Union
-from xml.dom import minidom  # nosec: B408 Replace minidom with the equivalent defusedxml package TODO
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, TYPE_CHECKING, Tuple, Union
 
-import html2text
-
-from lxml import etree  # noqa: DUO107 insecure use of XML modules, prefer "defusedxml"  # nosec: B410 TODO
-from lxml.cssselect import CSSSelector  # noqa: DUO107 insecure use of XML ... "defusedxml"  # nosec: B410 TODO
-
-import yaml
-
-from .util import TrackSubClasses
+from .util import get_package_version, lazy_import, profiler, TrackSubClasses
 
 # https://stackoverflow.com/questions/39740632
 if TYPE_CHECKING:
+    from lxml import etree  # noqa: DUO107 insecure use of XML modules, prefer "defusedxml"  # nosec: B410 TODO
+
     from .handler import JobState
     from .jobs import JobBase
-
-try:
-    from bs4 import BeautifulSoup
-except ImportError:  # pragma: has-bs4
-    BeautifulSoup = None
-
-try:
-    import cssbeautifier
-except ImportError:
-    cssbeautifier = None
-
-try:
-    import jq
-except ImportError:  # pragma: has-jq
-    jq = None
-
-try:
-    import jsbeautifier
-except ImportError:
-    jsbeautifier = None
-
-try:
-    import pdftotext
-except ImportError:  # pragma: has-pdftotext
-    pdftotext = None
-
-try:
-    from PIL import Image
-except ImportError:
-    Image = None
-
-try:
-    import pytesseract
-except ImportError:  # pragma: has-pytesseract
-    pytesseract = None
-
-try:
-    import vobject
-except ImportError:
-    vobject = None
+else:
+    etree = lazy_import('lxml.etree')  # noqa: DUO107 insecure use of XML modules, prefer "defusedxml"  # nosec: B410
+
+# Modules are imported when first used by a filter rather than at startup (see lazy_import); optional ones are None if
+# not installed; lxml.etree is imported above
+html2text = lazy_import('html2text')
+lxml_cssselect = lazy_import('lxml.cssselect')  # noqa: DUO107 insecure use of XML modules  # nosec: B410 TODO
+minidom = lazy_import('xml.dom.minidom')  # nosec: B408 Replace minidom with the equivalent defusedxml package TODO
+yaml = lazy_import('yaml')
+
+bs4 = lazy_import('bs4')
+cssbeautifier = lazy_import('cssbeautifier')
+jq = lazy_import('jq')
+jsbeautifier = lazy_import('jsbeautifier')
+pdftotext = lazy_import('pdftotext')
+PIL_Image = lazy_import('PIL.Image')
+pytesseract = lazy_import('pytesseract')
+vobject = lazy_import('vobject')
 
 
 logger = logging.getLogger(__name__)
@@ -85,7 +57,12 @@ class FilterBase(object, metaclass=TrackSubClasses):
     __no_subfilter__: bool = False
     __supported_subfilters__: Dict[str, str] = {}
     __uses_bytes__: bool = False
+    __cpu_bound__: bool = False  # CPU-heavy filter that can be run in a separate process (must not use the JobState)
+    __deterministic__: bool = True  # output depends only on the data and subfilter (e.g. no external commands)
+    __accepts_elements__: bool = False  # filter() also accepts the LxmlElements selected by a css or xpath filter
+    __packages__: Tuple[str, ...] = ()  # distribution packages used by the filter, on whose version its output depends
     method = ''
+    prepared: Any = None  # what prepare() returned for the subfilter, set when applied by a FilterPipeline
 
     def __init__(self, job: JobBase, state: JobState) -> None:
         self.job = job
@@ -107,16 +84,23 @@ class FilterBase(object, metaclass=TrackSubClasses):
         return '\n'.join(result)
 
     @classmethod
-    def auto_process(cls, state: JobState, data: Union[bytes, str]) -> Union[bytes, str]:
+    def auto_match(cls, state: JobState) -> List[FilterBase]:
+        """Returns the filters to be applied automatically to the job, i.e. those (defined in hooks) matching it."""
         filters = itertools.chain(
             (filtercls for _, filtercls in sorted(cls.__subclasses__.items(), key=lambda k_v: k_v[0])),
             cls.__anonymous_subclasses__,
         )
+        return [
+            filter_instance
+            for filter_instance in (filtercls(state.job, state) for filtercls in filters)
+            if filter_instance.match()
+        ]
 
-        for filtercls in filters:
-            filter_instance = filtercls(state.job, state)
-            if filter_instance.match():
-                logger.info(f'Job {state.job.index_number}: Auto-applying filter {filter_instance}')
+    @classmethod
+    def auto_process(cls, state: JobState, data: Union[bytes, str]) -> Union[bytes, str]:
+        for filter_instance in cls.auto_match(state):
+            logger.info(f'Job {state.job.index_number}: Auto-applying filter {filter_instance}')
+            with profiler.phase(f'filter {type(filter_instance).__name__} (auto)'):
                 data = filter_instance.filter(data, {})  # all filters take a subfilter
 
         return data
@@ -186,10 +170,56 @@ class FilterBase(object, metaclass=TrackSubClasses):
                     yield filter_kind, subfilter
 
     @classmethod
-    def process(cls, filter_kind: str, subfilter: Dict[str, Any], state: JobState, data: Union[bytes, str]) -> str:
+    def process(
+        cls,
+        filter_kind: str,
+        subfilter: Dict[str, Any],
+        state: JobState,
+        data: Union[bytes, str, LxmlElements],
+        prepared: Any = None,
+        next_filter_kind: Optional[str] = None,
+    ) -> Union[str, LxmlElements]:
+        """Applies a filter to the data.
+
+        :param filter_kind: The kind of the filter.
+        :param subfilter: The (normalized) subfilter.
+        :param state: The JobState of the job.
+        :param data: The data to filter.
+        :param prepared: What the filter's prepare() returned for the subfilter, if already called (e.g. by a
+           FilterPipeline); otherwise the filter prepares the subfilter itself.
+        :param next_filter_kind: The kind of the filter to be applied next to the filtered data, if any.
+        :returns: The filtered data, or the elements selected if the next filter can use them (see passes_elements).
+        """
         logger.info(f'Job {state.job.index_number}: Applying filter {filter_kind}, subfilter {subfilter}')
         filtercls: TrackSubClasses = cls.__subclasses__.get(filter_kind, None)
-        return filtercls(state.job, state).filter(data, subfilter)
+        with profiler.phase(f'filter {filter_kind}'):
+            filter_instance = filtercls(state.job, state)
+            filter_instance.prepared = prepared
+            if cls.passes_elements(filter_kind, next_filter_kind):
+                return filter_instance.filter_elements(data, subfilter)
+            return filter_instance.filter(data, subfilter)
+
+    @classmethod
+    def process_detached(
+        cls, filter_list: List[Tuple[str, Dict[str, Any]]], job: JobBase, data: Union[bytes, str]
+    ) -> Tuple[Union[bytes, str], JobBase]:
+        """Applies the filters to the data without a JobState, e.g. in a separate process (see
+        is_cpu_bound_filter_kind).
+
+        :param filter_list: The normalized list of the filters to apply.
+        :param job: The job.
+        :param data: The data to filter.
+        :returns: The filtered data and the job, as some filters set its attributes (e.g. html2text sets is_markdown).
+        """
+        next_filter_kinds = [filter_kind for filter_kind, _ in filter_list[1:]] + [None]
+        for (filter_kind, subfilter), next_filter_kind in zip(filter_list, next_filter_kinds):
+            logger.info(f'Job {job.index_number}: Applying filter {filter_kind}, subfilter {subfilter}')
+            filter_instance = cls.__subclasses__[filter_kind](job, None)  # type: ignore[operator]
+            if cls.passes_elements(filter_kind, next_filter_kind):
+                data = filter_instance.filter_elements(data, subfilter)
+            else:
+                data = filter_instance.filter(data, subfilter)
+        return data, job
 
     @classmethod
     def filter_chain_needs_bytes(cls, filter_name: Union[str, List[Union[str, Dict[str, Any]]]]) -> bool:
@@ -207,6 +237,60 @@ class FilterBase(object, metaclass=TrackSubClasses):
             name for name, class_ in cls.__subclasses__.items() if getattr(class_, '__uses_bytes__', False)
         )
 
+    @classmethod
+    def is_cpu_bound_filter_kind(cls, filter_kind: str) -> bool:
+        """Returns True if the filter is CPU-heavy and can be run in a separate process (built-in filters only, as
+        filters defined in hooks are not available there)."""
+        filtercls = cls.__subclasses__.get(filter_kind)
+        return getattr(filtercls, '__cpu_bound__', False) and getattr(filtercls, '__module__', None) == __name__
+
+    @classmethod
+    def passes_elements(cls, filter_kind: str, next_filter_kind: Optional[str]) -> bool:
+        """Returns True if the filter can pass the elements it selects (LxmlElements) to the next filter instead of
+        their serialization, so that the next filter does not have to parse them again (built-in filters only, as
+        filters defined in hooks may expect the serialization)."""
+        filtercls = cls.__subclasses__.get(filter_kind)
+        next_filtercls = cls.__subclasses__.get(next_filter_kind) if next_filter_kind else None
+        return (
+            hasattr(filtercls, 'filter_elements')
+            and getattr(filtercls, '__module__', None) == __name__
+            and getattr(next_filtercls, '__accepts_elements__', False)
+            and getattr(next_filtercls, '__module__', None) == __name__
+        )
+
+    @classmethod
+    def is_deterministic_filter_kind(cls, filter_kind: str) -> bool:
+        """Returns True if the output of the filter depends only on the data and subfilter, so that running it again on
+        the same data can be skipped (built-in filters only, as filters defined in hooks can be changed at any time)."""
+        filtercls = cls.__subclasses__.get(filter_kind)
+        return getattr(filtercls, '__deterministic__', False) and getattr(filtercls, '__module__', None) == __name__
+
+    @classmethod
+    def get_package_versions(cls, filter_kinds: Iterable[str]) -> Dict[str, str]:
+        """Returns the versions of the distribution packages used by the filters (see __packages__), which their output
+        depends on ('' for those not installed)."""
+        return {
+            package: get_package_version(package)
+            for filter_kind in filter_kinds
+            for package in getattr(cls.__subclasses__.get(filter_kind), '__packages__', ())
+        }
+
+    @classmethod
+    def prepare(cls, subfilter: Dict[str, Any]) -> Any:
+        """Returns what the filter can compute once from the subfilter to be reused every time it is applied (e.g.
+        compiled regular expressions), or None. A FilterPipeline calls it when built; invalid subfilters must not
+        raise an exception here but when the filter is applied, where the job is known.
+
+        :param subfilter: The (normalized) subfilter.
+        :returns: The prepared subfilter, made available to filter() by get_prepared().
+        """
+        return None
+
+    def get_prepared(self, subfilter: Dict[str, Any]) -> Any:
+        """Returns what prepare() returned for the subfilter, calling it if the filter is not applied by a
+        FilterPipeline."""
+        return self.prepared if self.prepared is not None else self.prepare(subfilter)
+
     def match(self) -> bool:
         return False
 
@@ -214,6 +298,63 @@ class FilterBase(object, metaclass=TrackSubClasses):
         raise NotImplementedError()
 
 
+class FilterStep(NamedTuple):
+    """A filter of a FilterPipeline."""
+
+    kind: str
+    subfilter: Dict[str, Any]
+    prepared: Any
+
+
+class FilterPipeline:
+    """The filters of a job's 'filter' or 'diff_filter' directive, normalized and validated once and with their
+    subfilters prepared (e.g. regular expressions, CSS selectors and XPath expressions compiled), to be applied to the
+    data of each run of the job (see JobBase.compile)."""
+
+    def __init__(self, filter_spec: Optional[Union[str, List[Union[str, Dict[str, Any]]]]]) -> None:
+        """
+        :param filter_spec: The filters as specified in the job.
+        :raises ValueError: If a filter or subfilter is unknown.
+        """
+        self.filter_list = list(FilterBase.normalize_filter_list(filter_spec))
+        self._steps: Optional[List[FilterStep]] = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # prepared subfilters (e.g. lxml objects) cannot be pickled, e.g. to be sent to another process with the job;
+        # they are prepared again there if needed
+        return {'filter_list': self.filter_list, '_steps': None}
+
+    @property
+    def steps(self) -> List[FilterStep]:
+        """The filters with their prepared subfilters (prepared when first needed)."""
+        if self._steps is None:
+            steps = []
+            for filter_kind, subfilter in self.filter_list:
+                try:
+                    prepared = FilterBase.__subclasses__[filter_kind].prepare(subfilter)
+                except Exception:
+                    prepared = None  # the error is raised when the filter is applied
+                steps.append(FilterStep(filter_kind, subfilter, prepared))
+            self._steps = steps
+        return self._steps
+
+    def process(
+        self, state: JobState, data: Union[bytes, str], steps: Optional[Iterable[FilterStep]] = None
+    ) -> Union[bytes, str]:
+        """Applies the filters to the data.
+
+        :param state: The JobState of the job.
+        :param data: The data to filter.
+        :param steps: The filters to apply, if not all of them.
+        :returns: The filtered data.
+        """
+        steps = self.steps if steps is None else list(steps)
+        next_filter_kinds = [step.kind for step in steps[1:]] + [None]
+        for step, next_filter_kind in zip(steps, next_filter_kinds):
+            data = FilterBase.process(step.kind, step.subfilter, state, data, step.prepared, next_filter_kind)
+        return data
+
+
 class AutoMatchFilter(FilterBase):
     """Automatically matches subclass filters with a given location."""
 
@@ -258,17 +399,19 @@ class BeautifyFilter(FilterBase):
     """Beautify HTML (requires Python package 'BeautifulSoup' and optionally 'jsbeautifier' and/or 'cssbeautifier')."""
 
     __kind__ = 'beautify'
+    __packages__ = ('beautifulsoup4', 'lxml', 'jsbeautifier', 'cssbeautifier')
+    __cpu_bound__ = True
 
     __no_subfilter__ = True
 
     def filter(self, data: Union[str, bytes], subfilter: Dict[str, Any]) -> str:
-        if BeautifulSoup is None:
+        if bs4 is None:
             raise ImportError(
                 f"Python package 'BeautifulSoup' is not installed; cannot use the '{self.__kind__}' "
                 f'filter ({self.job.get_indexed_location()})'
             )
 
-        soup = BeautifulSoup(data, features='lxml')
+        soup = bs4.BeautifulSoup(data, features='lxml')
 
         if jsbeautifier is None:
             logger.info(
@@ -301,6 +444,8 @@ class Html2TextFilter(FilterBase):
     """Convert HTML to Markdown text."""
 
     __kind__ = 'html2text'
+    __packages__ = ('html2text', 'beautifulsoup4', 'lxml')
+    __cpu_bound__ = True
 
     __supported_subfilters__ = {
         'method': 'Method to use for conversion (html2text [default], bs4, or strip_tags)',
@@ -323,13 +468,10 @@ class Html2TextFilter(FilterBase):
         'strip_tags': A simple regex-based HTML tag stripper
         """
 
-        # extract method and options from subfilter, defaulting to method html2text
-        if 'method' in subfilter:
-            method = subfilter['method']
-            del subfilter['method']
-        else:
-            method = 'html2text'
-        options = subfilter
+        # extract method and options from subfilter, defaulting to method html2text (the subfilter is not modified, as
+        # it is reused every time the job is run)
+        options = dict(subfilter)
+        method = options.pop('method', 'html2text')
 
         if method in ('html2text', 'pyhtml2text'):  # pythtml2text for backward compatibility
             if method == 'pyhtml2text':
@@ -355,14 +497,14 @@ class Html2TextFilter(FilterBase):
             return parser.handle(data)
 
         elif method == 'bs4':
-            if BeautifulSoup is None:
+            if bs4 is None:
                 raise ImportError(
                     f"Python package 'BeautifulSoup' is not installed; cannot use the '{self.__kind__}: "
                     f"{method}' filter ({self.job.get_indexed_location()})"
                 )
 
             parser = options.pop('parser', 'lxml')
-            soup = BeautifulSoup(data, parser)
+            soup = bs4.BeautifulSoup(data, parser)
             return soup.get_text(strip=True)
 
         elif method in ('strip_tags', 're'):  # re for backward compatibility
@@ -393,7 +535,9 @@ class Pdf2TextFilter(FilterBase):  # pragma: has-pdftotext
     # Note: check pdftotext website for OS-specific dependencies for install
 
     __kind__ = 'pdf2text'
+    __packages__ = ('pdftotext',)
     __uses_bytes__ = True  # Requires data to be in bytes (not unicode)
+    __cpu_bound__ = True
 
     __supported_subfilters__ = {
         'password': 'PDF password for decryption',
@@ -420,6 +564,8 @@ class Ical2TextFilter(FilterBase):
     """Convert iCalendar to plaintext (requires Python package 'vobject')."""
 
     __kind__ = 'ical2text'
+    __packages__ = ('vobject',)
+    __cpu_bound__ = True
 
     __no_subfilter__ = True
 
@@ -486,6 +632,7 @@ class XMLFormatFilter(FilterBase):
     """Convert to formatted XML using lxml.etree."""
 
     __kind__ = 'format-xml'
+    __packages__ = ('lxml',)
 
     __no_subfilter__ = True
 
@@ -528,13 +675,18 @@ class KeepLinesFilter(FilterBase):
 
     __default_subfilter__ = 'text'
 
+    @classmethod
+    def prepare(cls, subfilter: Dict[str, Any]) -> Optional[re.Pattern]:
+        return re.compile(subfilter['re']) if 're' in subfilter and 'text' not in subfilter else None
+
     def filter(  # type: ignore[override]
         self: Union['KeepLinesFilter', 'GrepFilter'], data: str, subfilter: Dict[str, Any]
     ) -> str:
         if 'text' in subfilter:
             return '\n'.join(line for line in data.splitlines() if subfilter['text'] in line)
         if 're' in subfilter:
-            return '\n'.join(line for line in data.splitlines() if re.search(subfilter['re'], line))
+            search = self.get_prepared(subfilter).search
+            return '\n'.join(line for line in data.splitlines() if search(line))
         else:
             raise ValueError(
                 f'The keep_lines_containing filter needs a text or re expression'
@@ -553,6 +705,8 @@ class GrepFilter(FilterBase):
 
     __default_subfilter__ = 're'
 
+    prepare = KeepLinesFilter.prepare
+
     def filter(self, data: str, subfilter: Dict[str, Any]) -> str:  # type: ignore[override]
         warnings.warn(
             f"'grep' filter is deprecated; replace with 'keep_lines_containing' (+ 're' subfilter)"
@@ -574,6 +728,8 @@ class DeleteLinesFilter(FilterBase):
 
     __default_subfilter__ = 'text'
 
+    prepare = KeepLinesFilter.prepare
+
     def filter(  # type: ignore[override]
         self: Union['DeleteLinesFilter', 'InverseGrepFilter'],
         data: str,
@@ -582,7 +738,8 @@ class DeleteLinesFilter(FilterBase):
         if 'text' in subfilter:
             return '\n'.join(line for line in data.splitlines() if subfilter['text'] not in line)
         if 're' in subfilter:
-            return '\n'.join(line for line in data.splitlines() if re.search(subfilter['re'], line) is None)
+            search = self.get_prepared(subfilter).search
+            return '\n'.join(line for line in data.splitlines() if search(line) is None)
         else:
             raise ValueError(
                 f'The delete_lines_containing filter needs a text or re expression ({self.job.get_indexed_location()})'
@@ -600,6 +757,8 @@ class InverseGrepFilter(FilterBase):
 
     __default_subfilter__ = 're'
 
+    prepare = KeepLinesFilter.prepare
+
     def filter(self, data: str, subfilter: Dict[str, Any]) -> str:  # type: ignore[override]
         warnings.warn(
             f"'grepi' filter is deprecated; replace with 'delete_lines_containing (+ 're' subfilter')"
@@ -694,6 +853,41 @@ class ElementsBy(HTMLParser, ABC):
     def get_html(self) -> str:
         return ''.join(self._result)
 
+    def feed(self, data: Union[str, LxmlElements]) -> None:
+        if isinstance(data, LxmlElements):
+            if data.is_reparsable('html'):
+                # handle the elements selected by the previous filter as parsing their serialization would
+                for i, element in enumerate(data.elements):
+                    if i:
+                        self.handle_data('\n')
+                    self._handle_element(element, 0)
+                return
+            data = data.to_string()
+        super().feed(data)
+
+    def _handle_element(self, element: etree._Element, level: Optional[int]) -> None:
+        """Handles the element and its descendants, with the whitespace that serializing them with pretty_print adds:
+        libxml2 indents the children of an element without text content by two spaces per level (up to 30), unless
+        its parent has text content, in which case level is None.
+        """
+        if not isinstance(element.tag, str):
+            return  # comments and processing instructions are ignored
+        self.handle_starttag(element.tag, list(element.attrib.items()))
+        if level is not None and len(element) and not element.text and not any(child.tail for child in element):
+            indent = '\n' + '  ' * min(level + 1, 30)
+            self.handle_data(indent)
+            for i, child in enumerate(element, 1):
+                self._handle_element(child, level + 1)
+                self.handle_data(indent if i < len(element) else '\n' + '  ' * min(level, 30))
+        else:
+            if element.text:
+                self.handle_data(element.text)
+            for child in element:
+                self._handle_element(child, None)
+                if child.tail:
+                    self.handle_data(child.tail)
+        self.handle_endtag(element.tag)
+
     def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
         ad = dict(attrs)
 
@@ -725,6 +919,7 @@ class GetElementById(FilterBase):
     """Get an HTML element by its ID."""
 
     __kind__ = 'element-by-id'
+    __accepts_elements__ = True
 
     __supported_subfilters__ = {
         'id': 'ID of the element to filter for (required)',
@@ -745,6 +940,7 @@ class GetElementByClass(FilterBase):
     """Get all HTML elements by class."""
 
     __kind__ = 'element-by-class'
+    __accepts_elements__ = True
 
     __supported_subfilters__ = {
         'class': 'HTML class attribute to filter for (required)',
@@ -767,6 +963,7 @@ class GetElementByStyle(FilterBase):
     """Get all HTML elements by style."""
 
     __kind__ = 'element-by-style'
+    __accepts_elements__ = True
 
     __supported_subfilters__ = {
         'style': 'HTML style attribute value to filter for (required)',
@@ -789,6 +986,7 @@ class GetElementByTag(FilterBase):
     """Get an HTML element by its tag"""
 
     __kind__ = 'element-by-tag'
+    __accepts_elements__ = True
 
     __supported_subfilters__ = {
         'tag': 'HTML tag name to filter for (required)',
@@ -836,6 +1034,14 @@ class HexdumpFilter(FilterBase):
         )
 
 
+class LxmlExpressions(NamedTuple):
+    """The lxml parser and compiled expressions of a css or xpath filter (see LxmlParser.prepare)."""
+
+    parser: etree._FeedParser
+    selector: etree.XPath
+    exclude: Optional[etree.XPath]
+
+
 class LxmlParser:
     EXPR_NAMES = {
         'css': 'a CSS selector',
@@ -847,6 +1053,7 @@ class LxmlParser:
         filter_kind: str,
         subfilter: Dict[str, Any],
         expr_key: str,
+        prepared: Optional[LxmlExpressions] = None,
     ) -> None:
         self.filter_kind = filter_kind
         if expr_key not in subfilter:
@@ -867,9 +1074,36 @@ class LxmlParser:
             )
         if self.method == 'html' and self.namespaces:
             raise ValueError(f"Namespace prefixes only supported with 'xml' method ({self.job.get_indexed_location()})")
-        self.parser = (etree.HTMLParser if self.method == 'html' else etree.XMLParser)()
+        self.parser, self.selector, self.exclude_selector = prepared or self.prepare(filter_kind, subfilter, expr_key)
         self.data = ''
 
+    @staticmethod
+    def prepare(filter_kind: str, subfilter: Dict[str, Any], expr_key: str) -> LxmlExpressions:
+        """Returns the parser and compiled expressions for the subfilter, which can be reused for any data (lxml
+        serializes their use by different threads).
+
+        :param filter_kind: 'css' or 'xpath'.
+        :param subfilter: The (normalized) subfilter.
+        :param expr_key: The key of the expression in the subfilter.
+        :returns: The parser and the compiled expressions.
+        """
+        namespaces = subfilter.get('namespaces')
+        if filter_kind == 'css':
+
+            def compile_expression(expression: str) -> etree.XPath:
+                return lxml_cssselect.CSSSelector(expression, namespaces=namespaces)
+
+        else:
+
+            def compile_expression(expression: str) -> etree.XPath:
+                return etree.XPath(expression, namespaces=namespaces)
+
+        return LxmlExpressions(
+            (etree.HTMLParser if subfilter.get('method', 'html') == 'html' else etree.XMLParser)(),
+            compile_expression(subfilter[expr_key]),
+            compile_expression(subfilter['exclude']) if subfilter.get('exclude') else None,
+        )
+
     def feed(self, data: str) -> None:
         self.data += data
 
@@ -949,28 +1183,70 @@ class LxmlParser:
             root = etree.fromstring(self.data, self.parser)  # bandit B320: use defusedxml TODO
         if root is None:
             return []
-        selected_elems = [None]
-        excluded_elems = None
-        if self.filter_kind == 'css':
-            selected_elems = CSSSelector(self.expression, namespaces=self.namespaces).evaluate(root)
-            excluded_elems = (
-                CSSSelector(self.exclude, namespaces=self.namespaces).evaluate(root) if self.exclude else None
-            )
-        elif self.filter_kind == 'xpath':
-            selected_elems = root.xpath(self.expression, namespaces=self.namespaces)
-            excluded_elems = root.xpath(self.exclude, namespaces=self.namespaces) if self.exclude else None
+        selected_elems = self.selector(root)
+        excluded_elems = self.exclude_selector(root) if self.exclude_selector is not None else None
+        if not excluded_elems and isinstance(selected_elems, list):
+            return selected_elems  # no element removed: no need to reevaluate the ones selected
         if excluded_elems is not None:
             for el in excluded_elems:
                 self._remove_element(el)
         return [el for el in map(self._reevaluate, selected_elems) if el is not None]
 
-    def get_filtered_data(self) -> str:
+    def get_filtered_elements(self) -> LxmlElements:
         elements = list(self._get_filtered_elements())
         if self.skip:
             elements = elements[self.skip :]
         if self.maxitems:
             elements = elements[: self.maxitems]
-        return '\n'.join(self._to_string(element) for element in elements)
+        return LxmlElements(elements, self.method)
+
+    def get_filtered_data(self) -> str:
+        return self.get_filtered_elements().to_string()
+
+
+# Elements whose content is not parsed as markup by Python's html.parser (in some versions), so that their serialization
+# is not parsed back into the same text
+RAW_TEXT_ELEMENTS = (
+    'iframe',
+    'noembed',
+    'noframes',
+    'noscript',
+    'plaintext',
+    'script',
+    'style',
+    'textarea',
+    'title',
+    'xmp',
+)
+
+
+class LxmlElements(NamedTuple):
+    """The elements (or text, for XPath expressions selecting text or attributes) selected by a css or xpath filter in
+    a FilterPipeline, passed as such to the next filter if it's an element-by-* one so that it does not have to parse
+    their serialization (see FilterBase.passes_elements)."""
+
+    elements: List[Union[etree._Element, str]]
+    method: str
+
+    def to_string(self) -> str:
+        """Returns the serialization of the elements, i.e. the output of the filter that selected them."""
+        return '\n'.join(LxmlParser._to_string(element) for element in self.elements)
+
+    def is_reparsable(self, method: str) -> bool:
+        """Returns True if parsing the serialization of the elements with the method gives back the same elements
+        (except for the whitespace added by pretty_print), i.e. if they are all elements selected with that method and
+        none has content that is not parsed as markup.
+
+        :param method: The method ('html' or 'xml') of the filter parsing the serialization.
+        :returns: Whether the elements can be used instead of parsing their serialization.
+        """
+        if self.method != method or not all(
+            isinstance(element, etree._Element) and isinstance(element.tag, str) for element in self.elements
+        ):
+            return False
+        return method != 'html' or all(
+            next(element.iter(*RAW_TEXT_ELEMENTS), None) is None for element in self.elements
+        )
 
 
 LXML_PARSER_COMMON_SUBFILTERS = {
@@ -986,6 +1262,8 @@ class CssFilter(FilterBase):
     """Filter XML/HTML using CSS selectors."""
 
     __kind__ = 'css'
+    __packages__ = ('lxml', 'cssselect')
+    __cpu_bound__ = True
 
     __supported_subfilters__ = {
         'selector': 'The CSS selector to use for filtering (required)',
@@ -994,16 +1272,25 @@ class CssFilter(FilterBase):
 
     __default_subfilter__ = 'selector'
 
+    @classmethod
+    def prepare(cls, subfilter: Dict[str, Any]) -> Optional[LxmlExpressions]:
+        return LxmlParser.prepare('css', subfilter, 'selector') if 'selector' in subfilter else None
+
     def filter(self, data: str, subfilter: Dict[str, Any]) -> str:  # type: ignore[override]
-        lxml_parser = LxmlParser('css', subfilter, 'selector')
+        return self.filter_elements(data, subfilter).to_string()
+
+    def filter_elements(self, data: str, subfilter: Dict[str, Any]) -> LxmlElements:
+        lxml_parser = LxmlParser('css', subfilter, 'selector', self.prepared)
         lxml_parser.feed(data)
-        return lxml_parser.get_filtered_data()
+        return lxml_parser.get_filtered_elements()
 
 
 class XPathFilter(FilterBase):
     """Filter XML/HTML using XPath expressions."""
 
     __kind__ = 'xpath'
+    __packages__ = ('lxml',)
+    __cpu_bound__ = True
 
     __supported_subfilters__ = {
         'path': 'The XPath to use for filtering (required)',
@@ -1012,10 +1299,17 @@ class XPathFilter(FilterBase):
 
     __default_subfilter__ = 'path'
 
+    @classmethod
+    def prepare(cls, subfilter: Dict[str, Any]) -> Optional[LxmlExpressions]:
+        return LxmlParser.prepare('xpath', subfilter, 'path') if 'path' in subfilter else None
+
     def filter(self, data: str, subfilter: Dict[str, Any]) -> str:  # type: ignore[override]
-        lxml_parser = LxmlParser('xpath', subfilter, 'path')
+        return self.filter_elements(data, subfilter).to_string()
+
+    def filter_elements(self, data: str, subfilter: Dict[str, Any]) -> LxmlElements:
+        lxml_parser = LxmlParser('xpath', subfilter, 'path', self.prepared)
         lxml_parser.feed(data)
-        return lxml_parser.get_filtered_data()
+        return lxml_parser.get_filtered_elements()
 
 
 class RegexSub(FilterBase):
@@ -1030,12 +1324,16 @@ class RegexSub(FilterBase):
 
     __default_subfilter__ = 'pattern'
 
+    @classmethod
+    def prepare(cls, subfilter: Dict[str, Any]) -> Optional[re.Pattern]:
+        return re.compile(subfilter['pattern']) if 'pattern' in subfilter else None
+
     def filter(self, data: Union[bytes, str], subfilter: Dict[str, Any]) -> str:
         if 'pattern' not in subfilter:
             raise ValueError(f'The re.sub filter needs a pattern ({self.job.get_indexed_location()})')
 
         # Default: Replace with empty string if no "repl" value is set
-        return re.sub(subfilter['pattern'], subfilter.get('repl', ''), data)
+        return self.get_prepared(subfilter).sub(subfilter.get('repl', ''), data)
 
 
 class SortFilter(FilterBase):
@@ -1076,6 +1374,7 @@ class ShellPipeFilter(FilterBase):
     """Filter using a shell command."""
 
     __kind__ = 'shellpipe'
+    __deterministic__ = False
 
     __supported_subfilters__ = {
         'command': 'Shell command to execute for filtering (required)',
@@ -1119,6 +1418,7 @@ class ExecutePipeFilter(FilterBase):
     """Filter using a command."""
 
     __kind__ = 'execute'
+    __deterministic__ = False
 
     __supported_subfilters__ = {
         'command': 'Command to execute for filtering (required)',
@@ -1159,7 +1459,9 @@ class OCRFilter(FilterBase):  # pragma: has-pytesseract
     """Convert text in images to plaintext (requires Python packages 'pytesseract' and 'Pillow')."""
 
     __kind__ = 'ocr'
+    __packages__ = ('pytesseract', 'Pillow')
     __uses_bytes__ = True
+    __cpu_bound__ = True
 
     __supported_subfilters__ = {
         'language': 'Language of the text (e.g. "fra" or "eng+fra")',
@@ -1181,13 +1483,13 @@ class OCRFilter(FilterBase):  # pragma: has-pytesseract
                 f' ({self.job.get_indexed_location()})'
             )
 
-        if Image is None:
+        if PIL_Image is None:
             raise ImportError(
                 f"Python package 'Pillow' is not installed; cannot use the '{self.__kind__}' filter"
                 f' ({self.job.get_indexed_location()})'
             )
 
-        return pytesseract.image_to_string(Image.open(io.BytesIO(data)), lang=language, timeout=timeout).strip()
+        return pytesseract.image_to_string(PIL_Image.open(io.BytesIO(data)), lang=language, timeout=timeout).strip()
 
 
 class JQFilter(FilterBase):  # pragma: has-jq
@@ -1196,6 +1498,7 @@ class JQFilter(FilterBase):  # pragma: has-jq
     # contributed by robgmills https://github.com/thp/urlwatch/pull/626
 
     __kind__ = 'jq'
+    __packages__ = ('jq',)
 
     __supported_subfilters__ = {
         'query': 'jq query function to execute on data',
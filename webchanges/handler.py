@@ -2,26 +2,39 @@
 
 from __future__ import annotations
 
+import asyncio
 import difflib
 import email.utils
+import hashlib
+import itertools
+import json
 import logging
+import platform
 import shlex
 import subprocess
 import tempfile
 import time
 import timeit
 import traceback
+from concurrent.futures import Executor
 from pathlib import Path
 from types import TracebackType
-from typing import Any, Dict, Iterable, List, Optional, TYPE_CHECKING, Type, Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING, Type, Union
+from urllib.parse import urlsplit
 
+import requests
+
+from . import __version__
 from .filters import FilterBase
-from .jobs import JobBase, NotModifiedError
+from .jobs import BrowserPool, DeferredError, HttpSessionPool, JobBase, NotModifiedError
 from .reporters import ReporterBase
 from .storage import CacheStorage
+from .util import profiler
 
 # https://stackoverflow.com/questions/39740632
 if TYPE_CHECKING:
+    import aiohttp
+
     from .main import Urlwatch
 
 logger = logging.getLogger(__name__)
@@ -40,11 +53,44 @@ class JobState(object):
     old_etag: str = ''
     new_etag: str = ''
     error_ignored: Union[bool, str] = False
+    duration: Optional[float] = None
+    expected_duration: Optional[float] = None
+    old_filter_cache: Optional[Dict[str, Any]] = None
+    filter_cache: Optional[Dict[str, Any]] = None
+    retrieve_time: Optional[float] = None
+    filter_time: Optional[float] = None
+    diff_time: Optional[float] = None
+    size: Optional[int] = None
+    http_status: Optional[int] = None
     _generated_diff: Optional[str] = ''
 
-    def __init__(self, cache_storage: CacheStorage, job: JobBase) -> None:
+    def __init__(
+        self,
+        cache_storage: CacheStorage,
+        job: JobBase,
+        session_pool: Optional[HttpSessionPool] = None,
+        browser_pool: Optional[BrowserPool] = None,
+        filter_pool: Optional[Executor] = None,
+        deadline: Optional[float] = None,
+    ) -> None:
+        """
+        :param cache_storage: The cache storage.
+        :param job: The job.
+        :param session_pool: The run-wide pool of HTTP sessions used by url jobs; if None, each request opens (and
+            closes) its own connection.
+        :param browser_pool: The run-wide pool of browsers used by url jobs with use_browser: true; if None, each job
+            launches (and closes) its own browser.
+        :param filter_pool: The run-wide process pool running CPU-heavy filters; if None, all filters are run in the
+            calling thread.
+        :param deadline: The time.monotonic() time by which the run must end, if any; the job is deferred if it cannot
+            be completed by then.
+        """
         self.cache_storage = cache_storage
         self.job = job
+        self.session_pool = session_pool
+        self.browser_pool = browser_pool
+        self.filter_pool = filter_pool
+        self.deadline = deadline
 
     def __enter__(self) -> 'JobState':
         try:
@@ -71,9 +117,13 @@ class JobState(object):
     def load(self) -> None:
         """Loads new data for the job."""
         guid = self.job.get_guid()
-        self.old_data, self.old_timestamp, self.tries, self.old_etag = self.cache_storage.load(guid)
-        if self.job.compared_versions and self.job.compared_versions > 1:
-            self.history_data = self.cache_storage.get_history_data(guid, self.job.compared_versions)
+        with profiler.phase('job load'):
+            (
+                (self.old_data, self.old_timestamp, self.tries, self.old_etag),
+                self.old_filter_cache,
+            ) = self.cache_storage.load_with_filter_cache(guid)
+            if self.job.compared_versions and self.job.compared_versions > 1:
+                self.history_data = self.cache_storage.get_history_data(guid, self.job.compared_versions)
 
     def save(self) -> None:
         """Saves any new data already loaded for the job."""
@@ -81,76 +131,271 @@ class JobState(object):
             # If no new data has been retrieved due to an exception, reuse the old job data
             self.new_data = self.old_data
             self.new_etag = self.old_etag
+            self.filter_cache = self.old_filter_cache
+
+        with profiler.phase('job save'):
+            self.cache_storage.save(
+                guid=self.job.get_guid(),
+                data=self.new_data,
+                timestamp=self.new_timestamp,
+                tries=self.tries,
+                etag=self.new_etag,
+                filter_cache=self.filter_cache,
+            )
 
-        self.cache_storage.save(
-            guid=self.job.get_guid(),
-            data=self.new_data,
-            timestamp=self.new_timestamp,
-            tries=self.tries,
-            etag=self.new_etag,
+    def save_filter_cache(self) -> None:
+        """Saves the filter cache with the latest snapshot if it has changed, i.e. if the data retrieved has changed but
+        not the filtered data (in which case no new snapshot is saved), so that the filters are skipped the next time
+        the same data is retrieved."""
+        if self.filter_cache and self.filter_cache != self.old_filter_cache:
+            self.cache_storage.save_filter_cache(self.job.get_guid(), self.filter_cache)
+
+    def time_left(self) -> Optional[float]:
+        """Returns the number of seconds left before the deadline of the run (0 if past), or None if there is none."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def _must_defer(self) -> bool:
+        """Returns True if the job should not be started as it cannot be completed by the deadline, judging by the
+        duration of its latest run."""
+        time_left = self.time_left()
+        return time_left is not None and time_left <= (self.expected_duration or 0.0)
+
+    def _is_deadline_error(self, e: Exception) -> bool:
+        """Returns True if the exception is a timeout raised once the deadline of the run has passed, i.e. most likely
+        caused by the timeout having been cut short to the time left (see defer)."""
+        return self.time_left() == 0 and isinstance(
+            e, (requests.exceptions.Timeout, subprocess.TimeoutExpired, asyncio.TimeoutError)
         )
 
+    def defer(self) -> None:
+        """Records the job as deferred to the next run due to the deadline, without counting it as a failure."""
+        logger.info(f'Job {self.job.index_number}: Deferred to the next run as the run is reaching its deadline')
+        self.exception = DeferredError('Deferred as the run reached its deadline')
+        self.traceback = ''
+        self.error_ignored = False
+
     def process(self) -> 'JobState':
         """Processes the job: loads it and handles exceptions."""
         logger.info(f'Job {self.job.index_number}: Processing job {self.job}')
 
         if self.exception:
             return self
+        if self._must_defer():
+            self.defer()
+            return self
 
+        start = timeit.default_timer()
         try:
             try:
                 self.load()
 
                 self.new_timestamp = time.time()
-                data, self.new_etag = self.job.retrieve(self)
+                retrieve_start = timeit.default_timer()
+                with profiler.phase('job retrieve'):
+                    data, self.new_etag = self.job.retrieve(self)
+                self._record_retrieval(data, timeit.default_timer() - retrieve_start)
 
-                # Apply automatic filters first
-                filtered_data = FilterBase.auto_process(self, data)
+                filter_start = timeit.default_timer()
+                self.new_data = self.filter_data(data)
+                self.filter_time = timeit.default_timer() - filter_start
 
-                # Apply any specified filters
-                for filter_kind, subfilter in FilterBase.normalize_filter_list(self.job.filter):
-                    filtered_data = FilterBase.process(filter_kind, subfilter, self, filtered_data)
+            except Exception as e:
+                if self._is_deadline_error(e):
+                    self.defer()
+                else:
+                    # job has a chance to format and ignore its error
+                    self._handle_job_exception(e)
+        except Exception as e:
+            # job failed its chance to handle error
+            self._handle_internal_exception(e)
 
-                self.new_data = filtered_data
+        self.duration = timeit.default_timer() - start
+        return self
 
+    async def process_async(self, session: Optional[aiohttp.ClientSession] = None) -> 'JobState':
+        """Processes the job asynchronously (for UrlJobs run by the 'aiohttp' HTTP engine and BrowserJobs run in the
+        event loop of the browser pool): loads it and handles exceptions. Filters are run in the event loop's default
+        executor so as not to block the loop.
+
+        :param session: The aiohttp.ClientSession shared by all the jobs of the run (for UrlJobs).
+        """
+        logger.info(f'Job {self.job.index_number}: Processing job {self.job} (asynchronously)')
+
+        if self.exception:
+            return self
+        if self._must_defer():
+            self.defer()
+            return self
+
+        start = timeit.default_timer()
+        try:
+            try:
+                self.load()
+
+                self.new_timestamp = time.time()
+                retrieve_start = timeit.default_timer()
+                with profiler.phase('job retrieve (async)', concurrent=True):
+                    data, self.new_etag = await self.job.retrieve_async(self, session)  # type: ignore[attr-defined]
+                self._record_retrieval(data, timeit.default_timer() - retrieve_start)
+
+                filter_start = timeit.default_timer()
+                self.new_data = await asyncio.get_running_loop().run_in_executor(None, self.filter_data, data)
+                self.filter_time = timeit.default_timer() - filter_start
+
+            except asyncio.CancelledError:
+                # a subclass of Exception in Python 3.7: the cancellation (e.g. by the deadline) must propagate
+                raise
             except Exception as e:
-                # job has a chance to format and ignore its error
-                self.exception = e
-                self.traceback = self.job.format_error(e, traceback.format_exc())
-                self.error_ignored = self.job.ignore_error(e)
-                if not (self.error_ignored or isinstance(e, NotModifiedError)):
-                    self.tries += 1
-                    logger.debug(
-                        f'Job {self.job.index_number}: Job ended with error; incrementing cumulative tries to '
-                        f'{self.tries} ({str(e).strip()})'
-                    )
+                if self._is_deadline_error(e):
+                    self.defer()
+                else:
+                    # job has a chance to format and ignore its error
+                    self._handle_job_exception(e)
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             # job failed its chance to handle error
-            self.exception = e
-            self.traceback = traceback.format_exc()
-            self.error_ignored = False
-            if not isinstance(e, NotModifiedError):
-                self.tries += 1
-                logger.debug(
-                    f'Job {self.job.index_number}: Job ended with error (internal handling failed); '
-                    f'incrementing cumulative tries to {self.tries} ({str(e).strip()})'
-                )
+            self._handle_internal_exception(e)
 
+        self.duration = timeit.default_timer() - start
         return self
 
+    def _record_retrieval(self, data: Union[bytes, str], retrieve_time: float) -> None:
+        """Records the time taken to retrieve the data and its size in bytes, for the run statistics."""
+        self.retrieve_time = retrieve_time
+        self.size = len(data) if isinstance(data, bytes) else len(data.encode(errors='replace'))
+
+    def filter_data(self, data: Union[bytes, str]) -> Union[bytes, str]:
+        """Applies the filters to the retrieved data (see apply_filters), unless both the data and the filters are the
+        same as when the latest snapshot was saved, in which case the data of that snapshot is reused (with the
+        attributes set on the job by the filters then) without running any filter."""
+        key = self._filter_cache_key(data)
+        if key is None:
+            return self.apply_filters(data)
+
+        if self.old_filter_cache and self.old_filter_cache.get('key') == key:
+            logger.info(f'Job {self.job.index_number}: Retrieved data unchanged; reusing the filtered data of last run')
+            for attr, value in self.old_filter_cache.get('job', {}).items():
+                setattr(self.job, attr, value)
+            self.filter_cache = self.old_filter_cache
+            return self.old_data
+
+        job_attrs = dict(self.job.__dict__)
+        filtered_data = self.apply_filters(data)
+        self.filter_cache = {
+            'key': key,
+            'job': {
+                attr: value
+                for attr, value in self.job.__dict__.items()
+                if isinstance(value, (bool, int, float, str)) and (attr not in job_attrs or job_attrs[attr] != value)
+            },
+        }
+        return filtered_data
+
+    def _filter_cache_key(self, data: Union[bytes, str]) -> Optional[str]:
+        """Returns a hash of the retrieved data and of the filters to be applied to it (including the versions of Python
+        and of the packages used by the filters, on which their output depends), or None if the filters must be run even
+        if these are unchanged (i.e. if any filter is defined in hooks or runs an external command)."""
+        filter_list = self.job.get_filter_list()
+        if FilterBase.auto_match(self) or not all(
+            FilterBase.is_deterministic_filter_kind(filter_kind) for filter_kind, _ in filter_list
+        ):
+            return None
+
+        filter_hash = hashlib.sha1(  # nosec: B303
+            data if isinstance(data, bytes) else data.encode(errors='surrogatepass')
+        )
+        package_versions = FilterBase.get_package_versions(filter_kind for filter_kind, _ in filter_list)
+        filter_hash.update(
+            json.dumps(
+                [__version__, platform.python_version(), package_versions, type(data).__name__, filter_list],
+                default=str,
+            ).encode()
+        )
+        return filter_hash.hexdigest()
+
+    def apply_filters(self, data: Union[bytes, str]) -> Union[bytes, str]:
+        """Applies the automatic filters and then those specified in the job to the retrieved data."""
+        # Apply automatic filters first
+        filtered_data = FilterBase.auto_process(self, data)
+
+        # Apply any specified filters
+        filter_pipeline = self.job.get_filter_pipeline()
+        if self.filter_pool is None or type(self.job).__module__ != JobBase.__module__:
+            # jobs of classes defined in hooks cannot be sent to another process, where hooks are not loaded
+            return filter_pipeline.process(self, filtered_data)
+
+        # consecutive CPU-heavy filters are run together in the process pool, so that they scale across cores
+        for cpu_bound, steps in itertools.groupby(
+            filter_pipeline.steps, key=lambda step: FilterBase.is_cpu_bound_filter_kind(step.kind)
+        ):
+            if cpu_bound:
+                cpu_bound_filters = [(step.kind, step.subfilter) for step in steps]
+                logger.info(
+                    f'Job {self.job.index_number}: Applying filters {[kind for kind, _ in cpu_bound_filters]} in a '
+                    f'separate process'
+                )
+                with profiler.phase(
+                    f'filters {"+".join(kind for kind, _ in cpu_bound_filters)} (process pool)', concurrent=True
+                ):
+                    filtered_data, job = self.filter_pool.submit(
+                        FilterBase.process_detached, cpu_bound_filters, self.job, filtered_data
+                    ).result()
+                # carry over any attributes set by the filters on the copy of the job in the other process
+                self.job.__dict__.update(job.__dict__)
+            else:
+                filtered_data = filter_pipeline.process(self, filtered_data, steps)
+
+        return filtered_data
+
+    def _handle_job_exception(self, e: Exception) -> None:
+        """Records an exception raised while processing the job, giving the job a chance to format and ignore it."""
+        self.exception = e
+        self.traceback = self.job.format_error(e, traceback.format_exc())
+        self.error_ignored = self.job.ignore_error(e)
+        if not (self.error_ignored or isinstance(e, NotModifiedError)):
+            self.tries += 1
+            logger.debug(
+                f'Job {self.job.index_number}: Job ended with error; incrementing cumulative tries to '
+                f'{self.tries} ({str(e).strip()})'
+            )
+
+    def _handle_internal_exception(self, e: Exception) -> None:
+        """Records an exception raised while the job was handling its own error."""
+        self.exception = e
+        self.traceback = traceback.format_exc()
+        self.error_ignored = False
+        if not isinstance(e, NotModifiedError):
+            self.tries += 1
+            logger.debug(
+                f'Job {self.job.index_number}: Job ended with error (internal handling failed); '
+                f'incrementing cumulative tries to {self.tries} ({str(e).strip()})'
+            )
+
+    def discard_data(self) -> None:
+        """Frees the memory taken by the data of the job (old, new and history) once no longer needed, i.e. after it
+        has been saved and if it will not be reported, reducing the JobState to a compact summary of the job's run."""
+        self.old_data = ''
+        self.new_data = ''
+        self.history_data = {}
+        self._generated_diff = ''
+
     def get_diff(self) -> Optional[str]:
         """Generates the job's diff and applies diff_filters."""
         if self._generated_diff != '':
             return self._generated_diff
 
-        _generated_diff = self._generate_diff()
+        diff_start = timeit.default_timer()
+        with profiler.phase('diff'):
+            _generated_diff = self._generate_diff()
         # Apply any specified diff filters
         if isinstance(_generated_diff, str):
-            for filter_kind, subfilter in FilterBase.normalize_filter_list(self.job.diff_filter):
-                _generated_diff = FilterBase.process(filter_kind, subfilter, self, _generated_diff)
-            self._generated_diff = str(_generated_diff)
+            self._generated_diff = str(self.job.get_filter_pipeline('diff_filter').process(self, _generated_diff))
         else:
             self._generated_diff = None
+        self.diff_time = timeit.default_timer() - diff_start
 
         return self._generated_diff
 
@@ -240,7 +485,13 @@ class Report(object):
         self.config: Dict[str, Any] = urlwatch_config.config_storage.config
 
         self.job_states: List[JobState] = []
+        self.not_due_job_states: List[JobState] = []
+        self.deferred_job_states: List[JobState] = []
+        self.reporter_durations: Dict[str, float] = {}  # seconds taken by each reporter to send its report
         self.start = timeit.default_timer()
+        self.start_timestamp = time.time()
+        # streaming: the data of job states that will not be reported is discarded as soon as they are classified
+        self.streaming: bool = self.config.get('worker', {}).get('streaming_report', True)
 
     def _result(self, verb: str, job_state: JobState) -> None:
         if job_state.exception is not None and job_state.exception is not NotModifiedError:
@@ -250,6 +501,8 @@ class Report(object):
             )
 
         job_state.verb = verb
+        if self.streaming and not self.is_reported(job_state):
+            job_state.discard_data()
         self.job_states.append(job_state)
 
     def new(self, job_state: JobState) -> None:
@@ -267,18 +520,63 @@ class Report(object):
     def error(self, job_state: JobState) -> None:
         self._result('error', job_state)
 
+    def not_due(self, job_state: JobState) -> None:
+        """Records a job that was not run because its interval has not elapsed since it was last checked; such jobs
+        are not part of job_states, i.e. they're not included in reports."""
+        job_state.verb = 'not_due'
+        self.not_due_job_states.append(job_state)
+
+    def deferred(self, job_state: JobState) -> None:
+        """Records a job that was not run, or was cancelled, because the run reached its deadline; such jobs are not
+        part of job_states, i.e. they're not included in reports."""
+        job_state.verb = 'deferred'
+        self.deferred_job_states.append(job_state)
+
+    def is_reported(self, job_state: JobState) -> bool:
+        """Returns whether the JobState has reportable changes per config['display']"""
+        return (
+            not any(
+                job_state.verb == verb and not self.config['display'][verb] for verb in ('unchanged', 'new', 'error')
+            )
+            and job_state.verb != 'changed,no_report'
+        )
+
     def get_filtered_job_states(self, job_states: List[JobState]) -> Iterable[JobState]:
         """Returns JobStates that have reportable changes per config['display']"""
         for job_state in job_states:
-            if (
-                not any(
-                    job_state.verb == verb and not self.config['display'][verb]
-                    for verb in ('unchanged', 'new', 'error')
-                )
-                and job_state.verb != 'changed,no_report'
-            ):
+            if self.is_reported(job_state):
                 yield job_state
 
+    def get_run_stats(self) -> List[Tuple[Any, ...]]:
+        """Returns the statistics of each job run (including deferred ones), to be saved in the database with
+        CacheStorage.save_run_stats().
+
+        :returns: A list of tuples (guid, location, host, outcome, duration, retrieve_time, filter_time, diff_time,
+           size, http_status).
+        """
+        stats = []
+        for job_state in self.job_states + self.deferred_job_states:
+            http_status = job_state.http_status
+            if http_status is None and job_state.exception is not None:
+                # e.g. requests' HTTPError or BrowserResponseError
+                response = getattr(job_state.exception, 'response', None)
+                http_status = getattr(response, 'status_code', getattr(job_state.exception, 'status_code', None))
+            stats.append(
+                (
+                    job_state.job.get_guid(),
+                    job_state.job.get_location(),
+                    urlsplit(getattr(job_state.job, 'url', None) or '').hostname or '',
+                    job_state.verb.split(',')[0],
+                    job_state.duration,
+                    job_state.retrieve_time,
+                    job_state.filter_time,
+                    job_state.diff_time,
+                    job_state.size,
+                    http_status,
+                )
+            )
+        return stats
+
     def finish(self) -> None:
         end = timeit.default_timer()
         duration = end - self.start
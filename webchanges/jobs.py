@@ -3,19 +3,26 @@
 from __future__ import annotations
 
 import asyncio
+import concurrent.futures
+import copy
 import email.utils
 import hashlib
 import logging
 import os
 import re
+import signal
 import subprocess
 import sys
 import textwrap
+import threading
 import warnings
+from contextlib import asynccontextmanager
 from ftplib import FTP  # nosec: B402
 from http.client import responses as response_names
 from pathlib import Path
-from typing import Any, Dict, List, Optional, TYPE_CHECKING, Tuple, Union
+from http.cookiejar import DefaultCookiePolicy
+from types import TracebackType
+from typing import Any, AsyncIterator, Coroutine, Dict, List, Optional, Set, TYPE_CHECKING, Tuple, Type, TypeVar, Union
 from urllib.parse import urldefrag, urlparse, urlsplit
 
 import requests
@@ -23,12 +30,18 @@ from requests.packages.urllib3.exceptions import InsecureRequestWarning
 from requests.structures import CaseInsensitiveDict
 
 from . import __user_agent__
-from .filters import FilterBase
-from .util import TrackSubClasses
+from .filters import FilterBase, FilterPipeline
+from .util import lazy_import, TrackSubClasses
 
 # https://stackoverflow.com/questions/39740632
 if TYPE_CHECKING:
+    import aiohttp
+    import pyppeteer.browser
+    import pyppeteer.page
+
     from .handler import JobState
+else:
+    aiohttp = lazy_import('aiohttp')  # imported when first used; None if not installed
 
 # required to suppress warnings with 'ssl_no_verify: true'
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
@@ -49,6 +62,13 @@ class NotModifiedError(Exception):
     ...
 
 
+class DeferredError(Exception):
+    """Exception recorded for jobs that were not run, or were cancelled, because the run reached its deadline
+    (--max-runtime); they will be run next time."""
+
+    ...
+
+
 class BrowserResponseError(Exception):
     """Exception for use_browser: true jobs with error HTTP response code."""
 
@@ -64,6 +84,236 @@ class BrowserResponseError(Exception):
         )
 
 
+class HttpSessionPool(object):
+    """A run-wide pool of requests.Session objects, one for each (scheme, host, proxy, verify) combination, so that
+    connections (and TLS sessions) to the same host are kept alive and reused by all the UrlJobs of a run instead of
+    being opened and closed by each request. Thread-safe.
+
+    Cookies set by servers are not stored in the sessions, as they must not leak into the requests of other jobs.
+    """
+
+    def __init__(self, pool_size: int = 10) -> None:
+        """
+        :param pool_size: The maximum number of connections to each host kept open for reuse.
+        """
+        self.pool_size = pool_size
+        self._sessions: Dict[Tuple[str, str, Optional[str], bool], requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> 'HttpSessionPool':
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def get(self, url: str, proxies: Dict[str, Optional[str]], verify: bool) -> requests.Session:
+        """Returns the session to be used for a request, creating it if needed.
+
+        :param url: The URL to be requested.
+        :param proxies: The proxies of the request, by scheme.
+        :param verify: Whether the TLS certificate of the server is verified.
+        :returns: The session.
+        """
+        url_parts = urlsplit(url)
+        key = (url_parts.scheme, url_parts.netloc.lower(), proxies.get(url_parts.scheme), verify)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                logger.debug(f'Opening HTTP session for {url_parts.scheme}://{url_parts.netloc}')
+                session = requests.Session()
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[key] = session
+            return session
+
+    def close(self) -> None:
+        """Closes all sessions and their connections."""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+_T = TypeVar('_T')
+
+
+class _PooledBrowser(object):
+    """A browser of the BrowserPool and its usage counts."""
+
+    def __init__(self, browser: pyppeteer.browser.Browser) -> None:
+        self.browser = browser
+        self.pages_served = 0
+        self.pages_open = 0
+        self.retired = False
+
+    def is_alive(self) -> bool:
+        process = getattr(self.browser, 'process', None)
+        return process is None or process.poll() is None
+
+
+class BrowserPool(object):
+    """A run-wide pool of Chromium browsers (launched by pyppeteer) shared by the BrowserJobs of a run, so that each job
+    does not pay the cold start of a new browser. One browser is launched for each combination of launch arguments
+    (Chromium revision, proxy server, switches, user data directory, etc.) and serves pages to jobs, each in its own
+    incognito browser context so that cookies, cache etc. are not shared between jobs; after serving
+    max_pages_per_browser pages it is closed and replaced by a new one.
+
+    As pyppeteer browsers are bound to the event loop they were launched with, the pool runs its own event loop in a
+    thread, and the coroutines of the jobs are run in it with run(). Thread-safe.
+    """
+
+    def __init__(self, max_pages_per_browser: int = 100) -> None:
+        """
+        :param max_pages_per_browser: The number of pages served by a browser before it's replaced by a new one.
+        """
+        self.max_pages_per_browser = max_pages_per_browser
+        self.loop = asyncio.new_event_loop()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._browsers: Dict[Tuple[str, Tuple[str, ...], bool], _PooledBrowser] = {}
+        self._launched: Set[_PooledBrowser] = set()
+        self._launch_locks: Dict[Tuple[str, Tuple[str, ...], bool], asyncio.Lock] = {}
+
+    def __enter__(self) -> 'BrowserPool':
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def submit(self, coro: Coroutine[Any, Any, _T]) -> concurrent.futures.Future[_T]:
+        """Submits a coroutine to be run in the event loop of the pool (starting it if needed).
+
+        :param coro: The coroutine.
+        :returns: The future of the result of the coroutine.
+        """
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.loop.run_forever, name='BrowserPool', daemon=True)
+                self._thread.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine[Any, Any, _T]) -> _T:
+        """Runs a coroutine in the event loop of the pool (starting it if needed), waiting for its result.
+
+        :param coro: The coroutine.
+        :returns: The result of the coroutine.
+        """
+        return self.submit(coro).result()
+
+    @asynccontextmanager
+    async def page(
+        self, revision: str, args: List[str], ignore_https_errors: bool = False, incognito: bool = True
+    ) -> AsyncIterator[pyppeteer.page.Page]:
+        """Async context manager providing a new page from the browser launched with the given arguments, launching
+        the browser if needed; the page (and its browser context) is closed on exit. Must be called from the event loop
+        of the pool.
+
+        :param revision: The Chromium revision.
+        :param args: The command line arguments of Chromium.
+        :param ignore_https_errors: Whether to ignore HTTPS errors.
+        :param incognito: Whether to open the page in its own incognito browser context; if False, it's opened in the
+            default context, which uses the browser's user data directory (if any).
+        :returns: The page.
+        """
+        key = (revision, tuple(args), bool(ignore_https_errors))
+        if key not in self._launch_locks:
+            self._launch_locks[key] = asyncio.Lock()
+        async with self._launch_locks[key]:
+            pooled = self._browsers.get(key)
+            if pooled is not None and not pooled.is_alive():
+                logger.warning(f'Browser with args={args} has unexpectedly closed; launching a new one')
+                self._retire(key, pooled)
+                pooled = None
+            if pooled is None:
+                pooled = _PooledBrowser(await self._launch(revision, args, ignore_https_errors))
+                self._browsers[key] = pooled
+                self._launched.add(pooled)
+            pooled.pages_served += 1
+            pooled.pages_open += 1
+            if pooled.pages_served >= self.max_pages_per_browser:
+                # no further pages will be served by this browser; it's closed as soon as its last page is
+                self._retire(key, pooled)
+
+        context = None
+        try:
+            if incognito:
+                context = await pooled.browser.createIncognitoBrowserContext()
+                page = await context.newPage()
+            else:
+                page = await pooled.browser.newPage()
+            try:
+                yield page
+            finally:
+                if context is None:
+                    await page.close()
+        finally:
+            try:
+                if context is not None:
+                    await context.close()
+            finally:
+                pooled.pages_open -= 1
+                if pooled.retired and not pooled.pages_open:
+                    await self._close_browser(pooled)
+
+    def _retire(self, key: Tuple[str, Tuple[str, ...], bool], pooled: _PooledBrowser) -> None:
+        """Removes a browser from the pool, so that it no longer serves new pages."""
+        pooled.retired = True
+        del self._browsers[key]
+
+    @staticmethod
+    async def _launch(revision: str, args: List[str], ignore_https_errors: bool) -> pyppeteer.browser.Browser:
+        """Launches a new browser."""
+        os.environ['PYPPETEER_CHROMIUM_REVISION'] = revision
+        from pyppeteer import launch  # pyppeteer must be imported after setting os.environ variables
+
+        browser = await launch(
+            ignoreHTTPSErrors=ignore_https_errors,
+            args=args,
+            handleSIGINT=False,
+            handleSIGTERM=False,
+            handleSIGHUP=False,
+            loop=asyncio.get_running_loop(),
+        )  # as signals only work single-threaded, must set handleSIGINT, handleSIGTERM and handleSIGHUP to False
+        logger.debug(f'Launched browser with args={args}')
+        return browser
+
+    async def _close_browser(self, pooled: _PooledBrowser) -> None:
+        """Closes a browser, logging (rather than raising) any errors."""
+        self._launched.discard(pooled)
+        try:
+            await pooled.browser.close()
+        except Exception:
+            logger.warning('Exception while closing browser', exc_info=True)
+
+    async def _close_browsers(self) -> None:
+        for pooled in list(self._launched):
+            await self._close_browser(pooled)
+        self._browsers.clear()
+
+    def close(self) -> None:
+        """Closes all browsers and stops the event loop of the pool."""
+        with self._thread_lock:
+            if self._thread is not None:
+                asyncio.run_coroutine_threadsafe(self._close_browsers(), self.loop).result()
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                self._thread.join()
+                self._thread = None
+            if not self.loop.is_closed():
+                self.loop.close()
+
+
 class ShellError(Exception):
     """Exception for shell commands with non-zero exit code."""
 
@@ -85,6 +335,8 @@ class JobBase(object, metaclass=TrackSubClasses):
     __kind__: str = ''
 
     index_number: int = 0  # added at job loading
+    _compiled: Optional[Tuple[Dict[str, Any], Any, JobBase]] = None  # see compile()
+    _filter_pipelines: Dict[str, Tuple[Any, FilterPipeline]]  # set by compile()
 
     # __required__ in derived classes
     url: str = ''
@@ -113,6 +365,7 @@ class JobBase(object, metaclass=TrackSubClasses):
     ignore_https_errors: Optional[bool] = None
     ignore_timeout_errors: Optional[bool] = None
     ignore_too_many_redirects: Optional[bool] = None
+    interval: Optional[Union[int, float, str]] = None
     is_markdown: Optional[bool] = None
     loop: Optional[asyncio.AbstractEventLoop] = None
     markdown_padded_tables: Optional[bool] = None
@@ -265,19 +518,106 @@ class JobBase(object, metaclass=TrackSubClasses):
                             if hasattr(self, key) and subkey not in getattr(self, key):
                                 getattr(self, key)[subkey] = subvalue
 
+    def compile(self, config: Dict[str, Dict[str, Any]]) -> 'JobBase':
+        """Returns the compiled job: a copy of the job with the defaults from the configuration merged in and its
+        filters compiled into FilterPipelines (normalized, validated and prepared). It's built once and reused for as
+        long as the directives of the job and the defaults in the configuration are unchanged; as it's shared, it must
+        not be modified (use with_defaults() to get a copy whose attributes can be set).
+
+        :param config: The configuration.
+        :returns: The compiled job.
+        """
+        directives = self.to_dict()
+        job_defaults = config.get('job_defaults')
+        if self._compiled is not None and self._compiled[0] == directives and self._compiled[1] == job_defaults:
+            return self._compiled[2]
+
+        # the job was validated when loaded: no need to run unserialize() again; the compiled job shares no mutable
+        # value with the job or the configuration
+        compiled_job = type(self)(**copy.deepcopy(directives))
+        if isinstance(job_defaults, dict):
+            compiled_job._set_defaults(copy.deepcopy(job_defaults.get(self.__kind__)))
+            compiled_job._set_defaults(copy.deepcopy(job_defaults.get('all')))
+        compiled_job._filter_pipelines = {}
+        for directive in ('filter', 'diff_filter'):
+            filter_spec = getattr(compiled_job, directive)
+            try:
+                compiled_job._filter_pipelines[directive] = (filter_spec, FilterPipeline(filter_spec))
+            except ValueError:
+                pass  # reported as an error of the job when it is run
+
+        self._compiled = (copy.deepcopy(directives), copy.deepcopy(job_defaults), compiled_job)
+        return compiled_job
+
     def with_defaults(self, config: Dict[str, Dict[str, Any]]) -> 'JobBase':
-        """return a Job class from a configuration that also contains defaults from the configuration"""
-        new_job = JobBase.unserialize(self.serialize())
-        cfg = config.get('job_defaults')
-        if isinstance(cfg, dict):
-            new_job._set_defaults(cfg.get(self.__kind__))
-            new_job._set_defaults(cfg.get('all'))
-        return new_job
+        """return a Job class from a configuration that also contains defaults from the configuration (a shallow copy
+        of the compiled job, see compile(), whose attributes can be set without affecting it; of its values, only the
+        dicts modified in place when the job is run or by hooks are copied, so lists such as 'filter' must be replaced,
+        not modified)"""
+        job = copy.copy(self.compile(config))
+        for key in ('headers', 'cookies', 'chromium_revision'):
+            value = job.__dict__.get(key)
+            if isinstance(value, (dict, CaseInsensitiveDict)):
+                job.__dict__[key] = value.copy()
+        return job
+
+    def get_filter_pipeline(self, directive: str = 'filter') -> FilterPipeline:
+        """Returns the FilterPipeline of the 'filter' or 'diff_filter' directive, as built when the job was compiled
+        (and reused for as long as the compiled job is, including by its copies) unless the directive has been replaced
+        since.
+
+        :raises ValueError: If a filter or subfilter is unknown.
+        """
+        filter_spec = getattr(self, directive)
+        compiled = self.__dict__.get('_filter_pipelines', {}).get(directive)
+        if compiled is not None and compiled[0] is filter_spec:
+            return compiled[1]
+        return FilterPipeline(filter_spec)
+
+    def get_filter_list(self, directive: str = 'filter') -> List[Tuple[str, Dict[str, Any]]]:
+        """Returns the normalized list of filters (filter_kind, subfilter) of the 'filter' or 'diff_filter' directive
+        (see get_filter_pipeline).
+
+        :raises ValueError: If a filter or subfilter is unknown.
+        """
+        return self.get_filter_pipeline(directive).filter_list
 
     def get_guid(self) -> str:
         location = self.get_location()
         return hashlib.sha1(location.encode()).hexdigest()  # nosec: B303
 
+    def get_interval(self) -> Optional[float]:
+        """Returns the interval between two runs of the job set by the 'interval' directive, which is a number of
+        seconds or a number followed by a unit ('s', 'm', 'h', 'd' or 'w', e.g. '30m').
+
+        :returns: The interval in seconds, or None if not set.
+        """
+        if self.interval is None:
+            return None
+        if isinstance(self.interval, (int, float)) and not isinstance(self.interval, bool):
+            seconds = float(self.interval)
+        else:
+            match = INTERVAL_RE.fullmatch(str(self.interval).strip())
+            if not match:
+                raise ValueError(
+                    f"Job {self.index_number}: Directive 'interval' has invalid value '{self.interval}' (must be a "
+                    f"number of seconds or a number followed by s, m, h, d or w, e.g. '30m')"
+                )
+            seconds = float(match.group(1)) * INTERVAL_UNITS[match.group(2) or 's']
+        if seconds < 0:
+            raise ValueError(f"Job {self.index_number}: Directive 'interval' cannot be negative ('{self.interval}')")
+        return seconds
+
+    def in_shard(self, index: int, count: int) -> bool:
+        """Returns True if the job belongs to a shard, i.e. to one of count disjoint subsets of roughly equal size of
+        the jobs, as selected by a hash of the guid that is the same on all hosts and across runs.
+
+        :param index: The number of the shard, between 1 and count.
+        :param count: The number of shards.
+        """
+        digest = hashlib.sha1(self.get_guid().encode()).hexdigest()  # nosec: B303
+        return int(digest, 16) % count == index - 1
+
     def retrieve(self, job_state: JobState) -> Tuple[Union[bytes, str], str]:
         """Runs job and returns data and etag"""
         raise NotImplementedError()
@@ -317,6 +657,7 @@ class Job(JobBase):
         'ignore_http_error_codes',
         'ignore_timeout_errors',
         'ignore_too_many_redirects',
+        'interval',
     )
 
     def get_location(self) -> str:
@@ -333,6 +674,8 @@ class Job(JobBase):
 
 
 CHARSET_RE = re.compile('text/(html|plain); charset=([^;]*)')
+INTERVAL_RE = re.compile(r'(\d+(?:\.\d*)?)\s*([smhdw]?)')
+INTERVAL_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
 
 
 class UrlJob(Job):
@@ -360,43 +703,6 @@ class UrlJob(Job):
         return self.user_visible_url or self.url
 
     def retrieve(self, job_state: JobState) -> Tuple[Union[bytes, str], str]:
-        self.headers = CaseInsensitiveDict(getattr(self, 'headers', {}))
-        if 'User-Agent' not in self.headers:
-            self.headers['User-Agent'] = __user_agent__
-
-        proxies = {
-            'http': os.getenv('HTTP_PROXY'),
-            'https': os.getenv('HTTPS_PROXY'),
-        }
-
-        if job_state.old_etag:
-            # https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/ETag#caching_of_unchanged_resources
-            self.headers['If-None-Match'] = job_state.old_etag
-
-        if job_state.old_timestamp is not None:
-            self.headers['If-Modified-Since'] = email.utils.formatdate(job_state.old_timestamp)
-
-        if self.ignore_cached or job_state.tries > 0:
-            self.headers.pop('If-None-Match', None)
-            self.headers['If-Modified-Since'] = email.utils.formatdate(0)
-            self.headers['Cache-Control'] = 'max-age=172800'
-            self.headers['Expires'] = email.utils.formatdate()
-
-        if self.method is None:
-            self.method = 'GET'
-
-        if self.data is not None:
-            if self.method is None:
-                self.method = 'POST'
-            if 'Content-Type' not in self.headers:
-                self.headers['Content-Type'] = 'application/x-www-form-urlencoded'
-            logger.info(f'Job {self.index_number}: Sending POST request to {self.url}')
-
-        if self.http_proxy is not None:
-            proxies['http'] = self.http_proxy
-        if self.https_proxy is not None:
-            proxies['https'] = self.https_proxy
-
         if urlparse(self.url).scheme == 'file':
             logger.info(f'Job {self.index_number}: Using local filesystem (file URI scheme)')
 
@@ -436,6 +742,113 @@ class UrlJob(Job):
 
                     return '\n'.join(data), ''
 
+        kwargs = self._request_kwargs(job_state)
+        if job_state.session_pool is not None:
+            session = job_state.session_pool.get(kwargs['url'], kwargs['proxies'], kwargs['verify'])
+            response = session.request(**kwargs)
+        else:
+            response = requests.request(**kwargs)
+        job_state.http_status = response.status_code
+        return self._process_response(response)
+
+    async def retrieve_async(
+        self, job_state: JobState, session: aiohttp.ClientSession
+    ) -> Tuple[Union[bytes, str], str]:
+        """Asynchronous version of retrieve() used by the 'aiohttp' HTTP engine; only supports http(s) URLs.
+
+        The aiohttp response is converted into a requests.Response so that error handling (ignore_* directives),
+        ETag and HTTP 304 handling, encoding detection etc. are identical to the ones of the default engine.
+
+        :param job_state: The JobState of the job.
+        :param session: The aiohttp.ClientSession shared by all the jobs of the run.
+        :returns: The data and the ETag.
+        """
+        kwargs = self._request_kwargs(job_state)
+
+        request_kwargs: Dict[str, Any] = {
+            'data': kwargs['data'],
+            'headers': dict(kwargs['headers']),
+            'cookies': kwargs['cookies'],
+            'timeout': aiohttp.ClientTimeout(sock_connect=kwargs['timeout'], sock_read=kwargs['timeout']),
+            'allow_redirects': kwargs['allow_redirects'],
+        }
+        # proxies from the environment (and NO_PROXY) are taken care of by the session having trust_env=True
+        proxy = self.http_proxy if urlsplit(self.url).scheme == 'http' else self.https_proxy
+        if proxy:
+            request_kwargs['proxy'] = proxy
+        if not kwargs['verify']:
+            request_kwargs['ssl'] = False
+
+        try:
+            async with session.request(kwargs['method'], kwargs['url'], **request_kwargs) as aiohttp_response:
+                content = await aiohttp_response.read()
+                response = self._requests_response(aiohttp_response, content)
+        except asyncio.TimeoutError as e:
+            raise requests.exceptions.Timeout(f'Request timed out: {self.url}') from e
+        except aiohttp.TooManyRedirects as e:
+            raise requests.exceptions.TooManyRedirects(str(e)) from e
+        except aiohttp.InvalidURL as e:
+            raise requests.exceptions.InvalidURL(str(e)) from e
+        except aiohttp.ClientConnectionError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        except aiohttp.ClientError as e:
+            raise requests.exceptions.RequestException(str(e)) from e
+
+        job_state.http_status = response.status_code
+        return self._process_response(response)
+
+    @staticmethod
+    def _requests_response(aiohttp_response: aiohttp.ClientResponse, content: bytes = b'') -> requests.Response:
+        """Convert an aiohttp response into a requests one (including any redirects in its history)."""
+        response = requests.Response()
+        response._content = content
+        response.status_code = aiohttp_response.status
+        response.reason = aiohttp_response.reason or response_names.get(aiohttp_response.status, '')
+        response.headers = CaseInsensitiveDict(aiohttp_response.headers)
+        response.url = str(aiohttp_response.url)
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.history = [UrlJob._requests_response(redirect) for redirect in aiohttp_response.history]
+        return response
+
+    def _request_kwargs(self, job_state: JobState) -> Dict[str, Any]:
+        """Prepare the headers etc. of the job and return them as the arguments to be passed to requests.request()."""
+        self.headers = CaseInsensitiveDict(getattr(self, 'headers', {}))
+        if 'User-Agent' not in self.headers:
+            self.headers['User-Agent'] = __user_agent__
+
+        proxies = {
+            'http': os.getenv('HTTP_PROXY'),
+            'https': os.getenv('HTTPS_PROXY'),
+        }
+
+        if job_state.old_etag:
+            # https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/ETag#caching_of_unchanged_resources
+            self.headers['If-None-Match'] = job_state.old_etag
+
+        if job_state.old_timestamp is not None:
+            self.headers['If-Modified-Since'] = email.utils.formatdate(job_state.old_timestamp)
+
+        if self.ignore_cached or job_state.tries > 0:
+            self.headers.pop('If-None-Match', None)
+            self.headers['If-Modified-Since'] = email.utils.formatdate(0)
+            self.headers['Cache-Control'] = 'max-age=172800'
+            self.headers['Expires'] = email.utils.formatdate()
+
+        if self.method is None:
+            self.method = 'GET'
+
+        if self.data is not None:
+            if self.method is None:
+                self.method = 'POST'
+            if 'Content-Type' not in self.headers:
+                self.headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            logger.info(f'Job {self.index_number}: Sending POST request to {self.url}')
+
+        if self.http_proxy is not None:
+            proxies['http'] = self.http_proxy
+        if self.https_proxy is not None:
+            proxies['https'] = self.https_proxy
+
         # if self.headers:
         #     self.add_custom_headers(headers)
 
@@ -447,23 +860,29 @@ class UrlJob(Job):
             timeout = None
         else:
             timeout = self.timeout
+        time_left = job_state.time_left()
+        if time_left is not None:
+            # the run has a deadline
+            timeout = time_left if timeout is None else min(timeout, time_left)
 
         # cookiejar (called by requests) expects strings or bytes-like objects; PyYAML will try to guess int etc.
         if self.cookies:
             self.cookies = {k: str(v) for k, v in self.cookies.items()}
 
-        response = requests.request(
-            method=self.method,
-            url=self.url,
-            data=self.data,
-            headers=self.headers,
-            cookies=self.cookies,
-            timeout=timeout,
-            allow_redirects=(not self.no_redirects),
-            proxies=proxies,
-            verify=(not self.ssl_no_verify),
-        )
+        return {
+            'method': self.method,
+            'url': self.url,
+            'data': self.data,
+            'headers': self.headers,
+            'cookies': self.cookies,
+            'timeout': timeout,
+            'allow_redirects': (not self.no_redirects),
+            'proxies': proxies,
+            'verify': (not self.ssl_no_verify),
+        }
 
+    def _process_response(self, response: requests.Response) -> Tuple[Union[bytes, str], str]:
+        """Check the response for errors and return its data and ETag."""
         response.raise_for_status()
         if response.status_code == requests.codes.not_modified:
             raise NotModifiedError(response.status_code)
@@ -563,15 +982,19 @@ class BrowserJob(Job):
         return self.user_visible_url or self.url
 
     def retrieve(self, job_state: JobState) -> Tuple[Union[bytes, str], str]:
-        response, etag = asyncio.run(self._retrieve())
+        if job_state.browser_pool is not None:
+            return job_state.browser_pool.run(self._retrieve(job_state.browser_pool))
+        with BrowserPool(max_pages_per_browser=1) as browser_pool:
+            return browser_pool.run(self._retrieve(browser_pool))
 
-        # if no name is found, set it to the title of the page if found
-        if not self.name:
-            title = re.findall(r'<title.*?>(.+?)</title>', response)
-            if title:
-                self.name = title[0]
+    async def retrieve_async(self, job_state: JobState, session: Any = None) -> Tuple[Union[bytes, str], str]:
+        """Asynchronous version of retrieve(); must be run in the event loop of the browser pool of the job state.
 
-        return response, etag
+        :param job_state: The JobState of the job, with a browser_pool.
+        :param session: Not used.
+        :returns: The data and the ETag.
+        """
+        return await self._retrieve(job_state.browser_pool)  # type: ignore[arg-type]
 
     @staticmethod
     def current_platform() -> str:
@@ -583,13 +1006,12 @@ class BrowserJob(Job):
         elif sys.platform.startswith('darwin'):
             return 'mac'
         elif sys.platform.startswith('win') or sys.platform.startswith('msys') or sys.platform.startswith('cyg'):
-            if sys.maxsize > 2 ** 31 - 1:
+            if sys.maxsize > 2**31 - 1:
                 return 'win64'
             return 'win32'
         raise OSError(f'Platform unsupported by Pyppeteer (use_browser: true): {sys.platform}')
 
-    async def _retrieve(self) -> Tuple[str, str]:
-        # launch browser
+    async def _retrieve(self, browser_pool: BrowserPool) -> Tuple[str, str]:
         if not self.chromium_revision:
             self.chromium_revision = DEFAULT_CHROMIUM_REVISION
         if isinstance(self.chromium_revision, dict):
@@ -611,14 +1033,12 @@ class BrowserJob(Job):
             f"PYPPETEER_DOWNLOAD_HOST={os.environ.get('PYPPETEER_DOWNLOAD_HOST')}"
         )
         try:
-            from pyppeteer import launch  # pyppeteer must be imported after setting os.environ variables
+            import pyppeteer  # noqa: F401 pyppeteer must be imported after setting os.environ variables
         except ImportError:
             raise ImportError(
                 f'Python package pyppeteer is not installed; cannot use the "use_browser: true" directive'
                 f' ( {self.get_indexed_location()} )'
             )
-        import pyppeteer.network_manager
-        from pyppeteer.errors import PageError
 
         headers = self.headers if self.headers else {}
 
@@ -663,43 +1083,10 @@ class BrowserJob(Job):
             self.switches = [f"--{switch.lstrip('--')}" for switch in self.switches]
             args.extend(self.switches)
 
-        browser = await launch(
-            ignoreHTTPSErrors=self.ignore_https_errors,
-            args=args,
-            handleSIGINT=False,
-            handleSIGTERM=False,
-            handleSIGHUP=False,
-            loop=asyncio.get_running_loop(),
-        )  # as signals only work single-threaded, must set handleSIGINT, handleSIGTERM and handleSIGHUP to False
-        logger.debug(f'Job {self.index_number}: Launched browser with args={args}')
-
-        # browse to page and get content
-        page = await browser.newPage()
-
-        if headers:
-            logger.debug(f'Job {self.index_number}: setExtraHTTPHeaders={headers}')
-            await page.setExtraHTTPHeaders(headers)
-        if self.cookies:
-            await page.setExtraHTTPHeaders({'Cookies': '; '.join([f'{k}={v}' for k, v in self.cookies.items()])})
-        if self.http_proxy or self.https_proxy:
-            proxy_username = urlsplit(proxy).username if urlsplit(proxy).username else ''
-            proxy_password = urlsplit(proxy).password if urlsplit(proxy).password else ''
-            if proxy_username or proxy_password:
-                await page.authenticate({'username': proxy_username, 'password': proxy_password})
-                logger.debug(
-                    f'Job {self.index_number}: Set page.authenticate with '
-                    f'username={proxy_username}, password={proxy_password}'  # type: ignore[str-bytes-safe]
-                )
-        options: Dict[str, Any] = {}
-        if self.timeout:
-            options['timeout'] = self.timeout * 1000
-        if self.wait_until:
-            options['waitUntil'] = self.wait_until
         if self.block_elements:  # FIXME: Pyppeteer freezes on certain sites if this is on; contribute if you know why
             if isinstance(self.block_elements, str):
                 self.block_elements = self.block_elements.split(',')
             if not isinstance(self.block_elements, list):
-                await browser.close()
                 raise TypeError(
                     f"'block_elements' needs to be a string or list, not {type(self.block_elements)} "
                     f'( {self.get_indexed_location()} )'
@@ -721,12 +1108,53 @@ class BrowserJob(Job):
             ]  # https://developer.chrome.com/docs/extensions/reference/webRequest/#type-ResourceType
             for element in self.block_elements:
                 if element not in chrome_web_request_resource_types:
-                    await browser.close()
                     raise ValueError(
                         f"Unknown or unsupported '{element}' resource type in 'block_elements' "
                         f'( {self.get_indexed_location()} )'
                     )
 
+        # a job with a user data directory uses its profile (e.g. to be logged in), which incognito contexts don't
+        async with browser_pool.page(
+            str(_revision), args, bool(self.ignore_https_errors), incognito=not self.user_data_dir
+        ) as page:
+            response, etag = await self._retrieve_page(page, headers, proxy)
+
+        # if no name is found, set it to the title of the page if found
+        if not self.name:
+            title = re.findall(r'<title.*?>(.+?)</title>', response)
+            if title:
+                self.name = title[0]
+
+        return response, etag
+
+    async def _retrieve_page(
+        self, page: pyppeteer.page.Page, headers: Dict[str, str], proxy: Optional[str]
+    ) -> Tuple[str, str]:
+        """Browse to the URL with the page provided by the browser pool and get its content and ETag."""
+        import pyppeteer.network_manager
+        from pyppeteer.errors import PageError
+
+        if headers:
+            logger.debug(f'Job {self.index_number}: setExtraHTTPHeaders={headers}')
+            await page.setExtraHTTPHeaders(headers)
+        if self.cookies:
+            await page.setExtraHTTPHeaders({'Cookies': '; '.join([f'{k}={v}' for k, v in self.cookies.items()])})
+        if self.http_proxy or self.https_proxy:
+            proxy_username = urlsplit(proxy).username if urlsplit(proxy).username else ''
+            proxy_password = urlsplit(proxy).password if urlsplit(proxy).password else ''
+            if proxy_username or proxy_password:
+                await page.authenticate({'username': proxy_username, 'password': proxy_password})
+                logger.debug(
+                    f'Job {self.index_number}: Set page.authenticate with '
+                    f'username={proxy_username}, password={proxy_password}'  # type: ignore[str-bytes-safe]
+                )
+        options: Dict[str, Any] = {}
+        if self.timeout:
+            options['timeout'] = self.timeout * 1000
+        if self.wait_until:
+            options['waitUntil'] = self.wait_until
+        if self.block_elements:
+
             async def handle_request(
                 request_event: pyppeteer.network_manager.Request, block_elements: List[str]
             ) -> None:
@@ -770,7 +1198,6 @@ class BrowserJob(Job):
             await page.goto(self.url, options=options)
         except PageError as e:
             logger.debug(f'Job {self.index_number}: Page returned error {str(e.args)}')
-            await browser.close()
             if response_code and 400 <= response_code < 600:
                 raise BrowserResponseError(e.args, response_code)
             else:
@@ -781,7 +1208,6 @@ class BrowserJob(Job):
         # page_response = await page.goto(self.url, options=options)
         # if not request_response and response_code == requests.codes.not_modified:
         #     logger.debug(f'Job {self.index_number}: page_response={page_response}; response_code={response_code}')
-        #     await browser.close()
         #     raise NotModifiedError(response_code)
 
         if self.wait_for_navigation:
@@ -794,7 +1220,6 @@ class BrowserJob(Job):
             await page.waitFor(self.wait_for, options=options)
 
         content = await page.content()
-        await browser.close()
 
         if response_code and 400 <= response_code < 600:
             raise BrowserResponseError(('',), response_code)
@@ -918,12 +1343,25 @@ class ShellJob(Job):
 
     def retrieve(self, job_state: JobState) -> Tuple[Union[bytes, str], str]:
         needs_bytes = FilterBase.filter_chain_needs_bytes(self.filter)
-        try:
-            return (
-                subprocess.run(
-                    self.command, capture_output=True, shell=True, check=True, text=(not needs_bytes)
-                ).stdout,
-                '',
-            )  # noqa: DUO116 use of "shell=True" is insecure
-        except subprocess.CalledProcessError as e:
-            raise ShellError(e.stderr).with_traceback(e.__traceback__)
+        # in its own process group, so that all of its processes can be killed (see below)
+        with subprocess.Popen(
+            self.command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            shell=True,
+            text=(not needs_bytes),
+            start_new_session=True,
+        ) as process:  # noqa: DUO116 use of "shell=True" is insecure
+            try:
+                stdout, stderr = process.communicate(timeout=job_state.time_left())
+            except BaseException:  # e.g. subprocess.TimeoutExpired when the run reaches its deadline
+                # killing only the shell would leave its children running, with its stdout open
+                if os.name == 'nt':
+                    process.kill()
+                else:
+                    os.killpg(process.pid, signal.SIGKILL)
+                process.communicate()
+                raise
+        if process.returncode:
+            raise ShellError(stderr)
+        return stdout, ''
@@ -8,10 +8,9 @@ from email import policy
 from email.message import EmailMessage
 from typing import Optional, Union
 
-try:
-    import keyring
-except ImportError:
-    keyring = None  # type: ignore[assignment]
+from .util import lazy_import
+
+keyring = lazy_import('keyring')  # imported when first used; None if not installed
 
 logger = logging.getLogger(__name__)
 
@@ -10,8 +10,8 @@ from .config import CommandConfig
 from .handler import Report
 from .jobs import JobBase
 from .storage import CacheStorage, YamlConfigStorage, YamlJobsStorage
-from .util import import_module_from_source
-from .worker import run_jobs
+from .util import import_module_from_source, profiler
+from .worker import run_daemon, run_jobs
 
 logger = logging.getLogger(__name__)
 
@@ -62,21 +62,33 @@ class Urlwatch(object):
 
     def load_hooks(self) -> None:
         if self.urlwatch_config.hooks.is_file():
-            import_module_from_source('hooks', self.urlwatch_config.hooks)
+            with profiler.phase('hooks import'):
+                import_module_from_source('hooks', self.urlwatch_config.hooks)
 
     def load_jobs(self) -> None:
         if self.urlwatch_config.jobs.is_file():
-            jobs = self.jobs_storage.load_secure()
+            with profiler.phase('jobs load'):
+                jobs = self.jobs_storage.load_secure()
             logger.info(f'Found {len(jobs)} jobs')
         else:
             logger.warning(f'No jobs file found at {self.urlwatch_config.jobs}')
             jobs = []
 
+        if self.urlwatch_config.shard:
+            index, count = self.urlwatch_config.shard
+            jobs = [job for job in jobs if job.in_shard(index, count)]
+            logger.info(f'Running the {len(jobs)} jobs of shard {index}/{count}')
+
         self.jobs = jobs
 
     def run_jobs(self) -> None:
         run_jobs(self)
 
+    def run_daemon(self) -> None:
+        run_daemon(self)
+
     def close(self) -> None:
         self.report.finish()
-        self.cache_storage.close()
+        self.cache_storage.save_run_stats(self.report.start_timestamp, self.report.get_run_stats())
+        with profiler.phase('database close'):
+            self.cache_storage.close()
@@ -14,46 +14,32 @@ import os
 import re
 import sys
 import time
+import timeit
+from pathlib import Path
 from typing import Any, Callable, Dict, Iterable, List, Optional, TYPE_CHECKING, Tuple, Type, Union
 from warnings import warn
 
 import requests
-from markdown2 import Markdown
 from requests import Response
 
 from . import __project_name__, __url__, __version__
 from .jobs import JobBase, UrlJob
 from .mailer import SMTPMailer, SendmailMailer
-from .util import TrackSubClasses, chunk_string, linkify
+from .util import TrackSubClasses, chunk_string, lazy_import, linkify, profiler
 
 # https://stackoverflow.com/questions/39740632
 if TYPE_CHECKING:
     from .handler import JobState, Report
 
-try:
-    import aioxmpp
-except ImportError:
-    aioxmpp = None
+# Modules are imported when first used by a reporter rather than at startup (see lazy_import); optional ones are None
+# if not installed
+markdown2 = lazy_import('markdown2')
 
-try:
-    import chump
-except ImportError:
-    chump = None
-
-try:
-    import keyring
-except ImportError:
-    keyring = None  # type: ignore[assignment]
-
-try:
-    import matrix_client.api
-except ImportError:
-    matrix_client = None
-
-try:
-    from pushbullet import Pushbullet
-except ImportError:
-    Pushbullet = None
+aioxmpp = lazy_import('aioxmpp')
+chump = lazy_import('chump')
+keyring = lazy_import('keyring')
+matrix_client_api = lazy_import('matrix_client.api')
+pushbullet = lazy_import('pushbullet')
 
 if os.name == 'nt':
     try:
@@ -102,19 +88,28 @@ class ReporterBase(object, metaclass=TrackSubClasses):
         subclass = cls.__subclasses__[name]
         cfg: Dict[str, bool] = report.config['report'].get(name, {'enabled': False})
         if cfg['enabled'] or not check_enabled:
-            subclass(report, cfg, job_states, duration).submit()
+            start = timeit.default_timer()
+            with profiler.phase(f'report {name}'):
+                subclass(report, cfg, job_states, duration).submit()
+            report.reporter_durations[name] = timeit.default_timer() - start
         else:
             raise ValueError(f'Reporter not enabled: {name}')
 
     @classmethod
     def submit_all(cls, report: Report, job_states: List[JobState], duration: float) -> None:
         any_enabled = False
-        for name, subclass in cls.__subclasses__.items():
+        # the metrics of the run are written last, as they include the time taken by the other reporters
+        for name, subclass in sorted(
+            cls.__subclasses__.items(), key=lambda item: issubclass(item[1], OpenMetricsReporter)
+        ):
             cfg = report.config['report'].get(name, {'enabled': False})
             if cfg['enabled']:
                 any_enabled = True
                 logger.info(f'Submitting with {name} ({subclass})')
-                subclass(report, cfg, job_states, duration).submit()
+                start = timeit.default_timer()
+                with profiler.phase(f'report {name}'):
+                    subclass(report, cfg, job_states, duration).submit()
+                report.reporter_durations[name] = timeit.default_timer() - start
 
         if not any_enabled:
             logger.warning('No reporters enabled.')
@@ -202,7 +197,7 @@ class HtmlReporter(ReporterBase):
         else:
             if job.is_markdown:
                 # rebuild html from markdown using markdown2 library's Markdown
-                markdowner = Markdown(safe_mode='escape', extras=['strike', 'target-blank-links'])
+                markdowner = markdown2.Markdown(safe_mode='escape', extras=['strike', 'target-blank-links'])
                 htags = re.compile(r'<(/?)h\d>')
                 mtags = re.compile(r'^<p>(<code>)?|(</code>)?</p>$')
 
@@ -812,13 +807,13 @@ class PushbulletReport(WebServiceReporter):
 
     __kind__ = 'pushbullet'
 
-    def web_service_get(self) -> 'Pushbullet':
-        if Pushbullet is None:
+    def web_service_get(self) -> 'pushbullet.Pushbullet':
+        if pushbullet is None:
             raise ImportError('Python module "pushbullet" not installed')
 
-        return Pushbullet(self.config['api_key'])
+        return pushbullet.Pushbullet(self.config['api_key'])
 
-    def web_service_submit(self, service: 'Pushbullet', title: str, body: str) -> None:
+    def web_service_submit(self, service: 'pushbullet.Pushbullet', title: str, body: str) -> None:
         service.push_note(title, body)
 
 
@@ -1144,7 +1139,7 @@ class MatrixReporter(MarkdownReporter):
     __kind__ = 'matrix'
 
     def submit(self, max_length: int = None) -> None:  # type: ignore[override]
-        if matrix_client is None:
+        if matrix_client_api is None:
             raise ImportError('Python module "matrix_client" not installed')
 
         homeserver_url = self.config['homeserver']
@@ -1157,9 +1152,9 @@ class MatrixReporter(MarkdownReporter):
             logger.debug(f'Reporter {self.__kind__} has nothing to report; execution aborted')
             return
 
-        client_api = matrix_client.api.MatrixHttpApi(homeserver_url, access_token)
+        client_api = matrix_client_api.MatrixHttpApi(homeserver_url, access_token)
 
-        body_html = Markdown(extras=['fenced-code-blocks', 'highlightjs-lang']).convert(body_markdown)
+        body_html = markdown2.Markdown(extras=['fenced-code-blocks', 'highlightjs-lang']).convert(body_markdown)
 
         try:
             client_api.send_message_event(
@@ -1342,3 +1337,70 @@ class ProwlReporter(TextReporter):
                 f'Failed to parse Prowl response. HTTP status code: {result.status_code},'
                 f' content: {result.content}'  # type: ignore[str-bytes-safe]
             )
+
+
+class OpenMetricsReporter(ReporterBase):
+    """Write metrics of the run to a file in the OpenMetrics text format (e.g. for node_exporter)."""
+
+    __kind__ = 'openmetrics'
+
+    def submit(self) -> None:  # type: ignore[override]
+        """Writes the metrics to the file atomically, i.e. the file is replaced only once fully written, so that it
+        is never read partially written."""
+        if not self.config.get('filename'):
+            raise ValueError(f"Reporter {self.__kind__}: the 'filename' of the metrics file is not configured")
+        metrics_file = Path(self.config['filename']).expanduser()
+        temp_file = metrics_file.with_suffix(f'.{os.getpid()}.tmp')
+        temp_file.write_text('\n'.join(self._lines()) + '\n', encoding='utf-8')
+        temp_file.replace(metrics_file)
+        logger.info(f'Metrics of the run written to {metrics_file}')
+
+    @staticmethod
+    def _label(value: str) -> str:
+        """Escapes a label value."""
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    def _lines(self) -> Iterable[str]:
+        """Generator yielding the lines of the metrics file. All metrics are gauges, as each run replaces the file."""
+        job_states = [job_state for job_state in self.job_states if job_state.duration is not None]
+
+        job_metrics: List[Tuple[str, str, Callable[[JobState], Optional[float]]]] = [
+            ('job_duration_seconds', 'Time taken to run the job', lambda job_state: job_state.duration),
+            ('job_size_bytes', 'Size of the data retrieved by the job', lambda job_state: job_state.size),
+            ('job_http_status', 'HTTP status code of the response to the job', lambda job_state: job_state.http_status),
+            ('job_tries', 'Number of consecutive failures of the job', lambda job_state: job_state.tries),
+            ('job_error', 'Whether the job ended in error', lambda job_state: int(job_state.verb == 'error')),
+        ]
+        for name, help_text, value in job_metrics:
+            yield f'# TYPE {__project_name__}_{name} gauge'
+            yield f'# HELP {__project_name__}_{name} {help_text}.'
+            for job_state in job_states:
+                job_value = value(job_state)
+                if job_value is not None:
+                    yield (
+                        f'{__project_name__}_{name}{{location="{self._label(job_state.job.get_location())}",'
+                        f'name="{self._label(job_state.job.pretty_name())}"}} {job_value}'
+                    )
+
+        verbs = dict.fromkeys(('new', 'changed', 'unchanged', 'error', 'not_due', 'deferred'), 0)
+        for job_state in self.job_states + self.report.not_due_job_states + self.report.deferred_job_states:
+            verbs[job_state.verb.split(',')[0]] += 1
+        yield f'# TYPE {__project_name__}_run_jobs gauge'
+        yield f'# HELP {__project_name__}_run_jobs Number of jobs of the run, by outcome.'
+        for verb, count in verbs.items():
+            yield f'{__project_name__}_run_jobs{{verb="{verb}"}} {count}'
+
+        yield f'# TYPE {__project_name__}_run_duration_seconds gauge'
+        yield f'# HELP {__project_name__}_run_duration_seconds Time taken by the run.'
+        yield f'{__project_name__}_run_duration_seconds {self.duration}'
+
+        yield f'# TYPE {__project_name__}_run_timestamp_seconds gauge'
+        yield f'# HELP {__project_name__}_run_timestamp_seconds Time the run ended.'
+        yield f'{__project_name__}_run_timestamp_seconds {time.time()}'
+
+        yield f'# TYPE {__project_name__}_reporter_duration_seconds gauge'
+        yield f'# HELP {__project_name__}_reporter_duration_seconds Time taken to send the report by each reporter.'
+        for reporter, duration in self.report.reporter_durations.items():
+            yield f'{__project_name__}_reporter_duration_seconds{{reporter="{reporter}"}} {duration}'
+
+        yield '# EOF'
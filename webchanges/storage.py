@@ -3,6 +3,8 @@
 import copy
 import email.utils
 import getpass
+import hashlib
+import io
 import logging
 import os
 import shutil
@@ -17,7 +19,7 @@ from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Te
 import msgpack
 import yaml
 
-from . import __docs_url__, __project_name__
+from . import __docs_url__, __project_name__, __version__
 from .filters import FilterBase
 from .jobs import JobBase, ShellJob, UrlJob
 from .util import edit_file
@@ -145,6 +147,10 @@ DEFAULT_CONFIG = {
             'application': '',
             'subject': f'[{__project_name__}] {{count}} changes: {{jobs}}',
         },
+        'openmetrics': {  # a metrics file for node_exporter's textfile collector or similar
+            'enabled': False,
+            'filename': '',
+        },
     },
     'job_defaults': {  # default settings for jobs
         'all': {},
@@ -153,6 +159,23 @@ DEFAULT_CONFIG = {
         # TODO rename 'shell' to 'command' for clarity
         'shell': {},  # these are used for 'command' jobs
     },
+    'worker': {  # settings for the running of jobs
+        'http_engine': 'requests',  # 'requests' (one thread per job) or 'aiohttp' (asyncio; url jobs only)
+        'max_connections': 1000,  # maximum number of simultaneous connections with the 'aiohttp' HTTP engine
+        'http_pool_size': 10,  # connections kept alive for reuse per host with the 'requests' HTTP engine
+        'max_jobs_per_host': 6,  # maximum number of jobs running at the same time for the same host (0: no limit)
+        'min_delay_per_host': 0.0,  # minimum number of seconds between the start of two jobs for the same host
+        'max_pages_per_browser': 100,  # pages served by a shared browser (use_browser: true) before it's relaunched
+        'max_browser_jobs': None,  # maximum number of use_browser: true jobs running at the same time (None: # of CPUs)
+        'streaming_report': True,  # discard the data of jobs that are not reported as soon as they're processed
+        'filter_processes': 0,  # processes running CPU-heavy filters (0: run them in threads; None: number of CPUs)
+        'min_workers': 1,  # minimum number of jobs run in parallel threads (adaptive)
+        'max_workers': 64,  # maximum number of jobs run in parallel threads (adaptive)
+        'job_order': 'longest_first',  # order of job submission: 'longest_first' (by duration of latest run) or 'file'
+        'daemon_interval': 3600,  # seconds between runs of jobs without 'interval' (--daemon)
+        'daemon_report_window': 3600,  # seconds between reports (--daemon)
+        'max_runtime': None,  # seconds after which jobs not yet completed are deferred to the next run (None: no limit)
+    },
 }
 
 
@@ -243,6 +266,32 @@ class BaseTextualFileStorage(BaseFileStorage, ABC):
         config_storage.save()
 
 
+def file_security_checks(filename: Path) -> List[str]:
+    """Check security of a file and its directory, i.e. that they belong to the current UID and only the owner can
+    write to. Return list of errors if any. Linux only."""
+
+    if os.name == 'nt':
+        return []
+
+    errors = []
+    current_uid = os.getuid()  # type: ignore[attr-defined]  # not defined in Windows
+
+    dirname = filename.parent
+    dir_st = dirname.stat()
+    if (dir_st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)) != 0:
+        errors.append(f'{dirname} is group/world-writable')
+    if dir_st.st_uid != current_uid:
+        errors.append(f'{dirname} not owned by {getpass.getuser()}')
+
+    file_st = filename.stat()
+    if (file_st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)) != 0:
+        errors.append(f'{filename} is group/world-writable')
+    if file_st.st_uid != current_uid:
+        errors.append(f'{filename} not owned by {getpass.getuser()}')
+
+    return errors
+
+
 class JobsBaseFileStorage(BaseTextualFileStorage, ABC):
     def __init__(self, filename: Path) -> None:
         super().__init__(filename)
@@ -251,27 +300,7 @@ class JobsBaseFileStorage(BaseTextualFileStorage, ABC):
     def shelljob_security_checks(self) -> List[str]:
         """Check security of jobs file and its directory, i.e. that they belong to the current UID and only the owner
         can write to. Return list of errors if any. Linux only."""
-
-        if os.name == 'nt':
-            return []
-
-        shelljob_errors = []
-        current_uid = os.getuid()  # type: ignore[attr-defined]  # not defined in Windows
-
-        dirname = self.filename.parent
-        dir_st = dirname.stat()
-        if (dir_st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)) != 0:
-            shelljob_errors.append(f'{dirname} is group/world-writable')
-        if dir_st.st_uid != current_uid:
-            shelljob_errors.append(f'{dirname} not owned by {getpass.getuser()}')
-
-        file_st = self.filename.stat()
-        if (file_st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)) != 0:
-            shelljob_errors.append(f'{self.filename} is group/world-writable')
-        if file_st.st_uid != current_uid:
-            shelljob_errors.append(f'{self.filename} not owned by {getpass.getuser()}')
-
-        return shelljob_errors
+        return file_security_checks(self.filename)
 
     def load_secure(self) -> List[JobBase]:
         jobs: List[JobBase] = self.load()
@@ -346,11 +375,32 @@ class YamlConfigStorage(BaseYamlFileStorage):
 
 
 class YamlJobsStorage(BaseYamlFileStorage, JobsBaseFileStorage):
+    def __init__(self, filename: Path, parsed_cache_dir: Optional[Path] = None) -> None:
+        """
+        :param filename: The jobs file.
+        :param parsed_cache_dir: The directory where the jobs parsed from the file are cached, so that they are loaded
+            without parsing the YAML again as long as the file is unchanged; if None, they are not cached.
+        """
+        super().__init__(filename)
+        self.parsed_cache_dir = parsed_cache_dir
+
     @classmethod
     def _parse(cls, fp: TextIO) -> List[JobBase]:
+        return cls._create_jobs(cls._parse_yaml(fp))
+
+    @staticmethod
+    def _parse_yaml(fp: TextIO) -> List[Dict[str, Any]]:
+        """Returns the directives of the jobs in the file, as parsed from YAML."""
+        # use the much faster LibYAML-based loader if available
+        loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+        return [job_data for job_data in yaml.load_all(fp, Loader=loader) if job_data]  # nosec: B506
+
+    @staticmethod
+    def _create_jobs(jobs_data: List[Dict[str, Any]]) -> List[JobBase]:
+        """Returns the jobs with the directives, validated (and modified) by JobBase.unserialize()."""
         jobs = []
         jobs_by_guid = defaultdict(list)
-        for i, job_data in enumerate((job for job in yaml.safe_load_all(fp) if job)):
+        for i, job_data in enumerate(jobs_data):
             job_data['index_number'] = i + 1
             job = JobBase.unserialize(job_data)
             jobs.append(job)
@@ -380,8 +430,73 @@ class YamlJobsStorage(BaseYamlFileStorage, JobsBaseFileStorage):
         return []
 
     def load(self, *args: Any) -> List[JobBase]:
-        with open(self.filename) as fp:
-            return self._parse(fp)
+        if self.parsed_cache_dir is None:
+            with open(self.filename) as fp:
+                return self._parse(fp)
+
+        with open(self.filename, 'rb') as fb:
+            contents = fb.read()
+        file_stat = os.stat(self.filename)
+        cache_key = [
+            __version__,
+            file_stat.st_mtime_ns,
+            file_stat.st_size,
+            hashlib.sha1(contents).hexdigest(),  # nosec: B303
+            sorted(JobBase.__subclasses__),  # job kinds, including those defined in hooks
+        ]
+        path_hash = hashlib.sha1(str(self.filename.resolve()).encode()).hexdigest()[:8]  # nosec: B303
+        cache_file = self.parsed_cache_dir.joinpath(f'{self.filename.stem}.{path_hash}.msgpack')
+        jobs_data = self._load_parsed_cache(cache_file, cache_key)
+        if jobs_data is not None:
+            return self._create_jobs(jobs_data)
+
+        jobs_data = self._parse_yaml(io.TextIOWrapper(io.BytesIO(contents)))  # decoded as by open()
+        packed_cache = self._pack_parsed_cache(cache_key, jobs_data)
+        jobs = self._create_jobs(jobs_data)
+        if packed_cache is not None:
+            self._save_parsed_cache(cache_file, packed_cache)
+        return jobs
+
+    @staticmethod
+    def _load_parsed_cache(cache_file: Path, cache_key: List[Any]) -> Optional[List[Dict[str, Any]]]:
+        """Returns the directives of the jobs cached in cache_file if saved with the same key (i.e. from the same jobs
+        file), or None. As the jobs may include commands, the cache is ignored unless the file and its directory pass
+        the same security checks as a jobs file with 'command' jobs."""
+        try:
+            with open(cache_file, 'rb') as fb:
+                cached = msgpack.unpackb(fb.read())
+            if cached['key'] != cache_key:
+                return None
+            security_errors = file_security_checks(cache_file)
+            if security_errors:
+                logger.warning(f"Ignoring cache of the jobs file because {' and '.join(security_errors)}")
+                return None
+            return cached['jobs']
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.info(f'Ignoring cache of the jobs file {cache_file}: {e}')
+            return None
+
+    @staticmethod
+    def _pack_parsed_cache(cache_key: List[Any], jobs_data: List[Dict[str, Any]]) -> Optional[bytes]:
+        """Returns the directives of the jobs packed with the key for caching, or None if they contain data that msgpack
+        cannot store (e.g. dates)."""
+        try:
+            return msgpack.packb({'key': cache_key, 'jobs': jobs_data})
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _save_parsed_cache(cache_file: Path, packed_cache: bytes) -> None:
+        """Saves the packed cache to cache_file (atomically), writable only by the owner."""
+        try:
+            cache_file.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            temp_file = cache_file.with_suffix(f'.{os.getpid()}.tmp')
+            with os.fdopen(os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as fb:
+                fb.write(packed_cache)
+            temp_file.replace(cache_file)
+        except OSError as e:
+            logger.info(f'Could not cache the parsed jobs file in {cache_file}: {e}')
 
     def save(self, *args: Any, **kwargs: Any) -> None:
         jobs = args[0]
@@ -432,6 +547,72 @@ class CacheStorage(BaseFileStorage, ABC):
     def rollback(self, timestamp: float) -> Optional[int]:
         ...
 
+    def flush(self) -> None:
+        """Make the snapshots saved so far permanent without closing the database, as done by long-running processes
+        (--daemon) after each batch of jobs. Databases that save snapshots directly do nothing."""
+        return
+
+    def save_duration(self, guid: str, duration: float, timestamp: Optional[float] = None) -> None:
+        """Save the duration of the latest run of a job (retrieval and filtering) and the time it was run; not all
+        databases support it.
+
+        :param guid: The guid
+        :param duration: The duration in seconds
+        :param timestamp: The timestamp of the run
+        """
+        return
+
+    def save_run_stats(self, run: float, stats: Iterable[Tuple[Any, ...]]) -> None:
+        """Save the statistics of the jobs of a run (see Report.get_run_stats); not all databases support it.
+
+        :param run: The timestamp of the start of the run
+        :param stats: The statistics of each job, as tuples (guid, location, host, outcome, duration, retrieve_time,
+           filter_time, diff_time, size, http_status)
+        """
+        return
+
+    def load_with_filter_cache(
+        self, guid: str
+    ) -> Tuple[Tuple[Union[str, bytes], float, int, str], Optional[Dict[str, Any]]]:
+        """Return the most recent entry matching a 'guid' (see load) together with the filter cache saved with it (see
+        save), which allows skipping the filters when the data retrieved is the same as then; not all databases support
+        it.
+
+        :param guid: The guid
+        :returns: A tuple (snapshot, filter_cache), where filter_cache is None if not available
+        """
+        return self.load(guid), None
+
+    def save_filter_cache(self, guid: str, filter_cache: Dict[str, Any]) -> None:
+        """Replace the filter cache saved with the most recent entry matching a 'guid' (see save), when the data
+        retrieved has changed but not the filtered data, so that no new entry is saved; not all databases support it.
+
+        :param guid: The guid
+        :param filter_cache: The filter cache
+        """
+        return
+
+    def load_check_timestamps(self, guids: Iterable[str]) -> Dict[str, float]:
+        """Return the time each job was last checked: that of its latest run if recorded (see save_duration),
+        otherwise that of its latest snapshot.
+
+        :param guids: The guids of the jobs
+        :returns: A dict of timestamps, keyed by guid, for the jobs that have been checked
+        """
+        timestamps = {}
+        for guid in guids:
+            timestamp = self.load(guid)[1]
+            if timestamp:
+                timestamps[guid] = timestamp
+        return timestamps
+
+    def load_durations(self) -> Dict[str, float]:
+        """Return the duration of the latest run of each job, if recorded.
+
+        :returns: A dict of durations in seconds, keyed by guid
+        """
+        return {}
+
     def backup(self) -> Iterator[Tuple[str, str, float, int, str]]:
         """Return the most recent entry for each 'guid'.
 
@@ -585,8 +766,32 @@ class CacheSQLite3Storage(CacheStorage):
     * guid: unique hash of the "location", i.e. the URL/command; indexed
     * timestamp: the Unix timestamp of when then the snapshot was taken; indexed
     * msgpack_data: a msgpack blob containing 'data' 'tries' and 'etag' in a dict of keys 'd', 't' and 'e'
+
+    It also contains the 'job_durations' table with the duration of the latest run of each job, with columns:
+
+    * uuid: unique hash of the "location", i.e. the URL/command; primary key
+    * duration: the number of seconds it took to retrieve and filter the data
+    * timestamp: the Unix timestamp of when the job was run (snapshots are only saved when the data changes)
+
+    And the 'job_runs' table with the statistics of each job in the latest 'max_stats_runs' runs, with columns:
+
+    * run: the Unix timestamp of the start of the run; indexed
+    * uuid: unique hash of the "location", i.e. the URL/command
+    * location: the URL/command of the job
+    * host: the host of the URL of the job (empty if not a URL)
+    * outcome: 'new', 'changed', 'unchanged', 'error' or 'deferred'
+    * duration, retrieve_time, filter_time, diff_time: the number of seconds it took to run the job, and the parts of
+      it spent retrieving the data, applying the filters and generating the diff (if any)
+    * size: the number of bytes of data retrieved
+    * http_status: the HTTP status code of the response (url jobs only)
     """
 
+    max_stats_runs = 100
+    _job_runs_columns = (
+        'run REAL, uuid TEXT, location TEXT, host TEXT, outcome TEXT, duration REAL, retrieve_time REAL, '
+        'filter_time REAL, diff_time REAL, size INTEGER, http_status INTEGER'
+    )
+
     def __init__(self, filename: Union[str, os.PathLike], max_snapshots: int = 4) -> None:
         """
         :param filename: The full filename of the database file
@@ -639,6 +844,10 @@ class CacheSQLite3Storage(CacheStorage):
             self.migrate_from_minidb(minidb_filename)
         elif tables != ('webchanges',):
             _initialize_table(self)
+        self._execute('CREATE TABLE IF NOT EXISTS job_durations (uuid TEXT PRIMARY KEY, duration REAL, timestamp REAL)')
+        self._execute(f'CREATE TABLE IF NOT EXISTS job_runs ({self._job_runs_columns})')
+        self._execute('CREATE INDEX IF NOT EXISTS idx_job_runs_run ON job_runs(run)')
+        self.db.commit()
 
         # create temporary database in memory for writing during execution (fault tolerance)
         logger.debug('Creating temp sqlite3 database file in memory')
@@ -646,6 +855,9 @@ class CacheSQLite3Storage(CacheStorage):
         self.temp_db = sqlite3.connect('', check_same_thread=False)
         self.temp_cur = self.temp_db.cursor()
         self._temp_execute('CREATE TABLE webchanges (uuid TEXT, timestamp REAL, msgpack_data BLOB)')
+        self._temp_execute('CREATE TABLE job_durations (uuid TEXT PRIMARY KEY, duration REAL, timestamp REAL)')
+        self._temp_execute(f'CREATE TABLE job_runs ({self._job_runs_columns})')
+        self._temp_execute('CREATE TABLE filter_caches (uuid TEXT PRIMARY KEY, msgpack_data BLOB)')
         self.temp_db.commit()
 
     def _execute(self, sql: str, args: Optional[tuple] = None) -> sqlite3.Cursor:
@@ -681,9 +893,46 @@ class CacheSQLite3Storage(CacheStorage):
             with self.lock:
                 for row in self._temp_execute('SELECT * FROM webchanges').fetchall():
                     self._execute('INSERT INTO webchanges VALUES (?, ?, ?)', row)
+                for row in self._temp_execute('SELECT * FROM job_durations').fetchall():
+                    self._execute('INSERT OR REPLACE INTO job_durations VALUES (?, ?, ?)', row)
+                self.cur.executemany(
+                    'INSERT INTO job_runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    self._temp_execute('SELECT * FROM job_runs').fetchall(),
+                )
+                for guid, filter_cache in self._temp_execute('SELECT * FROM filter_caches').fetchall():
+                    row = self._execute(
+                        'SELECT rowid, msgpack_data FROM webchanges WHERE uuid = ? ORDER BY timestamp DESC LIMIT 1',
+                        (guid,),
+                    ).fetchone()
+                    if row:
+                        c = msgpack.unpackb(row[1])
+                        c['f'] = msgpack.unpackb(filter_cache)
+                        self._execute(
+                            'UPDATE webchanges SET msgpack_data = ? WHERE rowid = ?', (msgpack.packb(c), row[0])
+                        )
                 self.db.commit()
             if delete:
                 self._temp_execute('DELETE FROM webchanges')
+                self._temp_execute('DELETE FROM job_durations')
+                self._temp_execute('DELETE FROM job_runs')
+                self._temp_execute('DELETE FROM filter_caches')
+
+    def _prune_run_stats(self) -> None:
+        """Deletes the statistics of the runs older than the latest 'max_stats_runs' ones. Called with the lock held."""
+        self._execute(
+            'DELETE FROM job_runs WHERE run NOT IN (SELECT DISTINCT run FROM job_runs ORDER BY run DESC LIMIT ?)',
+            (self.max_stats_runs,),
+        )
+        self.db.commit()
+
+    def flush(self) -> None:
+        """Moves the contents of the temporary database to the permanent one and purges old entries (snapshots if
+        required, and run statistics), without the VACUUM done when closing."""
+        self._copy_temp_to_permanent(delete=True)
+        with self.lock:
+            if self.max_snapshots:
+                self.keep_latest(self.max_snapshots)
+            self._prune_run_stats()
 
     def close(self) -> None:
         """Writes the temporary database to the permanent one, purges old entries if required, and closes all database
@@ -698,8 +947,7 @@ class CacheSQLite3Storage(CacheStorage):
                 logger.debug(
                     f'Keeping no more than {self.max_snapshots} snapshots per job: ' f'purged {num_del} older entries'
                 )
-            else:
-                self.db.commit()
+            self._prune_run_stats()
             self._execute('VACUUM')
             self.db.close()
             logger.info(f'Closed main sqlite3 database file {self.filename}')
@@ -710,6 +958,52 @@ class CacheSQLite3Storage(CacheStorage):
         del self.db
         del self.lock
 
+    def merge(self, filename: Union[str, os.PathLike]) -> int:
+        """Merges the snapshots (and job durations and run statistics) of another sqlite3 database, e.g. that of a
+        shard, into the permanent database in a single SQL statement. Snapshots already present are skipped, so merging
+        is idempotent.
+
+        :param filename: The full filename of the database file to merge.
+        :returns: Number of snapshots merged.
+        :raises FileNotFoundError: If the file does not exist.
+        :raises ValueError: If the file is not a webchanges sqlite3 database (nothing is merged).
+        """
+        if not Path(filename).is_file():
+            raise FileNotFoundError(f'Database file {filename} not found')
+        with self.lock:
+            self.db.commit()
+            attached = False
+            try:
+                self._execute('ATTACH DATABASE ? AS merged', (str(filename),))
+                attached = True
+                self._execute(
+                    'INSERT INTO webchanges SELECT * FROM merged.webchanges AS m WHERE NOT EXISTS '
+                    '(SELECT 1 FROM webchanges AS w WHERE w.uuid = m.uuid AND w.timestamp = m.timestamp)'
+                )
+                count = self.cur.rowcount
+                if self._execute(
+                    "SELECT name FROM merged.sqlite_master WHERE type='table' AND name='job_durations'"
+                ).fetchone():
+                    self._execute(
+                        'INSERT OR REPLACE INTO job_durations (uuid, duration, timestamp) '
+                        'SELECT uuid, duration, timestamp FROM merged.job_durations'
+                    )
+                if self._execute(
+                    "SELECT name FROM merged.sqlite_master WHERE type='table' AND name='job_runs'"
+                ).fetchone():
+                    self._execute(
+                        'INSERT INTO job_runs SELECT * FROM merged.job_runs AS m WHERE NOT EXISTS '
+                        '(SELECT 1 FROM job_runs AS j WHERE j.run = m.run AND j.uuid = m.uuid)'
+                    )
+                self.db.commit()
+            except sqlite3.DatabaseError as e:
+                self.db.rollback()
+                raise ValueError(f'{filename} is not a {__project_name__} sqlite3 database ({e})') from None
+            finally:
+                if attached:
+                    self._execute('DETACH DATABASE merged')
+        return count
+
     def get_guids(self) -> List[str]:
         """Lists the unique 'guid's contained in the database.
 
@@ -733,6 +1027,18 @@ class CacheSQLite3Storage(CacheStorage):
             tries is the number of tries;
             etag is the ETag.
         """
+        return self.load_with_filter_cache(guid)[0]
+
+    def load_with_filter_cache(self, guid: str) -> Tuple[Snapshot, Optional[Dict[str, Any]]]:
+        """Return the most recent entry matching a 'guid' together with the filter cache saved with it.
+
+        :param guid: The guid
+
+        :returns: A tuple (snapshot, filter_cache)
+            WHERE
+            snapshot is the tuple returned by load();
+            filter_cache is the filter cache (see save), or None if not available.
+        """
         with self.lock:
             row = self._execute(
                 'SELECT msgpack_data, timestamp FROM webchanges WHERE uuid = ? ' 'ORDER BY timestamp DESC LIMIT 1',
@@ -741,9 +1047,9 @@ class CacheSQLite3Storage(CacheStorage):
         if row:
             msgpack_data, timestamp = row
             r = msgpack.unpackb(msgpack_data)
-            return Snapshot(r['d'], timestamp, r['t'], r['e'])
+            return Snapshot(r['d'], timestamp, r['t'], r['e']), r.get('f')
 
-        return Snapshot('', 0, 0, '')
+        return Snapshot('', 0, 0, ''), None
 
     def get_history_data(self, guid: str, count: Optional[int] = None) -> Dict[str, float]:
         """Return data and timestamp from the last 'count' (None = all) entries matching a 'guid'.
@@ -783,6 +1089,7 @@ class CacheSQLite3Storage(CacheStorage):
         tries: int,
         etag: Optional[str],
         temporary: Optional[bool] = True,
+        filter_cache: Optional[Dict[str, Any]] = None,
         **kwargs: Any,
     ) -> None:
         """Save the data from a job.
@@ -796,12 +1103,17 @@ class CacheSQLite3Storage(CacheStorage):
         :param tries: The number of tries
         :param etag: The ETag (could be empty string)
         :param temporary: If true, saved to temporary database (default)
+        :param filter_cache: The hash of the data as retrieved (before filters) and of the filters applied, with the
+            attributes set on the job by the filters, allowing the filters to be skipped the next time the same data is
+            retrieved (see JobState.filter)
         """
         c = {
             'd': data,
             't': tries,
             'e': etag,
         }
+        if filter_cache:
+            c['f'] = filter_cache
         msgpack_data = msgpack.packb(c)
         if temporary:
             with self.temp_lock:
@@ -819,8 +1131,119 @@ class CacheSQLite3Storage(CacheStorage):
         """
         with self.lock:
             self._execute('DELETE FROM webchanges WHERE uuid = ?', (guid,))
+            self._execute('DELETE FROM job_durations WHERE uuid = ?', (guid,))
+            self._execute('DELETE FROM job_runs WHERE uuid = ?', (guid,))
             self.db.commit()
 
+    def save_filter_cache(self, guid: str, filter_cache: Dict[str, Any]) -> None:
+        """Replace the filter cache saved with the most recent entry matching a 'guid' (see save); the entry is updated
+        when the temporary database is copied to the permanent one.
+
+        :param guid: The guid
+        :param filter_cache: The filter cache
+        """
+        with self.temp_lock:
+            self._temp_execute(
+                'INSERT OR REPLACE INTO filter_caches VALUES (?, ?)', (guid, msgpack.packb(filter_cache))
+            )
+
+    def save_duration(self, guid: str, duration: float, timestamp: Optional[float] = None) -> None:
+        """Save the duration of the latest run of a job and the time it was run into the temporary database.
+
+        :param guid: The guid
+        :param duration: The duration in seconds
+        :param timestamp: The timestamp of the run
+        """
+        with self.temp_lock:
+            self._temp_execute('INSERT OR REPLACE INTO job_durations VALUES (?, ?, ?)', (guid, duration, timestamp))
+
+    def save_run_stats(self, run: float, stats: Iterable[Tuple[Any, ...]]) -> None:
+        """Save the statistics of the jobs of a run into the temporary database.
+
+        :param run: The timestamp of the start of the run
+        :param stats: The statistics of each job, as tuples (guid, location, host, outcome, duration, retrieve_time,
+           filter_time, diff_time, size, http_status)
+        """
+        with self.temp_lock:
+            self.temp_cur.executemany(
+                'INSERT INTO job_runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', ((run, *row) for row in stats)
+            )
+
+    def load_run_stats(self, runs: int = 10, top: int = 10) -> Dict[str, List[Tuple[Any, ...]]]:
+        """Return statistics of the latest runs, computed by SQL aggregates over the 'job_runs' table (without loading
+        any snapshot). Percentiles are by the nearest-rank method, and exclude deferred jobs.
+
+        :param runs: The number of latest runs to include
+        :param top: The maximum number of jobs and hosts listed
+        :returns: A dict with:
+           'runs': for each run, (run, jobs, changed, errors, deferred, total duration, p95 duration, bytes);
+           'durations': a single (count, p50, p95, max) of the durations of all jobs;
+           'jobs': for the slowest jobs, (guid, location, count, mean, p50, p95, max, mean retrieve_time, mean
+           filter_time, mean diff_time, errors), by decreasing mean duration;
+           'hosts': for the hosts retrieving the most data, (host, count, bytes, bytes per run, mean retrieve_time)
+        """
+        recent = (
+            'WITH recent AS (SELECT * FROM job_runs WHERE run IN '
+            '(SELECT DISTINCT run FROM job_runs ORDER BY run DESC LIMIT ?)), '
+            # the rank of each duration, overall and within its run and its job
+            'ranked AS (SELECT *, COUNT(*) OVER () AS n, ROW_NUMBER() OVER (ORDER BY duration) AS rn, '
+            'COUNT(*) OVER (PARTITION BY run) AS n_run, ROW_NUMBER() OVER (PARTITION BY run ORDER BY duration) AS '
+            'rn_run, COUNT(*) OVER (PARTITION BY uuid) AS n_job, ROW_NUMBER() OVER (PARTITION BY uuid ORDER BY '
+            "duration) AS rn_job FROM recent WHERE outcome != 'deferred' AND duration IS NOT NULL) "
+        )
+        stats: Dict[str, List[Tuple[Any, ...]]] = {}
+        with self.lock:
+            stats['runs'] = self._execute(
+                recent + "SELECT run, COUNT(*), SUM(outcome IN ('new', 'changed')), SUM(outcome = 'error'), "
+                "SUM(outcome = 'deferred'), SUM(duration), "
+                '(SELECT MIN(duration) FROM ranked WHERE ranked.run = recent.run AND rn_run >= 0.95 * n_run), '
+                'SUM(size) FROM recent GROUP BY run ORDER BY run',
+                (runs,),
+            ).fetchall()
+            stats['durations'] = self._execute(
+                recent + 'SELECT COUNT(*), MIN(CASE WHEN rn >= 0.5 * n THEN duration END), '
+                'MIN(CASE WHEN rn >= 0.95 * n THEN duration END), MAX(duration) FROM ranked',
+                (runs,),
+            ).fetchall()
+            stats['jobs'] = self._execute(
+                recent + 'SELECT uuid, MAX(location), COUNT(*), AVG(duration), '
+                'MIN(CASE WHEN rn_job >= 0.5 * n_job THEN duration END), '
+                'MIN(CASE WHEN rn_job >= 0.95 * n_job THEN duration END), MAX(duration), AVG(retrieve_time), '
+                "AVG(filter_time), AVG(diff_time), SUM(outcome = 'error') FROM ranked GROUP BY uuid "
+                'ORDER BY AVG(duration) DESC LIMIT ?',
+                (runs, top),
+            ).fetchall()
+            stats['hosts'] = self._execute(
+                recent + 'SELECT host, COUNT(*), SUM(size), 1.0 * SUM(size) / COUNT(DISTINCT run), AVG(retrieve_time) '
+                "FROM recent WHERE host != '' GROUP BY host ORDER BY SUM(size) DESC LIMIT ?",
+                (runs, top),
+            ).fetchall()
+        return stats
+
+    def load_check_timestamps(self, guids: Iterable[str]) -> Dict[str, float]:
+        """Return the time each job was last checked: that of its latest run if recorded (see save_duration),
+        otherwise that of its latest snapshot, with a single query.
+
+        :param guids: The guids of the jobs
+        :returns: A dict of timestamps, keyed by guid, for the jobs that have been checked
+        """
+        with self.lock:
+            timestamps = dict(
+                self._execute(
+                    'SELECT uuid, MAX(timestamp) FROM (SELECT uuid, timestamp FROM webchanges UNION ALL '
+                    'SELECT uuid, timestamp FROM job_durations WHERE timestamp IS NOT NULL) GROUP BY uuid'
+                ).fetchall()
+            )
+        return {guid: timestamps[guid] for guid in guids if guid in timestamps}
+
+    def load_durations(self) -> Dict[str, float]:
+        """Return the duration of the latest run of each job.
+
+        :returns: A dict of durations in seconds, keyed by guid
+        """
+        with self.lock:
+            return dict(self._execute('SELECT uuid, duration FROM job_durations').fetchall())
+
     def delete_latest(self, guid: str, delete_entries: int = 1) -> int:
         """For the given 'guid', delete only the latest 'delete_entries' number of entries and keep all other (older)
         ones.
@@ -955,6 +1378,10 @@ class CacheSQLite3Storage(CacheStorage):
 
 
 class CacheRedisStorage(CacheStorage):
+    # hashes of the duration and time of the latest run of each job, keyed by guid
+    DURATIONS_KEY = 'webchanges:durations'
+    CHECKED_KEY = 'webchanges:checked'
+
     def __init__(self, filename: Union[str, os.PathLike]) -> None:
         super().__init__(filename)
 
@@ -987,6 +1414,18 @@ class CacheRedisStorage(CacheStorage):
 
         return '', 0, 0, ''
 
+    def load_with_filter_cache(
+        self, guid: str
+    ) -> Tuple[Tuple[Union[str, bytes], float, int, str], Optional[Dict[str, Any]]]:
+        key = self._make_key(guid)
+        data = self.db.lindex(key, 0)
+
+        if data:
+            r = msgpack.unpackb(data)
+            return (r['data'], r['timestamp'], r['tries'], r['etag']), r.get('filter_cache')
+
+        return ('', 0, 0, ''), None
+
     def get_history_data(self, guid: str, count: Optional[int] = None) -> Dict[str, float]:
         history: Dict[str, float] = {}
         if isinstance(count, int) and count < 1:
@@ -1011,6 +1450,7 @@ class CacheRedisStorage(CacheStorage):
         timestamp: float,
         tries: int,
         etag: Optional[str],
+        filter_cache: Optional[Dict[str, Any]] = None,
         **kwargs: Any,
     ) -> None:
         r = {
@@ -1019,10 +1459,39 @@ class CacheRedisStorage(CacheStorage):
             'tries': tries,
             'etag': etag,
         }
+        if filter_cache:
+            r['filter_cache'] = filter_cache
         self.db.lpush(self._make_key(guid), msgpack.packb(r))
 
+    def save_filter_cache(self, guid: str, filter_cache: Dict[str, Any]) -> None:
+        key = self._make_key(guid)
+        data = self.db.lindex(key, 0)
+        if data:
+            r = msgpack.unpackb(data)
+            r['filter_cache'] = filter_cache
+            self.db.lset(key, 0, msgpack.packb(r))
+
+    def save_duration(self, guid: str, duration: float, timestamp: Optional[float] = None) -> None:
+        self.db.hset(self.DURATIONS_KEY, guid, duration)
+        if timestamp is not None:
+            self.db.hset(self.CHECKED_KEY, guid, timestamp)
+
+    def load_check_timestamps(self, guids: Iterable[str]) -> Dict[str, float]:
+        guids = list(guids)
+        timestamps = super().load_check_timestamps(guids)
+        checked = {k.decode(): float(v) for k, v in self.db.hgetall(self.CHECKED_KEY).items()}
+        for guid in guids:
+            if guid in checked:
+                timestamps[guid] = max(timestamps.get(guid, 0), checked[guid])
+        return timestamps
+
+    def load_durations(self) -> Dict[str, float]:
+        return {k.decode(): float(v) for k, v in self.db.hgetall(self.DURATIONS_KEY).items()}
+
     def delete(self, guid: str) -> None:
         self.db.delete(self._make_key(guid))
+        self.db.hdel(self.DURATIONS_KEY, guid)
+        self.db.hdel(self.CHECKED_KEY, guid)
 
     def delete_latest(self, guid: str) -> None:
         raise NotImplementedError("Deleting of latest snapshot no supported by 'redis' database engine")
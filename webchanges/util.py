@@ -2,6 +2,9 @@
 
 from __future__ import annotations
 
+import contextlib
+import difflib
+import functools
 import html
 import importlib.machinery
 import importlib.util
@@ -12,13 +15,32 @@ import shlex
 import subprocess
 import sys
 import textwrap
+import threading
+import time
+from collections import Counter
 from math import floor, log10
 from os import PathLike
 from types import ModuleType
-from typing import Callable, Dict, Iterable, List, Match, TYPE_CHECKING, Tuple, Type, Union
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Match,
+    Optional,
+    TYPE_CHECKING,
+    Tuple,
+    Type,
+    Union,
+)
 
 # https://stackoverflow.com/questions/39740632
 if TYPE_CHECKING:
+    import cProfile
+
     from .filters import FilterBase
 
 logger = logging.getLogger(__name__)
@@ -71,6 +93,60 @@ class TrackSubClasses(type):
         super().__init__(name, bases, namespace)
 
 
+class LazyModule(object):
+    """A stand-in for a module which is imported when one of its attributes is first accessed, so that modules only
+    needed by some filters, reporters, etc. are not imported at startup (see lazy_import)."""
+
+    def __init__(self, name: str) -> None:
+        self.__name = name
+        self.__module: Optional[ModuleType] = None
+
+    def __getattr__(self, attr: str) -> Any:
+        if self.__module is None:
+            # importlib.import_module is thread-safe; worst case the module is looked up twice
+            self.__module = importlib.import_module(self.__name)
+        return getattr(self.__module, attr)
+
+    def __repr__(self) -> str:
+        return f'<lazily imported module {self.__name!r}>'
+
+
+def lazy_import(name: str) -> Optional[Union[ModuleType, LazyModule]]:
+    """Returns a module to be imported only when first used, or None if it's not installed (as for optional modules
+    imported in a try/except ImportError block).
+
+    :param name: The name of the module (e.g. 'lxml.etree').
+    :returns: The module (if already imported) or a LazyModule, or None if the module (or, for a submodule, its
+        top-level package) is not installed.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    # only the top-level package is looked for, as looking for a submodule would import its package
+    if importlib.util.find_spec(name.partition('.')[0]) is None:
+        return None
+    return LazyModule(name)
+
+
+@functools.lru_cache(maxsize=None)
+def get_package_version(name: str) -> str:
+    """Returns the version of an installed distribution package, read from its metadata without importing it.
+
+    :param name: The name of the distribution package (e.g. 'beautifulsoup4').
+    :returns: The version, or '' if the package is not installed.
+    """
+    try:
+        if sys.version_info >= (3, 8):
+            from importlib import metadata
+
+            return metadata.version(name)
+        else:
+            import pkg_resources
+
+            return pkg_resources.get_distribution(name).version
+    except Exception:
+        return ''
+
+
 def edit_file(filename: Union[str, bytes, PathLike]) -> None:
     """Opens the editor to edit the file."""
     editor = os.environ.get('EDITOR', None)
@@ -236,3 +312,155 @@ def linkify(
 
     text = html.escape(text)
     return _URL_RE.sub(make_link, text)
+
+
+class SimilarityIndex(object):
+    """An index of texts (e.g. the snapshots in the history of a job) to find the one most similar to another text in
+    linear time, as a replacement for difflib.get_close_matches, which is quadratic in the length of the texts.
+
+    The similarity of two texts is the Sørensen–Dice coefficient of their words and pairs of consecutive words
+    (counted with repetitions), i.e. the same measure as difflib's ratio() but on words instead of characters, with the
+    pairs of words accounting for their order: texts with the same words (or lines) in a different order are similar,
+    but not identical. Short texts, for which comparing words is too coarse, are compared character by character with
+    difflib as before.
+    """
+
+    SHORT_TEXT_LENGTH = 200
+
+    def __init__(self, texts: Iterable[Union[str, bytes]]) -> None:
+        """
+        :param texts: The texts to be indexed, in order of preference when equally similar (e.g. newest first).
+        """
+        self.signatures = [(text, *self._signature(text)) for text in texts]
+
+    @staticmethod
+    def _signature(text: Union[str, bytes]) -> Tuple[Counter, int]:
+        words = text.split()
+        shingles = Counter(words)
+        shingles.update(zip(words, words[1:]))
+        return shingles, sum(shingles.values())
+
+    def _similarity(
+        self,
+        text: Union[str, bytes],
+        words: Counter,
+        size: int,
+        other: Union[str, bytes],
+        other_words: Counter,
+        other_size: int,
+    ) -> float:
+        """Returns the similarity of two texts, between 0 (nothing in common) and 1 (identical)."""
+        if len(text) <= self.SHORT_TEXT_LENGTH and len(other) <= self.SHORT_TEXT_LENGTH:
+            return difflib.SequenceMatcher(None, text, other).ratio()
+        if not size + other_size:
+            return 1.0
+        return 2 * sum((words & other_words).values()) / (size + other_size)
+
+    def closest_match(self, text: Union[str, bytes], cutoff: float = 0.6) -> Optional[Union[str, bytes]]:
+        """Returns the indexed text most similar to a text.
+
+        :param text: The text to be matched.
+        :param cutoff: The minimum similarity of a match (the default is the same as difflib.get_close_matches).
+        :returns: The most similar indexed text (the first one indexed if several are equally similar), or None if
+            none has a similarity of at least cutoff.
+        """
+        words, size = self._signature(text)
+        best_match = None
+        best_similarity = cutoff
+        for indexed_text, indexed_words, indexed_size in self.signatures:
+            similarity = self._similarity(text, words, size, indexed_text, indexed_words, indexed_size)
+            if similarity > best_similarity or (best_match is None and similarity == best_similarity):
+                best_match = indexed_text
+                best_similarity = similarity
+        return best_match
+
+
+class Profiler(object):
+    """Records the wall-clock and CPU time spent in each phase of a run (e.g. loading the jobs, retrieving the data of
+    a job or applying a filter), as requested with --profile. Phases can be timed in any thread; the times of phases
+    with the same name (e.g. the retrieval of each job) are added up. The CPU time is that of the thread running the
+    phase, so it's not recorded for phases that are run concurrently with others in the same thread (coroutines) or
+    whose work is done elsewhere (e.g. in another process).
+
+    Optionally, the whole run is also profiled with cProfile and the statistics saved to a file for use with pstats
+    (only covers the main thread).
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.phases: Dict[str, List[Optional[float]]] = {}  # name: [count, wall-clock time, CPU time or None]
+        self.pstats_file: Optional[str] = None
+        self._lock = threading.Lock()
+        self._cprofile: Optional[cProfile.Profile] = None
+
+    def enable(self, pstats_file: Optional[str] = None) -> None:
+        """Starts profiling.
+
+        :param pstats_file: The file where to save the cProfile statistics of the run when finished, if any.
+        """
+        self.enabled = True
+        self.pstats_file = pstats_file
+        if pstats_file:
+            import cProfile
+
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def phase(self, name: str, concurrent: bool = False) -> ContextManager[None]:
+        """Returns a context manager timing a phase of the run (doing nothing if not profiling).
+
+        :param name: The name of the phase.
+        :param concurrent: Whether the phase is run concurrently with others in the same thread (e.g. awaits in a
+            coroutine) or has its work done in another process, in which case only its wall-clock time is recorded, as
+            the CPU time of the thread is not that of the phase.
+        """
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._timed_phase(name, concurrent)
+
+    @contextlib.contextmanager
+    def _timed_phase(self, name: str, concurrent: bool) -> Iterator[None]:
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - wall_start
+            cpu_time = None if concurrent else time.thread_time() - cpu_start
+            with self._lock:
+                totals = self.phases.setdefault(name, [0, 0.0, 0.0 if cpu_time is not None else None])
+                totals[0] += 1
+                totals[1] += wall_time
+                if cpu_time is not None and totals[2] is not None:
+                    totals[2] += cpu_time
+
+    def summary(self) -> str:
+        """Returns a table of the phases of the run, in order of decreasing wall-clock time."""
+        width = max((len(name) for name in self.phases), default=5)
+        lines = [f'{"Phase":<{width}}  {"Count":>7}  {"Wall (s)":>10}  {"CPU (s)":>10}']
+        for name, (count, wall_time, cpu_time) in sorted(self.phases.items(), key=lambda item: -item[1][1]):
+            cpu = f'{cpu_time:>10.3f}' if cpu_time is not None else f'{"-":>10}'
+            lines.append(f'{name:<{width}}  {int(count):>7}  {wall_time:>10.3f}  {cpu}')
+        return '\n'.join(lines)
+
+    def finish(self) -> None:
+        """Stops profiling, saves the cProfile statistics if requested and prints the summary of the phases."""
+        if not self.enabled:
+            return
+        self.enabled = False
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.pstats_file)
+            self._cprofile = None
+        print(
+            f'\nTime spent in each phase of the run (phases in parallel threads overlap; CPU time of the thread '
+            f'running the phase, - if run concurrently in the same thread or in another process):\n{self.summary()}'
+        )
+        if self.pstats_file:
+            print(
+                f'Profile of the run (main thread only, not the threads and event loops running jobs) saved to '
+                f'{self.pstats_file} for use with pstats'
+            )
+
+
+profiler = Profiler()
@@ -2,22 +2,56 @@
 
 from __future__ import annotations
 
-import difflib
+import asyncio
+import heapq
 import logging
+import multiprocessing
 import os
-from concurrent.futures import ThreadPoolExecutor
-from contextlib import ExitStack
-from typing import Callable, Iterable, Optional, TYPE_CHECKING
+import queue
+import signal
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager, ExitStack
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    TYPE_CHECKING,
+    Tuple,
+)
+from urllib.parse import urlsplit
 
-from .handler import JobState
-from .jobs import BrowserJob, NotModifiedError
+import requests
+
+from .handler import JobState, Report
+from .jobs import BrowserJob, BrowserPool, DeferredError, HttpSessionPool, JobBase, NotModifiedError, UrlJob
+from .storage import CacheStorage
+from .util import lazy_import, SimilarityIndex
 
 # https://stackoverflow.com/questions/39740632
 if TYPE_CHECKING:
+    import aiohttp
+
     from .main import Urlwatch
+else:
+    aiohttp = lazy_import('aiohttp')  # imported when first used; None if not installed
 
 logger = logging.getLogger(__name__)
 
+# a job with an 'interval' is due once this fraction of it has elapsed, so that small variations in the start time of
+# runs (e.g. by cron) or in the time a job is reached within a run do not delay it by a whole run
+INTERVAL_DUE_FRACTION = 0.95
+
 
 def run_parallel(func: Callable, items: Iterable, max_workers: Optional[int] = None) -> Iterable[JobState]:
     """Convenience function to run parallel threads."""
@@ -26,9 +60,543 @@ def run_parallel(func: Callable, items: Iterable, max_workers: Optional[int] = N
             yield result
 
 
-def run_jobs(urlwatcher: Urlwatch) -> None:
-    """Process jobs."""
-    cache_storage = urlwatcher.cache_storage
+def job_host(job: JobBase) -> Optional[str]:
+    """Returns the (lowercase) name of the host the job retrieves its data from, or None if it's not a network host
+    (e.g. shell jobs or file:// URLs)."""
+    if job.url:
+        url_parts = urlsplit(job.url)
+        if url_parts.scheme in ('http', 'https', 'ftp'):
+            return url_parts.hostname
+    return None
+
+
+class AdaptiveConcurrency(object):
+    """Controller of the number of jobs run in parallel threads, adapting it to how the run is going with AIMD
+    (additive increase, multiplicative decrease): after each window of completed jobs (as many as the current limit)
+    the limit is increased by 1 if the throughput (jobs completed per second) has risen compared to the previous
+    window, and it's halved as soon as a job fails with a timeout, a connection error or a "429 Too Many Requests" or
+    "503 Service Unavailable" HTTP error. Not thread-safe: must be used by the scheduling thread only."""
+
+    def __init__(self, min_limit: int = 1, max_limit: int = 64, initial: Optional[int] = None) -> None:
+        """
+        :param min_limit: The minimum number of jobs run in parallel.
+        :param max_limit: The maximum number of jobs run in parallel.
+        :param initial: The number of jobs run in parallel at the start (default: min_limit); it's kept within the
+           limits.
+        """
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = min(max(initial or self.min_limit, self.min_limit), self.max_limit)
+        self.peak = self.limit
+        self._throughput = 0.0
+        self._new_window(time.monotonic())
+        self._ignored_errors = 0
+
+    def _new_window(self, now: float) -> None:
+        self._window_start = now
+        self._window_count = 0
+
+    @staticmethod
+    def is_overload_error(e: Optional[Exception]) -> bool:
+        """Returns True if the exception is a sign of overload of the network or of the server, i.e. if running fewer
+        jobs in parallel could help."""
+        if isinstance(e, requests.exceptions.HTTPError):
+            return e.response is not None and e.response.status_code in (429, 503)
+        if isinstance(e, requests.exceptions.SSLError):
+            return False
+        return isinstance(
+            e, (requests.exceptions.Timeout, requests.exceptions.ConnectionError, TimeoutError, ConnectionError)
+        )
+
+    def record(self, job_state: JobState) -> None:
+        """Records the completion of a job, adjusting the limit.
+
+        :param job_state: The processed job state.
+        """
+        now = time.monotonic()
+        if self.is_overload_error(job_state.exception):
+            if self._ignored_errors:
+                # the job was started before the last decrease: neither reduce again nor count it as throughput
+                self._ignored_errors -= 1
+                return
+            old_limit = self.limit
+            self.limit = max(self.min_limit, self.limit // 2)
+            logger.debug(
+                f'Job {job_state.job.index_number}: Failed with {type(job_state.exception).__name__}; reducing the '
+                f'number of jobs run in parallel from {old_limit} to {self.limit}'
+            )
+            # the jobs already running were started with the old limit and may fail the same way
+            self._ignored_errors = old_limit - 1
+            self._throughput = 0.0
+            self._new_window(now)
+            return
+        elif self._ignored_errors:
+            self._ignored_errors -= 1
+
+        self._window_count += 1
+        if self._window_count < self.limit:
+            return
+        elapsed = now - self._window_start
+        throughput = self._window_count / elapsed if elapsed > 0 else float('inf')
+        if throughput > self._throughput and self.limit < self.max_limit:
+            self.limit += 1
+            self.peak = max(self.peak, self.limit)
+            logger.debug(
+                f'Throughput rose to {throughput:.1f} jobs/s; increasing the number of jobs run in parallel to '
+                f'{self.limit}'
+            )
+        self._throughput = throughput
+        self._new_window(now)
+
+
+def run_parallel_by_host(
+    func: Callable[[JobState], JobState],
+    job_states: Iterable[JobState],
+    max_workers: Optional[int] = None,
+    max_per_host: int = 0,
+    min_delay: float = 0.0,
+    concurrency: Optional[AdaptiveConcurrency] = None,
+) -> Iterator[JobState]:
+    """Runs func on the job states in parallel threads, interleaving the jobs of the different hosts and being polite
+    to each of them: no more than max_per_host jobs for the same host run at the same time, and at least min_delay
+    seconds elapse between the start of two jobs for the same host. Threads left free by hosts that are at their limit
+    are filled with jobs for other hosts. Jobs without a network host (see job_host) are not limited.
+
+    :param func: The function to run on each job state, returning it.
+    :param job_states: The job states.
+    :param max_workers: The maximum number of threads (default: same as concurrent.futures.ThreadPoolExecutor's);
+       ignored if concurrency is set.
+    :param max_per_host: The maximum number of jobs running at the same time for each host (0 for no limit).
+    :param min_delay: The minimum number of seconds between the start of two jobs for the same host.
+    :param concurrency: The controller adapting the number of threads running jobs, between its limits; if None, it's
+       fixed at max_workers.
+    :returns: An iterator of the job states returned by func, in order of completion.
+    """
+    if concurrency is not None:
+        max_workers = concurrency.max_limit
+    elif max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) + 4)
+
+    def limit() -> int:
+        return concurrency.limit if concurrency is not None else max_workers  # type: ignore[return-value]
+
+    # one queue per host, in order of first appearance in the jobs list, each with jobs in their original order
+    pending: Dict[Optional[str], Deque[JobState]] = {}
+    for job_state in job_states:
+        pending.setdefault(job_host(job_state.job), deque()).append(job_state)
+
+    running: Dict[Optional[str], int] = defaultdict(int)
+    last_start: Dict[Optional[str], float] = {}
+    results: queue.Queue[Tuple[Optional[str], Future]] = queue.Queue()
+    in_flight = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or in_flight:
+            wait: Optional[float] = None
+            submitted = True
+            while submitted and in_flight < limit():
+                # one job per available host in each pass, so that hosts are interleaved
+                submitted = False
+                now = time.monotonic()
+                for host in list(pending):
+                    if in_flight >= limit():
+                        break
+                    if host is not None:
+                        if max_per_host and running[host] >= max_per_host:
+                            continue
+                        if min_delay and host in last_start:
+                            ready_in = last_start[host] + min_delay - now
+                            if ready_in > 0:
+                                wait = ready_in if wait is None else min(wait, ready_in)
+                                continue
+                    job_state = pending[host].popleft()
+                    if not pending[host]:
+                        del pending[host]
+                    running[host] += 1
+                    last_start[host] = now
+                    in_flight += 1
+                    executor.submit(func, job_state).add_done_callback(
+                        lambda future, host=host: results.put((host, future))  # type: ignore[misc]
+                    )
+                    submitted = True
+
+            try:
+                host, future = results.get(timeout=wait)
+            except queue.Empty:
+                # a host's delay has elapsed
+                continue
+            in_flight -= 1
+            running[host] -= 1
+            job_state = future.result()
+            if concurrency is not None:
+                concurrency.record(job_state)
+            yield job_state
+
+    if concurrency is not None:
+        logger.info(
+            f'Ran jobs in threads with adaptive concurrency: {concurrency.limit} in parallel at the end of the run, '
+            f'{concurrency.peak} at peak (limits {concurrency.min_limit}-{concurrency.max_limit})'
+        )
+
+
+def merge_parallel(iterators: List[Iterator[JobState]]) -> Iterator[JobState]:
+    """Consumes each of the iterators in its own thread, yielding job states as soon as any of them produces one. An
+    exception raised by an iterator is re-raised in the calling thread.
+
+    :param iterators: The iterators of job states.
+    :returns: An iterator of all the job states, in order of production.
+    """
+    if len(iterators) == 1:
+        yield from iterators[0]
+        return
+
+    results: queue.Queue = queue.Queue()
+    finished = object()
+
+    def consume(iterator: Iterator[JobState]) -> None:
+        try:
+            for job_state in iterator:
+                results.put(job_state)
+        except Exception as e:
+            # pass it on to be raised in the calling thread
+            results.put(e)
+        finally:
+            results.put(finished)
+
+    threads = [threading.Thread(target=consume, args=(iterator,), daemon=True) for iterator in iterators]
+    for thread in threads:
+        thread.start()
+    running = len(threads)
+    while running:
+        result = results.get()
+        if result is finished:
+            running -= 1
+        elif isinstance(result, Exception):
+            raise result
+        else:
+            yield result
+    for thread in threads:
+        thread.join()
+
+
+def _get_results(results: queue.Queue, count: int) -> Iterator[JobState]:
+    """Yields count job states from the results queue as they arrive, raising any exception found in it instead."""
+    for _ in range(count):
+        result = results.get()
+        if isinstance(result, Exception):
+            raise result
+        yield result
+
+
+class AsyncHostLimiter(object):
+    """The politeness limits per host of run_parallel_by_host, for jobs running concurrently on an event loop. Must be
+    created and used in the same event loop."""
+
+    def __init__(self, max_per_host: int = 0, min_delay: float = 0.0) -> None:
+        """
+        :param max_per_host: The maximum number of jobs running at the same time for each host (0 for no limit).
+        :param min_delay: The minimum number of seconds between the start of two jobs for the same host.
+        """
+        self.max_per_host = max_per_host
+        self.min_delay = min_delay
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._next_start: Dict[str, float] = {}
+
+    @asynccontextmanager
+    async def slot(self, host: Optional[str]) -> AsyncIterator[None]:
+        """Async context manager waiting until a job for the host can start; jobs without a host are not limited.
+
+        :param host: The host of the job (see job_host).
+        """
+        if host is None:
+            yield
+            return
+
+        semaphore = None
+        if self.max_per_host:
+            if host not in self._semaphores:
+                self._semaphores[host] = asyncio.Semaphore(self.max_per_host)
+            semaphore = self._semaphores[host]
+            await semaphore.acquire()
+        try:
+            if self.min_delay:
+                # reserve the next start slot for the host
+                loop = asyncio.get_running_loop()
+                now = loop.time()
+                start = max(now, self._next_start.get(host, now))
+                self._next_start[host] = start + self.min_delay
+                await asyncio.sleep(start - now)
+            yield
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
+
+async def process_with_deadline(job_state: JobState, coro: Awaitable) -> None:
+    """Awaits the coroutine processing the job state, cancelling it and deferring the job if the deadline of the run
+    is reached first."""
+    try:
+        await asyncio.wait_for(coro, job_state.time_left())
+    except asyncio.TimeoutError:
+        job_state.defer()
+
+
+def uses_aiohttp(job: JobBase) -> bool:
+    """Returns True if the job can be run by the 'aiohttp' HTTP engine, i.e. it's a UrlJob with an http(s) URL."""
+    return isinstance(job, UrlJob) and urlsplit(job.url).scheme in ('http', 'https')
+
+
+async def _process_async(
+    job_states: List[JobState],
+    max_connections: int,
+    results: queue.Queue,
+    max_per_host: int = 0,
+    min_delay: float = 0.0,
+) -> None:
+    """Processes all job states concurrently on the running event loop sharing a single aiohttp session, putting each
+    of them in the results queue as soon as it's processed."""
+    limiter = AsyncHostLimiter(max_per_host, min_delay)
+
+    async def process_in_slot(job_state: JobState) -> None:
+        async with limiter.slot(job_host(job_state.job)):
+            await job_state.process_async(session)
+
+    async def process(job_state: JobState) -> None:
+        await process_with_deadline(job_state, process_in_slot(job_state))
+        results.put(job_state)
+
+    # DummyCookieJar: cookies set by a server must not leak into the requests of other jobs
+    connector = aiohttp.TCPConnector(limit=max_connections)
+    async with aiohttp.ClientSession(
+        connector=connector, cookie_jar=aiohttp.DummyCookieJar(), trust_env=True
+    ) as session:
+        await asyncio.gather(*(process(job_state) for job_state in job_states))
+
+
+def run_parallel_aiohttp(
+    job_states: List[JobState],
+    max_connections: int = 1000,
+    max_per_host: int = 0,
+    min_delay: float = 0.0,
+) -> Iterator[JobState]:
+    """Processes the job states of jobs that can use the 'aiohttp' HTTP engine (see uses_aiohttp) concurrently on a
+    single asyncio event loop running in its own thread. Job states are yielded as soon as they are processed.
+
+    :param job_states: The job states to process.
+    :param max_connections: The maximum number of simultaneous connections opened by aiohttp.
+    :param max_per_host: The maximum number of jobs running at the same time for each host (0 for no limit).
+    :param min_delay: The minimum number of seconds between the start of two jobs for the same host.
+    :returns: An iterator of processed job states, in order of completion.
+    """
+    if aiohttp is None:
+        raise ImportError("Python package 'aiohttp' is not installed; cannot use the 'aiohttp' HTTP engine")
+
+    results: queue.Queue = queue.Queue()
+
+    def run_event_loop() -> None:
+        try:
+            asyncio.run(_process_async(job_states, max_connections, results, max_per_host, min_delay))
+        except Exception as e:
+            # pass it on to be raised in the calling thread, otherwise it would wait forever for the results
+            results.put(e)
+
+    loop_thread = threading.Thread(target=run_event_loop, daemon=True)
+    loop_thread.start()
+    yield from _get_results(results, len(job_states))
+    loop_thread.join()
+
+
+def run_parallel_browser(
+    job_states: List[JobState],
+    browser_pool: BrowserPool,
+    max_jobs: Optional[int] = None,
+    max_per_host: int = 0,
+    min_delay: float = 0.0,
+) -> Iterator[JobState]:
+    """Processes the job states of BrowserJobs concurrently on the event loop of the browser pool (i.e. without a
+    thread for each of them). Job states are yielded as soon as they are processed.
+
+    :param job_states: The job states to process.
+    :param browser_pool: The browser pool, which the job states must be using.
+    :param max_jobs: The maximum number of jobs running at the same time (default: the number of CPUs).
+    :param max_per_host: The maximum number of jobs running at the same time for each host (0 for no limit).
+    :param min_delay: The minimum number of seconds between the start of two jobs for the same host.
+    :returns: An iterator of processed job states, in order of completion.
+    """
+    if not max_jobs:
+        max_jobs = os.cpu_count() or 1
+    results: queue.Queue = queue.Queue()
+
+    async def process_all() -> None:
+        limiter = AsyncHostLimiter(max_per_host, min_delay)
+        semaphore = asyncio.Semaphore(max_jobs)  # type: ignore[arg-type]
+
+        async def process_in_slot(job_state: JobState) -> None:
+            async with limiter.slot(job_host(job_state.job)):
+                async with semaphore:
+                    await job_state.process_async()
+
+        async def process(job_state: JobState) -> None:
+            await process_with_deadline(job_state, process_in_slot(job_state))
+            results.put(job_state)
+
+        await asyncio.gather(*(process(job_state) for job_state in job_states))
+
+    def check_exception(future: Future) -> None:
+        if future.exception() is not None:
+            # pass it on to be raised in the calling thread, otherwise it would wait forever for the results
+            results.put(future.exception())
+
+    browser_pool.submit(process_all()).add_done_callback(check_exception)
+    yield from _get_results(results, len(job_states))
+
+
+def order_jobs(jobs: List[JobBase], durations: Dict[str, float], job_order: str = 'longest_first') -> List[JobBase]:
+    """Orders the jobs for submission.
+
+    :param jobs: The jobs.
+    :param durations: The duration of the latest run of each job, keyed by guid.
+    :param job_order: 'longest_first' to order the jobs by decreasing duration of their latest run, so that slow jobs
+       do not start last and delay the end of the run, with jobs without a recorded duration (e.g. new ones) first;
+       'file' to keep the order of the jobs file.
+    :returns: The ordered jobs.
+    """
+    if job_order == 'file':
+        return jobs
+    elif job_order == 'longest_first':
+        # sorted() is stable: jobs with equal durations keep the order of the jobs file
+        return sorted(jobs, key=lambda job: durations.get(job.get_guid(), float('inf')), reverse=True)
+    raise ValueError(f"Unknown job order '{job_order}' in configuration (must be 'longest_first' or 'file')")
+
+
+class JobPools(NamedTuple):
+    """The pools of resources shared by the jobs (see create_pools)."""
+
+    session_pool: Optional[HttpSessionPool]
+    browser_pool: Optional[BrowserPool]
+    filter_pool: Optional[Executor]
+
+
+def create_pools(stack: ExitStack, jobs: List[JobBase], worker_config: Dict[str, Any]) -> JobPools:
+    """Creates the pools of resources needed to run the jobs as set in the worker configuration: an HttpSessionPool if
+    the HTTP engine is 'requests', a BrowserPool if there are browser jobs, and a process pool for CPU-heavy filters.
+
+    :param stack: The exit stack taking care of closing the pools.
+    :param jobs: The jobs, with defaults applied.
+    :param worker_config: The 'worker' section of the configuration.
+    :returns: The pools.
+    """
+    http_engine = worker_config.get('http_engine', 'requests')
+    if http_engine not in ('requests', 'aiohttp'):
+        raise ValueError(f"Unknown HTTP engine '{http_engine}' in configuration (must be 'requests' or 'aiohttp')")
+
+    session_pool = None
+    if http_engine == 'requests':
+        session_pool = stack.enter_context(HttpSessionPool(worker_config.get('http_pool_size', 10)))
+    browser_pool = None
+    if any(isinstance(job, BrowserJob) for job in jobs):
+        browser_pool = stack.enter_context(BrowserPool(worker_config.get('max_pages_per_browser', 100)))
+    filter_pool = None
+    filter_processes = worker_config.get('filter_processes', 0)
+    if filter_processes != 0 and jobs:
+        # 'spawn' as forking a process with running threads is unsafe; worker processes are only started when needed
+        filter_pool = stack.enter_context(
+            ProcessPoolExecutor(
+                max_workers=min(filter_processes or os.cpu_count() or 1, len(jobs)),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        )
+    return JobPools(session_pool, browser_pool, filter_pool)
+
+
+def process_jobs(
+    stack: ExitStack,
+    cache_storage: CacheStorage,
+    jobs: List[JobBase],
+    worker_config: Dict[str, Any],
+    pools: Optional[JobPools] = None,
+    deadline: Optional[float] = None,
+) -> Iterator[JobState]:
+    """Processes the jobs in parallel as set in the worker configuration: url jobs with the HTTP engine (sharing an
+    HttpSessionPool if 'requests'), browser jobs on the event loop of a shared BrowserPool, and all others in threads;
+    CPU-heavy filters are run in a process pool. The job states, as well as the pools (unless passed), are created as
+    context managers in the exit stack.
+
+    :param stack: The exit stack taking care of closing the job states and the pools.
+    :param cache_storage: The cache storage.
+    :param jobs: The jobs, with defaults applied; they are submitted in the order set by 'job_order'.
+    :param worker_config: The 'worker' section of the configuration.
+    :param pools: The pools to use, as created by create_pools for these jobs or more; if None, they're created.
+    :param deadline: The time.monotonic() time by which processing must end: jobs that cannot be completed by then,
+       judging by the duration of their latest run, are not started, and those running are cancelled where possible;
+       both are deferred (see JobState.defer).
+    :returns: An iterator of processed job states, in order of completion.
+    """
+    if pools is None:
+        pools = create_pools(stack, jobs, worker_config)
+    http_engine = worker_config.get('http_engine', 'requests')
+    max_per_host = worker_config.get('max_jobs_per_host', 6)
+    min_delay = worker_config.get('min_delay_per_host', 0.0)
+    durations = cache_storage.load_durations()
+    jobs = order_jobs(jobs, durations, worker_config.get('job_order', 'longest_first'))
+
+    job_states = [stack.enter_context(JobState(cache_storage, job, *pools, deadline=deadline)) for job in jobs]
+    for job_state in job_states:
+        job_state.expected_duration = durations.get(job_state.job.get_guid())
+
+    browser_job_states = [job_state for job_state in job_states if isinstance(job_state.job, BrowserJob)]
+    async_job_states = [
+        job_state for job_state in job_states if http_engine == 'aiohttp' and uses_aiohttp(job_state.job)
+    ]
+    thread_job_states = [
+        job_state
+        for job_state in job_states
+        if not (isinstance(job_state.job, BrowserJob) or http_engine == 'aiohttp' and uses_aiohttp(job_state.job))
+    ]
+    logger.debug(
+        f'Processing {len(thread_job_states)} jobs in threads, {len(browser_job_states)} browser jobs in the browser '
+        f'pool event loop and {len(async_job_states)} jobs with the aiohttp HTTP engine'
+    )
+
+    runners: List[Iterator[JobState]] = []
+    if thread_job_states:
+        runners.append(
+            run_parallel_by_host(
+                lambda jobstate: jobstate.process(),
+                thread_job_states,
+                max_per_host=max_per_host,
+                min_delay=min_delay,
+                concurrency=AdaptiveConcurrency(
+                    worker_config.get('min_workers') or 1,
+                    worker_config.get('max_workers') or 64,
+                    initial=min(32, (os.cpu_count() or 1) + 4),
+                ),
+            )
+        )
+    if async_job_states:
+        runners.append(
+            run_parallel_aiohttp(
+                async_job_states,
+                max_connections=worker_config.get('max_connections', 1000),
+                max_per_host=max_per_host,
+                min_delay=min_delay,
+            )
+        )
+    if browser_job_states:
+        runners.append(
+            run_parallel_browser(
+                browser_job_states,
+                pools.browser_pool,  # type: ignore[arg-type]
+                max_jobs=worker_config.get('max_browser_jobs'),
+                max_per_host=max_per_host,
+                min_delay=min_delay,
+            )
+        )
+    return merge_parallel(runners)
+
+
+def select_jobs(urlwatcher: Urlwatch) -> List[JobBase]:
+    """Returns the jobs to run (all of them, or those specified in the command line), with defaults applied."""
     if urlwatcher.urlwatch_config.joblist:
         jobs = [
             job.with_defaults(urlwatcher.config_storage.config)
@@ -39,81 +607,235 @@ def run_jobs(urlwatcher: Urlwatch) -> None:
     else:
         jobs = [job.with_defaults(urlwatcher.config_storage.config) for job in urlwatcher.jobs]
         logger.debug(f'Processing {len(jobs)} jobs')
-    report = urlwatcher.report
+    return jobs
 
-    with ExitStack() as stack:
-        max_workers = min(32, os.cpu_count() or 1) if any(type(job) == BrowserJob for job in jobs) else None
-        logger.debug(f'Max_workers set to {max_workers}')
-        for job_state in run_parallel(
-            lambda jobstate: jobstate.process(),
-            (stack.enter_context(JobState(cache_storage, job)) for job in jobs),
-            max_workers=max_workers,
-        ):
-
-            max_tries = 0 if not job_state.job.max_tries else job_state.job.max_tries
-
-            if job_state.exception is not None:
-                # Oops, we have captured an error!
-                if job_state.error_ignored:
-                    logger.info(
-                        f'Job {job_state.job.index_number}: Error while executing job was ignored due to job ' f'config'
-                    )
-                elif isinstance(job_state.exception, NotModifiedError):
-                    logger.info(
-                        f'Job {job_state.job.index_number}: Job has not changed (HTTP 304 response or same '
-                        f'strong ETag)'
-                    )
-                    if job_state.tries > 0:
-                        job_state.tries = 0
-                        job_state.save()
-                    report.unchanged(job_state)
-                elif job_state.tries < max_tries:
-                    logger.debug(
-                        f'Job {job_state.job.index_number}: Error suppressed as cumulative number of '
-                        f'failures ({job_state.tries}) does not exceed max_tries={max_tries}'
-                    )
-                    job_state.save()
-                elif job_state.tries >= max_tries:
-                    logger.debug(
-                        f'Job {job_state.job.index_number}: Flag as error as max_tries={max_tries} has been '
-                        f'met or exceeded ({job_state.tries}'
-                    )
+
+def split_due_jobs(
+    jobs: List[JobBase], cache_storage: CacheStorage, now: Optional[float] = None
+) -> Tuple[List[JobBase], List[JobBase]]:
+    """Splits the jobs into those that are due and those that are not, i.e. that have an 'interval' that has not
+    elapsed since they were last checked (see CacheStorage.load_check_timestamps).
+
+    :param jobs: The jobs.
+    :param cache_storage: The cache storage.
+    :param now: The current timestamp (default: time.time()).
+    :returns: A tuple of the lists of jobs that are due and of those that are not.
+    """
+    intervals = {job.get_guid(): job.get_interval() for job in jobs}
+    if not any(intervals.values()):
+        return jobs, []
+    if now is None:
+        now = time.time()
+    last_checks = cache_storage.load_check_timestamps(guid for guid, interval in intervals.items() if interval)
+    due: List[JobBase] = []
+    not_due: List[JobBase] = []
+    for job in jobs:
+        interval = intervals[job.get_guid()]
+        last_check = last_checks.get(job.get_guid())
+        if interval and last_check and now - last_check < interval * INTERVAL_DUE_FRACTION:
+            not_due.append(job)
+        else:
+            due.append(job)
+    return due, not_due
+
+
+def handle_job_state(job_state: JobState, report: Report) -> None:
+    """Saves the snapshot of a processed job state as needed and adds it to the report as new, changed, unchanged or
+    error. The duration and time of the run are recorded for all jobs.
+
+    :param job_state: The processed job state.
+    :param report: The report.
+    """
+    if isinstance(job_state.exception, DeferredError):
+        # nothing to save: the job will be run next time as if this run never happened
+        report.deferred(job_state)
+        return
+
+    if job_state.duration is not None:
+        job_state.cache_storage.save_duration(job_state.job.get_guid(), job_state.duration, job_state.new_timestamp)
+
+    max_tries = 0 if not job_state.job.max_tries else job_state.job.max_tries
+
+    if job_state.exception is not None:
+        # Oops, we have captured an error!
+        if job_state.error_ignored:
+            logger.info(
+                f'Job {job_state.job.index_number}: Error while executing job was ignored due to job ' f'config'
+            )
+        elif isinstance(job_state.exception, NotModifiedError):
+            logger.info(
+                f'Job {job_state.job.index_number}: Job has not changed (HTTP 304 response or same strong ETag)'
+            )
+            if job_state.tries > 0:
+                job_state.tries = 0
+                job_state.save()
+            report.unchanged(job_state)
+        elif job_state.tries < max_tries:
+            logger.debug(
+                f'Job {job_state.job.index_number}: Error suppressed as cumulative number of '
+                f'failures ({job_state.tries}) does not exceed max_tries={max_tries}'
+            )
+            job_state.save()
+        elif job_state.tries >= max_tries:
+            logger.debug(
+                f'Job {job_state.job.index_number}: Flag as error as max_tries={max_tries} has been '
+                f'met or exceeded ({job_state.tries}'
+            )
+            job_state.save()
+            report.error(job_state)
+        else:
+            logger.debug(f'Job {job_state.job.index_number}: Job finished with no exceptions')
+    elif job_state.old_data != '' or job_state.old_timestamp != 0:
+        # This is not the first time running this job (we have snapshots)
+        if job_state.old_timestamp and not job_state.history_data:
+            if job_state.new_data == job_state.old_data:
+                if job_state.tries > 0:
+                    job_state.tries = 0
                     job_state.save()
-                    report.error(job_state)
-                else:
-                    logger.debug(f'Job {job_state.job.index_number}: Job finished with no exceptions')
-            elif job_state.old_data != '' or job_state.old_timestamp != 0:
-                # This is not the first time running this job (we have snapshots)
-                if job_state.old_timestamp:
-                    if job_state.new_data == job_state.old_data:
-                        if job_state.tries > 0:
-                            job_state.tries = 0
-                            job_state.save()
-                        report.unchanged(job_state)
-                    else:
-                        job_state.tries = 0
-                        job_state.save()
-                        report.changed(job_state)
                 else:
-                    # timestamp was not saved
-                    matched_history_time = job_state.history_data.get(job_state.new_data)
-                    if matched_history_time:
-                        job_state.old_timestamp = matched_history_time
-                    if matched_history_time or job_state.new_data == job_state.old_data:
-                        if job_state.tries > 0:
-                            job_state.tries = 0
-                            job_state.save()
-                        report.unchanged(job_state)
-                    else:
-                        close_matches = difflib.get_close_matches(job_state.new_data, job_state.history_data, n=1)
-                        if close_matches:
-                            job_state.old_data = close_matches[0]
-                            job_state.old_timestamp = job_state.history_data[close_matches[0]]
-                        job_state.tries = 0
-                        job_state.save()
-                        report.changed(job_state)
+                    job_state.save_filter_cache()
+                report.unchanged(job_state)
             else:
-                # We have never run this job before (there are no snapshots)
                 job_state.tries = 0
                 job_state.save()
-                report.new(job_state)
+                report.changed(job_state)
+        else:
+            # compare with the latest distinct snapshots (compared_versions), or timestamp was not saved
+            matched_history_time = job_state.history_data.get(job_state.new_data)
+            if matched_history_time:
+                job_state.old_timestamp = matched_history_time
+            if matched_history_time or job_state.new_data == job_state.old_data:
+                if job_state.tries > 0:
+                    job_state.tries = 0
+                    job_state.save()
+                elif job_state.new_data == job_state.old_data:
+                    # the filter cache is only valid for the data of the latest snapshot
+                    job_state.save_filter_cache()
+                report.unchanged(job_state)
+            else:
+                close_match = SimilarityIndex(job_state.history_data).closest_match(job_state.new_data)
+                if close_match is not None:
+                    job_state.old_data = close_match
+                    job_state.old_timestamp = job_state.history_data[close_match]
+                job_state.tries = 0
+                job_state.save()
+                report.changed(job_state)
+    else:
+        # We have never run this job before (there are no snapshots)
+        job_state.tries = 0
+        job_state.save()
+        report.new(job_state)
+
+
+def get_max_runtime(urlwatcher: Urlwatch) -> Optional[float]:
+    """Returns the maximum number of seconds a run may last, set by --max-runtime or in the worker configuration."""
+    if urlwatcher.urlwatch_config.max_runtime is not None:
+        return urlwatcher.urlwatch_config.max_runtime
+    return urlwatcher.config_storage.config.get('worker', {}).get('max_runtime')
+
+
+def run_jobs(urlwatcher: Urlwatch) -> None:
+    """Process jobs. Jobs with an 'interval' that has not elapsed since they were last checked are not run (unless
+    specified in the command line), and are recorded in the report as not due. If the run has a maximum runtime, jobs
+    that cannot be completed in time are deferred."""
+    max_runtime = get_max_runtime(urlwatcher)
+    deadline = time.monotonic() + max_runtime if max_runtime else None
+    jobs = select_jobs(urlwatcher)
+    worker_config: Dict[str, Any] = urlwatcher.config_storage.config.get('worker', {})
+    if not urlwatcher.urlwatch_config.joblist:
+        jobs, not_due_jobs = split_due_jobs(jobs, urlwatcher.cache_storage)
+        if not_due_jobs:
+            logger.info(f'Skipping {len(not_due_jobs)} jobs whose interval has not elapsed since they were last run')
+        for job in not_due_jobs:
+            urlwatcher.report.not_due(JobState(urlwatcher.cache_storage, job))
+
+    with ExitStack() as stack:
+        for job_state in process_jobs(stack, urlwatcher.cache_storage, jobs, worker_config, deadline=deadline):
+            handle_job_state(job_state, urlwatcher.report)
+    if urlwatcher.report.deferred_job_states:
+        logger.warning(
+            f'{len(urlwatcher.report.deferred_job_states)} jobs were deferred to the next run as the maximum runtime '
+            f'of {max_runtime} seconds was reached'
+        )
+
+
+def run_daemon(urlwatcher: Urlwatch, stop: Optional[threading.Event] = None) -> None:
+    """Runs the jobs continuously, each one on its own schedule (its 'interval' directive or, if not set, the
+    'daemon_interval' of the worker configuration, counting from the time it was last checked), keeping the pools and
+    the database open between runs. Due jobs are taken from a min-heap of their next run times and processed in
+    batches; reports are sent once per 'daemon_report_window' (if there is anything to report). Stops on SIGTERM, on
+    KeyboardInterrupt or when stop is set, leaving any unsent results in urlwatcher.report (sent by urlwatcher.close()).
+
+    :param urlwatcher: The Urlwatch instance.
+    :param stop: An event to stop the daemon (e.g. from another thread); if None, one is created.
+    """
+    jobs = select_jobs(urlwatcher)
+    worker_config: Dict[str, Any] = urlwatcher.config_storage.config.get('worker', {})
+    max_runtime = get_max_runtime(urlwatcher)
+    default_interval = worker_config.get('daemon_interval', 3600)
+    report_window = worker_config.get('daemon_report_window', 3600)
+    intervals = [job.get_interval() for job in jobs]  # validates all of them before starting
+    intervals = [default_interval if interval is None else interval for interval in intervals]
+
+    if stop is None:
+        stop = threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())  # type: ignore[union-attr]
+
+    # (next run time, position in jobs): the position breaks ties in the order of the jobs file; jobs are first run
+    # when their interval has elapsed since they were last checked (e.g. by a previous run)
+    now = time.time()
+    last_checks = urlwatcher.cache_storage.load_check_timestamps(job.get_guid() for job in jobs)
+    schedule: List[Tuple[float, int]] = [
+        (max(now, last_checks.get(job.get_guid(), 0) + intervals[i]), i) for i, job in enumerate(jobs)
+    ]
+    heapq.heapify(schedule)
+    next_report = time.time() + report_window
+    logger.info(f'Daemon started with {len(jobs)} jobs; sending reports every {report_window} seconds')
+
+    with ExitStack() as stack:
+        pools = create_pools(stack, jobs, worker_config)
+        try:
+            while not stop.is_set():
+                now = time.time()
+                due = []
+                while schedule and schedule[0][0] <= now:
+                    due.append(heapq.heappop(schedule)[1])
+                if due:
+                    logger.info(f'Daemon running {len(due)} due jobs')
+                    deadline = time.monotonic() + max_runtime if max_runtime else None
+                    positions = {id(jobs[i]): i for i in due}
+                    deferred = set()
+                    with ExitStack() as run_stack:
+                        for job_state in process_jobs(
+                            run_stack, urlwatcher.cache_storage, [jobs[i] for i in due], worker_config, pools, deadline
+                        ):
+                            handle_job_state(job_state, urlwatcher.report)
+                            if isinstance(job_state.exception, DeferredError):
+                                deferred.add(positions[id(job_state.job)])
+                    urlwatcher.cache_storage.flush()
+                    if deferred and len(deferred) == len(due):
+                        # none could be completed within max_runtime: running them again at once would do the same
+                        logger.warning(f'Daemon could not complete any of {len(due)} due jobs within max_runtime')
+                        deferred.clear()
+                    for i in due:
+                        # jobs deferred by max_runtime are run in the next batch, the others at their interval
+                        heapq.heappush(schedule, (now if i in deferred else now + intervals[i], i))
+
+                if time.time() >= next_report:
+                    report = urlwatcher.report
+                    if any(report.is_reported(job_state) for job_state in report.job_states):
+                        report.finish()
+                    elif report.config['report'].get('openmetrics', {}).get('enabled'):
+                        # the metrics are written even if there is nothing to report
+                        report.finish_one('openmetrics')
+                    urlwatcher.cache_storage.save_run_stats(report.start_timestamp, report.get_run_stats())
+                    urlwatcher.report = Report(urlwatcher)
+                    next_report = time.time() + report_window
+
+                wait = min(schedule[0][0] if schedule else next_report, next_report) - time.time()
+                if wait > 0:
+                    stop.wait(wait)
+        except KeyboardInterrupt:
+            logger.info('Daemon interrupted')
+    logger.info('Daemon stopped')